@@ -0,0 +1,101 @@
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import numpy as np
+
+# Number of values reduced at a time by LatencyAggregate.of(). Blocks are
+# small enough to stay in cache while all their stats are calculated, so
+# values are only read once from memory.
+BLOCK_VALUES = 1 << 14
+
+
+# Mergeable summary of a set of latency values: count, mean, sum of squared
+# deviations from the mean (M2), minimum and maximum. Aggregates of disjoint
+# sets of values can be merged (using Chan et al. parallel variant of
+# Welford's algorithm) into the aggregate of their union, so stats can be
+# computed incrementally, a chunk of values at a time, in constant memory.
+class LatencyAggregate():
+    def __init__(self, count=0, mean=0.0, m2=0.0, minimum=np.inf,
+                 maximum=-np.inf):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.minimum = minimum
+        self.maximum = maximum
+
+    # Aggregate of `values`, calculated in a single pass: each block of
+    # values has all its stats calculated while in cache, and is then merged
+    # into the aggregate. Values are in microseconds or, if `nanoseconds` is
+    # True, integer nanoseconds (as metrics values), converted a block at a
+    # time.
+    @classmethod
+    def of(cls, values, nanoseconds=False):
+        if nanoseconds:
+            values = np.asarray(values)
+        else:
+            values = np.asarray(values, dtype=np.float64)
+        aggregate = cls()
+        for start in range(0, len(values), BLOCK_VALUES):
+            block = values[start:start + BLOCK_VALUES]
+            if nanoseconds:
+                block = block / 1000
+            mean = np.sum(block) / len(block)
+            deviations = block - mean
+            aggregate.merge(cls(len(block), mean,
+                                np.dot(deviations, deviations),
+                                np.min(block), np.max(block)))
+        return aggregate
+
+    def update(self, values, nanoseconds=False):
+        return self.merge(LatencyAggregate.of(values, nanoseconds))
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count = other.count
+            self.mean = other.mean
+            self.m2 = other.m2
+            self.minimum = other.minimum
+            self.maximum = other.maximum
+            return self
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * other.count / count
+        self.m2 = (self.m2 + other.m2 +
+                   delta * delta * self.count * other.count / count)
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        return self
+
+    # Plain dictionary with the aggregate fields, suitable for JSON
+    def to_dict(self):
+        return {'count': int(self.count), 'mean': float(self.mean),
+                'm2': float(self.m2), 'minimum': float(self.minimum),
+                'maximum': float(self.maximum)}
+
+    @classmethod
+    def from_dict(cls, fields):
+        return cls(**fields)
+
+    # Returns the stats in the same format of MetricAnalysis.stats(), sans
+    # the factors. All of them are NaN if there are no values.
+    def stats(self):
+        if self.count == 0:
+            return {key: np.nan for key in ['mean', 'stdev', 'minimum',
+                                            'maximum', 'r', 'cv']}
+        stdev = np.sqrt(self.m2 / self.count)
+        r = self.maximum - self.minimum
+        cv = (stdev / self.mean) * 100
+        return {'mean': self.mean, 'stdev': stdev, 'minimum': self.minimum,
+                'maximum': self.maximum, 'r': r, 'cv': cv}
+
+
+def merge_aggregates(aggregates):
+    merged = LatencyAggregate()
+    for aggregate in aggregates:
+        merged.merge(aggregate)
+    return merged
@@ -4,31 +4,145 @@
 
 import glob
 import os.path
-import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import repeat
+
+from metric_index import MetricIndex
+from results_cache import (DeferredColumns, ResultsCache, csv_header,
+                           read_results_csv)
+from stages import StageDeltas
 
 
 class Analysis():
-    def __init__(self, csv_dir, results_dir):
-        self.file_names = glob.glob(f'{csv_dir}/results-*.csv')
+    # If `cache_dir` is not None, results CSV files are read through a
+    # ResultsCache stored on that directory. If `memmap` is True, cached
+    # columns are memory-mapped instead of loaded, so results bigger than
+    # memory can be analysed.
+    def __init__(self, csv_dir, results_dir, cache_dir=None, memmap=False):
+        self.file_names = sorted(glob.glob(f'{csv_dir}/results-*.csv'))
         if len(self.file_names) == 0:
             raise Exception(f'No test CSV results found on dir {csv_dir}')
+        if memmap and cache_dir is None:
+            raise Exception('Memory-mapped columns need a cache directory')
         self.results_dir = results_dir
+        self.memmap = memmap
+        self.cache = None
+        if cache_dir is not None:
+            self.cache = ResultsCache(cache_dir)
+
+    def _read_csv(self, file_name, columns):
+        if self.memmap:
+            return self.cache.map_csv(file_name, columns)
+        if self.cache is not None:
+            return self.cache.read_csv(file_name, columns)
+        return read_results_csv(file_name, columns)
+
+    # Loads each results file and builds its metrics. Only the columns needed
+    # by `metrics_of_interest` are loaded. Metrics values are calculated
+    # lazily, when first used. If `workers` is bigger than one, files are
+    # processed concurrently by a pool of processes - which also calculate
+    # the metrics values, so that's done in parallel as well. Either way,
+    # metrics_collection ends up in the same order.
+    #
+    # If `manifest` is not None, metrics get the content hash of their file
+    # as `source`. Files whose metrics are all recorded on the manifest are
+    # not loaded: their metrics get the recorded aggregates and histograms,
+    # and only read the file if their values are needed (say, for a chart).
+    def analyse(self, metrics_of_interest, workers=1, manifest=None):
+        # SoftwareTransmitTimestamp is always loaded, as it may be used as
+        # X-axis of time sequence charts
+        columns = {'SoftwareTransmitTimestamp'}
+        for metric in metrics_of_interest:
+            columns.update(metric.columns)
 
-    def analyse(self, metrics_of_interest):
-        metrics_collection = []
+        sources = {}
+        files_metrics = {}
+        if manifest is not None:
+            for file_name in self.file_names:
+                sources[file_name] = manifest.source_hash(file_name)
+                header = csv_header(file_name)
+                metrics_cls = [metric for metric in metrics_of_interest
+                               if metric.available_on(header)]
+                summaries = manifest.summaries_of(sources[file_name],
+                                                  metrics_cls)
+                if summaries is not None:
+                    files_metrics[file_name] = self._recorded_file(
+                            file_name, header, columns, summaries)
+
+        pending = [file_name for file_name in self.file_names
+                   if file_name not in files_metrics]
+        if workers > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                files_metrics.update(zip(pending, executor.map(
+                        self._analyse_file, pending,
+                        repeat(metrics_of_interest), repeat(columns),
+                        repeat(True))))
+        else:
+            files_metrics.update(
+                    (file_name, self._analyse_file(file_name,
+                                                   metrics_of_interest,
+                                                   columns))
+                    for file_name in pending)
+
+        self.metrics_collection = []
         for file_name in self.file_names:
-            dataframe = pd.read_csv(file_name)
-            factors = self._factors_from_filename(file_name)
-            for metric in metrics_of_interest:
-                try:
-                    metrics_collection.append(metric(dataframe, factors,
-                                              self.results_dir))
-                except KeyError:
-                    # Silence KeyErrors as they should be result of not
-                    # collecting intermediate latency
-                    pass
-
-        self.metrics_collection = metrics_collection
+            for metric in files_metrics[file_name]:
+                metric.source = sources.get(file_name)
+                self.metrics_collection.append(metric)
+        self.index = MetricIndex(self.metrics_collection)
+
+    # Builds metrics of `file_name` from their recorded aggregates and
+    # histograms. `summaries` is a dictionary of metric class to pairs (A, B)
+    # where A is the LatencyAggregate and B the LatencyHistogram.
+    def _recorded_file(self, file_name, header, columns, summaries):
+        dataframe = DeferredColumns(
+                [column for column in header if column in columns],
+                partial(self._read_csv, file_name, columns))
+        factors = self._factors_from_filename(file_name)
+        stage_deltas = None
+        if not self.memmap:
+            stage_deltas = StageDeltas(dataframe, [metric.stage
+                                                   for metric in summaries])
+
+        file_metrics = []
+        for metric_cls, (aggregate, histogram) in summaries.items():
+            metric = metric_cls(dataframe, factors, self.results_dir,
+                                stage_deltas=stage_deltas)
+            metric.restore(aggregate, histogram)
+            file_metrics.append(metric)
+        return file_metrics
+
+    def _analyse_file(self, file_name, metrics_of_interest, columns,
+                      evaluate=False):
+        dataframe = self._read_csv(file_name, columns)
+        factors = self._factors_from_filename(file_name)
+
+        # Skip metrics whose columns are missing, as they should be result of
+        # not collecting intermediate latency
+        metrics_cls = [metric for metric in metrics_of_interest
+                       if metric.available_on(dataframe.columns)]
+
+        # All metrics of a file share the same StageDeltas, so they're all
+        # calculated in a single pass. Except for memory-mapped columns: the
+        # whole StageDeltas of a file could be too big for memory, so each
+        # metric calculates its own stage. Its matrix is dropped once all
+        # metrics of the file are released.
+        stage_deltas = None
+        if not self.memmap:
+            stage_deltas = StageDeltas(dataframe, [metric.stage
+                                                   for metric in metrics_cls])
+
+        file_metrics = [metric(dataframe, factors, self.results_dir,
+                               stage_deltas=stage_deltas)
+                        for metric in metrics_cls]
+
+        if evaluate:
+            for metric in file_metrics:
+                metric.evaluate()
+
+        return file_metrics
 
     @staticmethod
     def _factors_from_filename(filename):
@@ -38,4 +152,4 @@ class Analysis():
                 'TransmissionInterval': int(trans_int)}
 
     def metrics_of(self, metric_cls):
-        return [m for m in self.metrics_collection if type(m) in metric_cls]
+        return self.index.of(metric_cls)
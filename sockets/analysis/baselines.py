@@ -0,0 +1,61 @@
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import json
+import os
+
+from datetime import datetime
+from export import JSON_FILE, export, load_summaries
+
+DEFAULT_STORE_DIR = 'baselines'
+
+
+# Named summaries (aggregates and histograms) of analysed results, kept so
+# that later results can be checked against them (see regression.py) without
+# the CSV files they came from. Each baseline is a directory of the store,
+# with the summaries as written by export() and an info file recording where
+# and when they came from.
+class BaselineStore():
+    info_name = 'baseline.json'
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR):
+        self.store_dir = store_dir
+
+    def _baseline_dir(self, name):
+        if name in ('', '.', '..') or os.path.sep in name:
+            raise Exception(f'Invalid baseline name: {name}')
+        return f'{self.store_dir}/{name}'
+
+    # Saves `summaries` (in the format of export.summaries_of()) as baseline
+    # `name`, replacing any previous one. `source` is a description of where
+    # they came from, such as the CSV directory.
+    def save(self, name, summaries, source):
+        baseline_dir = self._baseline_dir(name)
+        export(summaries, baseline_dir)
+        info = {'name': name, 'source': source,
+                'saved': datetime.now().isoformat(timespec='seconds')}
+        with open(f'{baseline_dir}/{self.info_name}', 'w') as f:
+            json.dump(info, f, indent=1)
+
+    # Returns the summaries of baseline `name`
+    def load(self, name):
+        baseline_dir = self._baseline_dir(name)
+        if not os.path.exists(f'{baseline_dir}/{JSON_FILE}'):
+            raise Exception(f'No baseline {name} on {self.store_dir}')
+        return load_summaries(baseline_dir)
+
+    def info(self, name):
+        try:
+            with open(f'{self._baseline_dir(name)}/{self.info_name}') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'name': name}
+
+    # Returns the names of the baselines on the store, sorted
+    def names(self):
+        if not os.path.isdir(self.store_dir):
+            return []
+        return sorted(
+                name for name in os.listdir(self.store_dir)
+                if os.path.exists(f'{self.store_dir}/{name}/{JSON_FILE}'))
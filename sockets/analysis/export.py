@@ -0,0 +1,137 @@
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import json
+import math
+import os
+
+import numpy as np
+
+from aggregates import LatencyAggregate, merge_aggregates
+from histograms import LatencyHistogram, merge_histograms
+from metrics import all_classes
+
+# Files written on the graphs directory: stats (and everything else but
+# histogram buckets) go to the JSON file, histogram buckets to the npz one
+JSON_FILE = 'analysis.json'
+NPZ_FILE = 'analysis.npz'
+VERSION = 1
+
+
+# Returns a dictionary whose keys are tuples (A, B, C), where A is the metric
+# class, B the payload size and C the transmission interval, and values are
+# pairs (D, E), where D is the LatencyAggregate and E the LatencyHistogram of
+# all `metrics` of that class and factors.
+def summaries_of(metrics):
+    grouped = {}
+    for metric in metrics:
+        key = (type(metric), metric.factors['PayloadSize'],
+               metric.factors['TransmissionInterval'])
+        grouped.setdefault(key, []).append(metric)
+
+    return {key: (merge_aggregates(m.aggregate() for m in metrics),
+                  merge_histograms(m.histogram() for m in metrics))
+            for key, metrics in grouped.items()}
+
+
+# NaN (as the stats of no values) and infinities (as the minimum and maximum
+# of an empty aggregate) are not valid JSON
+def _json_value(value):
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+# Yields a tuple (A, B, C, D, E) per metric and factors of `summaries` (as
+# returned by summaries_of()), and an 'ALL' factors one per metric, merging
+# all of its factors. A is the metric class, B the payload size, C the
+# transmission interval, D the LatencyAggregate and E the LatencyHistogram.
+# Sorted by metric name, then factors, with the 'ALL' entry last.
+def summary_entries(summaries):
+    by_metric = {}
+    for (metric_cls, payload_size, transmission_interval) in sorted(
+            summaries, key=lambda key: (key[0].name, key[1], key[2])):
+        by_metric.setdefault(metric_cls, []).append(
+                (payload_size, transmission_interval,
+                 *summaries[(metric_cls, payload_size,
+                             transmission_interval)]))
+
+    for metric_cls, factor_summaries in by_metric.items():
+        total = ('ALL', 'ALL',
+                 merge_aggregates(s[2] for s in factor_summaries),
+                 merge_histograms(s[3] for s in factor_summaries))
+        for entry in [*factor_summaries, total]:
+            yield (metric_cls, *entry)
+
+
+# Writes `summaries` (as returned by summaries_of()) to `graphs_dir`. There's
+# an entry per metric and factors, and an 'ALL' factors one per metric (see
+# summary_entries()). Each entry has the metric stats (as on the reports),
+# its aggregate and its histogram, whose buckets are arrays on the npz file
+# (see load()).
+def export(summaries, graphs_dir):
+    entries = []
+    arrays = {}
+    for (metric_cls, payload_size, transmission_interval, aggregate,
+         histogram) in summary_entries(summaries):
+        name = f'h{len(entries)}'
+        fields = histogram.to_dict()
+        arrays[f'{name}_counts'] = np.asarray(fields.pop('counts'),
+                                              dtype=np.int64)
+        arrays[f'{name}_negative_counts'] = np.asarray(
+                fields.pop('negative_counts'), dtype=np.int64)
+        stats = {**aggregate.stats(), **histogram.stats()}
+
+        entries.append({
+            'metric': metric_cls.name,
+            'short_name': metric_cls.short_name,
+            'payload_size': payload_size,
+            'transmission_interval': transmission_interval,
+            'count': int(aggregate.count),
+            'stats': {key: _json_value(value)
+                      for key, value in stats.items()},
+            'aggregate': {key: _json_value(value) if key != 'count' else value
+                          for key, value in aggregate.to_dict().items()},
+            'histogram': {'arrays': name, **fields}})
+
+    os.makedirs(graphs_dir, exist_ok=True)
+    with open(f'{graphs_dir}/{JSON_FILE}', 'w') as f:
+        json.dump({'version': VERSION, 'metrics': entries}, f, indent=1)
+    np.savez(f'{graphs_dir}/{NPZ_FILE}', **arrays)
+
+
+# Loads what export() wrote to `graphs_dir`. Returns the list of entries of
+# the JSON file, with the 'aggregate' of each one as a LatencyAggregate and
+# the 'histogram' as a LatencyHistogram.
+def load(graphs_dir):
+    with open(f'{graphs_dir}/{JSON_FILE}', 'r') as f:
+        exported = json.load(f)
+    if exported.get('version') != VERSION:
+        raise Exception(f'Unsupported export version: '
+                        f'{exported.get("version")}')
+
+    with np.load(f'{graphs_dir}/{NPZ_FILE}') as arrays:
+        for entry in exported['metrics']:
+            fields = dict(entry['histogram'])
+            name = fields.pop('arrays')
+            fields['counts'] = arrays[f'{name}_counts']
+            fields['negative_counts'] = arrays[f'{name}_negative_counts']
+            # Empty aggregates have no minimum and maximum
+            entry['aggregate'] = LatencyAggregate.from_dict(
+                    {key: value for key, value in entry['aggregate'].items()
+                     if value is not None})
+            entry['histogram'] = LatencyHistogram.from_dict(fields)
+
+    return exported['metrics']
+
+
+# Loads the summaries (in the format of summaries_of()) exported to
+# `graphs_dir`. 'ALL' factors entries are left out, as they're merges of the
+# others.
+def load_summaries(graphs_dir):
+    classes = {metric_cls.name: metric_cls for metric_cls in all_classes}
+    return {(classes[entry['metric']], entry['payload_size'],
+             entry['transmission_interval']): (entry['aggregate'],
+                                               entry['histogram'])
+            for entry in load(graphs_dir)
+            if entry['payload_size'] != 'ALL'}
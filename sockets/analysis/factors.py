@@ -2,66 +2,95 @@
 #
 # SPDX-License-Identifier: BSD-3-Clause
 
-import numpy as np
-import pandas as pd
 import os
 
-from plots import HistogramGroupPlot
+from aggregates import merge_aggregates
+from histograms import merge_histograms
+from metric_index import MetricIndex
+from render import render
 
 
 class FactorAnalysis:
     name = 'Add a proper name!'
 
+    # Metrics are looked up on an index of `metrics` only
     def __init__(self, metrics, results_dir):
         self.metrics = metrics
         self.results_dir = results_dir
+        self.index = MetricIndex(metrics)
         self.factor = ''
 
     def _factor_value_label(self, factor_value):
         raise NotImplementedError('Must implement _factor_value_label()')
 
-    def __histogram(self, metrics):
-        all_values = pd.concat([metric.metric for metric in metrics])
-        max_latency = np.max(all_values)
-        min_latency = np.min(all_values)
+    # Metrics of `metric_type` and `factor_value` with any values, leaving
+    # out those of empty results files
+    def _nonempty_metrics(self, metric_type, factor_value):
+        return [metric for metric
+                in self.index.of([metric_type], {self.factor: factor_value})
+                if metric.aggregate().count > 0]
 
-        iterations = max([len(metric.metric) for metric in metrics])
-        factor_values = {metric.factors[self.factor] for metric in metrics}
-        hp = HistogramGroupPlot(len(factor_values), min_latency, max_latency,
-                                iterations)
-        for fv in sorted(factor_values):
-            values = pd.concat([metric.metric for metric in metrics
-                               if metric.factors[self.factor] == fv])
-            mean = np.mean(values)
-            stdev = np.std(values)
-            data_hist, edges = np.histogram(values, bins='sqrt')
-            hp.add_histogram(data_hist, edges, mean, stdev,
-                             self._factor_value_label(fv))
+    def __histogram(self, metric_type, manifest, renderer):
+        from plots import HistogramGroupPlot
 
-        os.makedirs(self.results_dir, exist_ok=True)
+        # Metrics without values (of empty results files) are left out
+        metrics = [metric for metric in self.index.of([metric_type])
+                   if metric.aggregate().count > 0]
+        if len(metrics) == 0:
+            return
 
         norm_name = self.name.lower().replace(' ', '_')
         metric_norm_name = metrics[0].name.lower().replace(' ', '_')
         filename = (f'{self.results_dir}/'
                     f'vary_{norm_name}_for_{metric_norm_name}.png')
+        if manifest is not None and not manifest.needs_chart(filename,
+                                                             metrics):
+            return
+
+        aggregate = merge_aggregates(metric.aggregate() for metric in metrics)
+        max_latency = aggregate.maximum
+        min_latency = aggregate.minimum
+
+        iterations = max([metric.aggregate().count for metric in metrics])
+        factor_values = [fv for fv in self.index.factor_values(
+                                 [metric_type], self.factor)
+                         if len(self._nonempty_metrics(metric_type, fv)) > 0]
+        hp = HistogramGroupPlot(len(factor_values), min_latency, max_latency,
+                                iterations)
+        # Histograms have fixed bins, so histograms of all factor values
+        # line up
+        for fv in factor_values:
+            fv_metrics = self._nonempty_metrics(metric_type, fv)
+            fv_aggregate = merge_aggregates(metric.aggregate()
+                                            for metric in fv_metrics)
+            fv_histogram = merge_histograms(metric.histogram()
+                                            for metric in fv_metrics)
+            data_hist, edges = fv_histogram.bins()
+            stats = fv_aggregate.stats()
+            hp.add_histogram(data_hist, edges, stats['mean'], stats['stdev'],
+                             self._factor_value_label(fv))
+
+        os.makedirs(self.results_dir, exist_ok=True)
+
         title = f'Vary {self.name} for {metrics[0].name} Latency'
-        hp.plot(title, filename)
+        render(hp, title, filename, renderer)
 
-    def histograms(self):
+    # If `manifest` is not None, only charts not up to date are drawn (see
+    # Manifest). If `renderer` is not None, charts are drawn by it instead
+    # (see Renderer).
+    def histograms(self, manifest=None, renderer=None):
         # Group all our metrics by their type, so they can be properly
         # compared against our factor
         metrics_types = {type(metric) for metric in self.metrics}
         for metric_type in metrics_types:
-            metrics = ([metric for metric in self.metrics
-                       if isinstance(metric, metric_type)])
-            self.__histogram(metrics)
+            self.__histogram(metric_type, manifest, renderer)
 
 
 class PayloadFactor(FactorAnalysis):
     name = 'Payload Size'
 
-    def __init__(self, *args):
-        super(PayloadFactor, self).__init__(*args)
+    def __init__(self, *args, **kwargs):
+        super(PayloadFactor, self).__init__(*args, **kwargs)
         self.factor = 'PayloadSize'
 
     def _factor_value_label(self, factor_value):
@@ -71,8 +100,8 @@ class PayloadFactor(FactorAnalysis):
 class TxIntervalFactor(FactorAnalysis):
     name = 'Transmission Interval'
 
-    def __init__(self, *args):
-        super(TxIntervalFactor, self).__init__(*args)
+    def __init__(self, *args, **kwargs):
+        super(TxIntervalFactor, self).__init__(*args, **kwargs)
         self.factor = 'TransmissionInterval'
 
     def _factor_value_label(self, factor_value):
@@ -0,0 +1,249 @@
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import numpy as np
+
+# Buckets are log-linear (as on HDR histograms), over nanoseconds: values
+# below 2^SUB_BUCKET_BITS ns get 1 ns wide buckets, and each power of two
+# range above that is split in 2^(SUB_BUCKET_BITS - 1) buckets. So a value is
+# never more than 2^-(SUB_BUCKET_BITS - 1) (about 0.2%) off its bucket
+# bounds. Bucket boundaries are fixed, so histograms of any metric, file or
+# experiment line up and can be merged.
+SUB_BUCKET_BITS = 10
+_HALF_SUB_BUCKETS = 1 << (SUB_BUCKET_BITS - 1)
+
+# Resolution of histograms bins() used on charts. Charts don't need the full
+# resolution, so buckets are merged 2^(SUB_BUCKET_BITS -
+# DISPLAY_SUB_BUCKET_BITS) at a time - on fixed boundaries as well, so bins
+# of any histogram still line up.
+DISPLAY_SUB_BUCKET_BITS = 6
+
+# Number of values added to a histogram at a time, to avoid full-size
+# temporaries on big (possibly memory-mapped) metrics
+BLOCK_VALUES = 1 << 16
+
+# Percentiles reported on stats, and their keys on stats dictionaries
+PERCENTILES = [(99, 'p99'), (99.9, 'p99_9'), (99.99, 'p99_99')]
+
+
+# Bucket index of each (non-negative, int64) nanoseconds value
+def bucket_index(ns):
+    bit_length = np.frexp(ns.astype(np.float64))[1]
+    shift = np.maximum(bit_length - SUB_BUCKET_BITS, 0)
+    return shift * _HALF_SUB_BUCKETS + (ns >> shift)
+
+
+# Lowest nanoseconds value of each bucket on `indices`
+def bucket_lowest(indices):
+    indices = np.asarray(indices, dtype=np.int64)
+    shift = np.maximum(indices // _HALF_SUB_BUCKETS - 1, 0)
+    return (indices - shift * _HALF_SUB_BUCKETS) << shift
+
+
+# Highest nanoseconds value of each bucket on `indices`
+def bucket_highest(indices):
+    return bucket_lowest(np.asarray(indices, dtype=np.int64) + 1) - 1
+
+
+# Non-empty range of `counts`, as a pair (A, B), where A is the index of the
+# first non-empty bucket and B the list of counts from there to the last
+# non-empty one
+def _trim_counts(counts):
+    used = np.flatnonzero(counts)
+    if len(used) == 0:
+        return (0, [])
+    return (int(used[0]), counts[used[0]:used[-1] + 1].tolist())
+
+
+def _untrim_counts(offset, counts):
+    return np.concatenate([np.zeros(offset, dtype=np.int64),
+                           np.asarray(counts, dtype=np.int64)])
+
+
+def _add_counts(counts, other):
+    if len(other) > len(counts):
+        counts, other = other, counts
+    counts = counts.copy()
+    counts[:len(other)] += other
+    return counts
+
+
+# Sums each `group` consecutive `counts`
+def _coarsen(counts, group):
+    padding = -len(counts) % group
+    counts = np.concatenate([counts, np.zeros(padding, dtype=np.int64)])
+    return counts.reshape(-1, group).sum(axis=1)
+
+
+# Histogram of latency values (in microseconds), kept in nanosecond
+# resolution on log-linear buckets. Memory usage depends only on the range of
+# the values, not on how many of them there are. Histograms can be merged, so
+# percentiles of groups of metrics don't need their values concatenated and
+# sorted. Negative values (which shouldn't happen, but
+# clocks are not perfect) are kept on their own buckets, by magnitude.
+class LatencyHistogram():
+    def __init__(self):
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.negative_counts = np.zeros(0, dtype=np.int64)
+        self.minimum = None
+        self.maximum = None
+
+    @classmethod
+    def of(cls, values, nanoseconds=False):
+        return cls().update(values, nanoseconds)
+
+    @property
+    def count(self):
+        return int(np.sum(self.counts) + np.sum(self.negative_counts))
+
+    # Values are in microseconds or, if `nanoseconds` is True, integer
+    # nanoseconds (as metrics values), which are counted as they are
+    def update(self, values, nanoseconds=False):
+        if nanoseconds:
+            values = np.asarray(values, dtype=np.int64)
+        else:
+            values = np.asarray(values, dtype=np.float64)
+        for start in range(0, len(values), BLOCK_VALUES):
+            ns = values[start:start + BLOCK_VALUES]
+            if not nanoseconds:
+                ns = np.rint(ns * 1000).astype(np.int64)
+            self._update_extremes(np.min(ns), np.max(ns))
+
+            negative = ns < 0
+            if np.any(negative):
+                self.negative_counts = _add_counts(
+                        self.negative_counts,
+                        np.bincount(bucket_index(-ns[negative])))
+                ns = ns[~negative]
+            self.counts = _add_counts(self.counts,
+                                      np.bincount(bucket_index(ns)))
+        return self
+
+    def _update_extremes(self, minimum, maximum):
+        if self.minimum is None or minimum < self.minimum:
+            self.minimum = int(minimum)
+        if self.maximum is None or maximum > self.maximum:
+            self.maximum = int(maximum)
+
+    def merge(self, other):
+        if other.minimum is None:
+            return self
+        self.counts = _add_counts(self.counts, other.counts)
+        self.negative_counts = _add_counts(self.negative_counts,
+                                           other.negative_counts)
+        self._update_extremes(other.minimum, other.maximum)
+        return self
+
+    # Plain dictionary with the histogram fields, suitable for JSON. Only the
+    # range of non-empty buckets is kept.
+    def to_dict(self):
+        offset, counts = _trim_counts(self.counts)
+        negative_offset, negative_counts = _trim_counts(self.negative_counts)
+        return {'offset': offset, 'counts': counts,
+                'negative_offset': negative_offset,
+                'negative_counts': negative_counts,
+                'minimum': self.minimum, 'maximum': self.maximum}
+
+    @classmethod
+    def from_dict(cls, fields):
+        histogram = cls()
+        histogram.counts = _untrim_counts(fields['offset'], fields['counts'])
+        histogram.negative_counts = _untrim_counts(
+                fields['negative_offset'], fields['negative_counts'])
+        histogram.minimum = fields['minimum']
+        histogram.maximum = fields['maximum']
+        return histogram
+
+    # Value, in microseconds, below or at which `q` percent of the values
+    # are. It's the highest value of the bucket where that rank falls
+    # (limited by the actual minimum and maximum values), so it's exact up to
+    # the bucket resolution.
+    def percentile(self, q):
+        count = self.count
+        if count == 0:
+            return np.nan
+        rank = max(int(np.ceil(q / 100 * count)), 1)
+
+        negative_count = int(np.sum(self.negative_counts))
+        if rank <= negative_count:
+            # Negative buckets, from the highest magnitude to the lowest
+            reversed_counts = np.cumsum(self.negative_counts[::-1])
+            bucket = (len(self.negative_counts) - 1 -
+                      np.searchsorted(reversed_counts, rank))
+            ns = -bucket_lowest(bucket)
+        else:
+            bucket = np.searchsorted(np.cumsum(self.counts),
+                                     rank - negative_count)
+            ns = bucket_highest(bucket)
+
+        return min(max(int(ns), self.minimum), self.maximum) / 1000
+
+    # Returns a pair (A, B), where A is the counts of each bin and B the bins
+    # edges, in microseconds (as np.histogram() does). Bins go from the
+    # lowest to the highest non-empty bucket, merged to `sub_bucket_bits`
+    # resolution.
+    def bins(self, sub_bucket_bits=DISPLAY_SUB_BUCKET_BITS):
+        group = 1 << (SUB_BUCKET_BITS - sub_bucket_bits)
+        positive = _coarsen(self.counts, group)
+        negative = _coarsen(self.negative_counts, group)
+
+        used = np.flatnonzero(negative)
+        if len(used) > 0:
+            # Negative bins go from the highest magnitude down to zero,
+            # where positive bins must start
+            last = used[-1] + 1
+            negative_counts = negative[:last][::-1]
+            negative_edges = -bucket_lowest(np.arange(last, 0, -1) * group)
+            first = 0
+        else:
+            negative_counts = np.zeros(0, dtype=np.int64)
+            negative_edges = np.zeros(0, dtype=np.int64)
+            used = np.flatnonzero(positive)
+            first = used[0] if len(used) > 0 else 0
+
+        used = np.flatnonzero(positive)
+        last = used[-1] + 1 if len(used) > 0 else first
+        counts = np.concatenate([negative_counts, positive[first:last]])
+        edges = np.concatenate([negative_edges, bucket_lowest(
+                np.arange(first, last + 1) * group)])
+        return counts, edges / 1000
+
+    # Returns a pair (A, B), where A is the bins edges (as on bins()) and B
+    # the fraction of values below each edge - that is, the cumulative
+    # distribution of the values, at `sub_bucket_bits` resolution.
+    def cdf(self, sub_bucket_bits=SUB_BUCKET_BITS):
+        counts, edges = self.bins(sub_bucket_bits)
+        cumulative = np.concatenate([[0], np.cumsum(counts)])
+        return edges, cumulative / max(cumulative[-1], 1)
+
+    # Returns PERCENTILES, as a dictionary to be merged with other stats
+    def stats(self):
+        return {key: self.percentile(q) for q, key in PERCENTILES}
+
+
+def merge_histograms(histograms):
+    merged = LatencyHistogram()
+    for histogram in histograms:
+        merged.merge(histogram)
+    return merged
+
+
+# Counts of `histograms` on their common range of buckets, negative ones
+# included, in ascending order of value. Returns a pair (A, B), where A is
+# the value of each bucket, in microseconds (the one percentile() reports for
+# it), and B a matrix with the counts of each histogram on a row. Buckets
+# empty on all histograms are left out.
+def aligned_counts(histograms):
+    negative = max(len(h.negative_counts) for h in histograms)
+    positive = max(len(h.counts) for h in histograms)
+    counts = np.zeros((len(histograms), negative + positive), dtype=np.int64)
+    for row, histogram in zip(counts, histograms):
+        first = negative - len(histogram.negative_counts)
+        row[first:negative] = histogram.negative_counts[::-1]
+        row[negative:negative + len(histogram.counts)] = histogram.counts
+
+    values = np.concatenate([-bucket_lowest(np.arange(negative)[::-1]),
+                             bucket_highest(np.arange(positive))]) / 1000
+    used = np.flatnonzero(np.any(counts, axis=0))
+    return values[used], counts[:, used]
@@ -2,27 +2,37 @@
 #
 # SPDX-License-Identifier: BSD-3-Clause
 
-import numpy as np
-import pandas as pd
 import os
 
+from aggregates import merge_aggregates
+from metric_index import MetricIndex
 from metrics import (rx_intermediate_classes, tx_intermediate_classes)
-from plots import StackedBarChart
+from render import render
+from stage_profile import stage_profile_of
+
+# Metric types sets of intermediate latency profiles
+INTERMEDIATE_TYPES = [('Transmit', tx_intermediate_classes),
+                      ('Receive', rx_intermediate_classes)]
 
 
 # Generates a stacked bar chart comparing sets of intermediate latencies
 # (where intermediate latencies are any latencies that can be viewed as a
-# breakdown of a bigger latency).
+# breakdown of a bigger latency), and another one breaking them down at
+# percentiles of the bigger latency and on its tail (see StageProfile).
 class LatencyProfile:
     # `metrics_sets` is list of pairs (A, B), where A is the name of the
     # metric_set (such as 'Machine A') and B is list of metrics.
     # `metrics_types_sets` is a list of pairs (C, D), where C is the name
     # of the metric_type_set (such as 'Transmit') and D is a list of Metric
     # classes (such as all Transmit intermediate metrics).
-    def __init__(self, metric_sets, metrics_types_sets, results_dir):
+    # `stage_profiles` is a dictionary of pairs (A, C) to the StageProfile of
+    # those metrics. If None, they're calculated from the metrics values.
+    def __init__(self, metric_sets, metrics_types_sets, results_dir,
+                 stage_profiles=None):
         self.metric_sets = metric_sets
         self.metrics_types_sets = metrics_types_sets
         self.results_dir = results_dir
+        self.stage_profiles = stage_profiles
         self.averages = []
 
     def _process_datasets_metrics(self):
@@ -44,77 +54,157 @@ class LatencyProfile:
                     metric_type_set_name, metric_type_set_types):
         avgs = []
         name = f'{metric_set_name}\n{metric_type_set_name}'
-        relevant_types = [metric_type
-                          for metric_type in metric_type_set_types]
-        relevant_metrics = [metric
-                            for metric in metric_set_metrics
-                            if type(metric) in relevant_types]
+        index = MetricIndex(metric_set_metrics)
+        relevant_metrics = index.of(metric_type_set_types)
 
         if len(relevant_metrics) > 0:
             for metric_type in metric_type_set_types:
-                avg = np.mean(pd.concat([metric.metric
-                              for metric in relevant_metrics
-                              if isinstance(metric, metric_type)]))
+                avg = merge_aggregates(metric.aggregate() for metric
+                                       in index.of([metric_type])).mean
                 avgs.append((metric_type.short_name, avg))
 
         return (name, avgs)
 
     def _plot(self):
+        from plots import StackedBarChart
+
         sbcc = StackedBarChart()
         for avg in self.averages:
             if len(avg[1]) > 0:
                 sbcc.add_bar(*avg)
         return sbcc
 
-    def chart(self):
+    # If `manifest` is not None, the chart is only drawn if it's not up to
+    # date (see Manifest). If `renderer` is not None, the chart is drawn by
+    # it instead (see Renderer).
+    def chart(self, manifest=None, renderer=None):
+        metrics = [metric for metric_set in self.metric_sets
+                   for metric in metric_set[1]]
+        if manifest is not None and not manifest.needs_chart(
+                self._chart_filename(), metrics):
+            return
+
         self._process_datasets_metrics()
         sbcc = self._plot()
-        self._finish_chart(sbcc)
+        self._finish_chart(sbcc, renderer)
+
+    def _stage_profile(self, metric_set_name, metric_set_metrics,
+                       metric_type_set_name, metric_type_set_types):
+        if self.stage_profiles is None:
+            return stage_profile_of(metric_set_metrics,
+                                    metric_type_set_types)
+        if len(MetricIndex(metric_set_metrics).of(
+                metric_type_set_types)) == 0:
+            return None
+        return self.stage_profiles.get((metric_set_name,
+                                        metric_type_set_name))
+
+    # Same as chart(), but for the chart with a bar per StageProfile profile
+    # of each set and type of metric
+    def percentile_chart(self, manifest=None, renderer=None):
+        metrics = [metric for metric_set in self.metric_sets
+                   for metric in metric_set[1]]
+        if manifest is not None and not manifest.needs_chart(
+                self._percentile_chart_filename(), metrics):
+            return
+
+        from plots import StackedBarChart
 
-    def _finish_chart(self, sbcc):
+        sbcc = StackedBarChart()
+        sbcc.bar_distance = 1
+        for metric_set_name, metric_set_metrics in self.metric_sets:
+            for metric_type_set in self.metrics_types_sets:
+                profile = self._stage_profile(metric_set_name,
+                                              metric_set_metrics,
+                                              *metric_type_set)
+                if profile is None:
+                    continue
+                for name, means in profile.profiles():
+                    sbcc.add_bar(f'{metric_set_name}\n'
+                                 f'{metric_type_set[0]}\n{name}',
+                                 list(zip(profile.stages, means)))
+
+        if len(sbcc.bars) > 0:
+            self._finish_percentile_chart(sbcc, renderer)
+
+    def _chart_filename(self):
+        raise NotImplementedError('Must implement _chart_filename()')
+
+    def _finish_chart(self, sbcc, renderer):
         raise NotImplementedError('Must implement _finish_chart()')
 
+    def _percentile_chart_filename(self):
+        raise NotImplementedError('Must implement '
+                                  '_percentile_chart_filename()')
+
+    def _finish_percentile_chart(self, sbcc, renderer):
+        raise NotImplementedError('Must implement _finish_percentile_chart()')
+
 
 # Generates a stacked bar chart comparing Receive and Transmit intermediate
 # metrics. Usually will be used to get the average intermediate (Transmit and
 # Receive) latencies from the same experiment.
 class IntermediateLatencyProfile(LatencyProfile):
     # `metrics` is a list of Receive or Transmit intermediate metrics.
-    def __init__(self, metrics, results_dir):
+    def __init__(self, metrics, results_dir, stage_profiles=None):
         metrics = [('', metrics)]
-        metric_types = [('Transmit', tx_intermediate_classes),
-                        ('Receive', rx_intermediate_classes)]
         super(IntermediateLatencyProfile, self).__init__(metrics,
-                                                         metric_types,
-                                                         results_dir)
+                                                         INTERMEDIATE_TYPES,
+                                                         results_dir,
+                                                         stage_profiles)
+
+    def _chart_filename(self):
+        return f'{self.results_dir}/avg-intermediate-latency-bar-chart.png'
 
-    def _finish_chart(self, sbcc):
-        filename = f'{self.results_dir}/avg-intermediate-latency-bar-chart.png'
-        sbcc.plot('Average Intermediate Latency Chart', filename)
+    def _finish_chart(self, sbcc, renderer):
+        render(sbcc, 'Average Intermediate Latency Chart',
+               self._chart_filename(), renderer)
 
+    def _percentile_chart_filename(self):
+        return (f'{self.results_dir}/'
+                f'percentile-intermediate-latency-bar-chart.png')
 
-# Generates a stacked bar chart comparing two sets of intermediate metrics.
-# Each set can be composed of both Transmit and Receive intermediate latency,
-# and each set is usually from a different experiment. If there is both
-# Transmit and Receive metrics on each set, four bars will be generated. If
-# only one type of metric is present, just two bars will be generated.
+    def _finish_percentile_chart(self, sbcc, renderer):
+        render(sbcc, 'Intermediate Latency at Percentiles Chart',
+               self._percentile_chart_filename(), renderer)
+
+
+# Generates a stacked bar chart comparing sets of intermediate metrics. Each
+# set can be composed of both Transmit and Receive intermediate latency, and
+# each set is usually from a different experiment. There's a bar for each
+# set and type of metric (Transmit or Receive) present on it.
 class IntermediateLatencyComparisonProfile(IntermediateLatencyProfile):
-    # `metrics_a` and `metrics_b` are pairs (A, B) where A is the name of
-    # the metrics (such as 'Machine A') and B is a list of Transmit or Receive
+    # `metric_sets` is a list of pairs (A, B) where A is the name of the
+    # metrics (such as 'Machine A') and B is a list of Transmit or Receive
     # metrics (or both).
     # `name` is a prefix to be added to the generated chart filename, that will
     # be something like {name}-avg-intermediate-comp-latency-bar-chart.png
-    def __init__(self, metrics_a, metrics_b, name, results_dir):
+    # `stage_profiles` is as on LatencyProfile.
+    def __init__(self, metric_sets, name, results_dir, stage_profiles=None):
         super(IntermediateLatencyComparisonProfile,
-              self).__init__(None, results_dir)
-        self.metric_sets = [metrics_a, metrics_b]
+              self).__init__(None, results_dir, stage_profiles)
+        self.metric_sets = metric_sets
         self.name = name
 
-    def _finish_chart(self, sbcc):
+    def _chart_filename(self):
+        return (f'{self.results_dir}/'
+                f'{self.name}-avg-intermediate-comp-latency-bar-chart.png')
+
+    def _finish_chart(self, sbcc, renderer):
         os.makedirs(self.results_dir, exist_ok=True)
 
-        filename = (f'{self.results_dir}/'
-                    f'{self.name}-avg-intermediate-comp-latency-bar-chart.png')
+        filename = self._chart_filename()
         if len([avg for avg in self.averages if len(avg[1]) > 0]) > 2:
             sbcc.bar_distance = 1
-        sbcc.plot('Average Intermediate Latency Comparison Chart', filename)
+        render(sbcc, 'Average Intermediate Latency Comparison Chart',
+               filename, renderer)
+
+    def _percentile_chart_filename(self):
+        return (f'{self.results_dir}/'
+                f'{self.name}-percentile-intermediate-comp-latency-'
+                f'bar-chart.png')
+
+    def _finish_percentile_chart(self, sbcc, renderer):
+        os.makedirs(self.results_dir, exist_ok=True)
+        render(sbcc, 'Intermediate Latency at Percentiles Comparison Chart',
+               self._percentile_chart_filename(), renderer)
@@ -0,0 +1,121 @@
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import hashlib
+import json
+import os
+
+from aggregates import LatencyAggregate
+from histograms import LatencyHistogram
+
+# Size of the blocks read when hashing results files
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def content_hash(file_name):
+    sha1 = hashlib.sha1()
+    with open(file_name, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+# Records, on the graphs directory, what a previous analysis did: the content
+# hash of each results file, the aggregate and histogram of each metric of
+# each file, and which files each chart was drawn from. A new analysis on the
+# same graphs directory uses it to skip what didn't change: metrics of
+# unchanged files are not calculated again (their aggregates and histograms
+# are enough for stats reports) and charts whose inputs are the same are not
+# drawn again.
+#
+# Files are identified by content, so touching or moving a results file
+# doesn't invalidate anything. To avoid hashing unchanged files every time,
+# hashes are reused if file size and modification time are the same.
+class Manifest():
+    file_name = 'manifest.json'
+    # Bump whenever metrics or charts change, so that nothing from older
+    # analysis is reused
+    version = 1
+
+    def __init__(self, graphs_dir):
+        self.path = f'{graphs_dir}/{self.file_name}'
+        self.previous = self._load()
+        self.sources = {}
+        self.summaries = {}
+        self.charts = {}
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = None
+        if previous is None or previous.get('version') != self.version:
+            previous = {'sources': {}, 'summaries': {}, 'charts': {}}
+        return previous
+
+    # Content hash of results file `file_name`
+    def source_hash(self, file_name):
+        path = os.path.abspath(file_name)
+        st = os.stat(path)
+        source = self.previous['sources'].get(path)
+        if (source is None or source['size'] != st.st_size or
+                source['mtime_ns'] != st.st_mtime_ns):
+            source = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                      'hash': content_hash(path)}
+        self.sources[path] = source
+        return source['hash']
+
+    # Returns a dictionary whose keys are the metric classes on
+    # `metrics_cls` and values are pairs (A, B), where A is the
+    # LatencyAggregate and B the LatencyHistogram recorded for the metric of
+    # file whose hash is `source_hash` - or None, if any of them is missing.
+    def summaries_of(self, source_hash, metrics_cls):
+        summaries = self.previous['summaries'].get(source_hash, {})
+        if not all(m.name in summaries for m in metrics_cls):
+            return None
+        recorded = {}
+        for metric_cls in metrics_cls:
+            summary = summaries[metric_cls.name]
+            recorded[metric_cls] = (
+                    LatencyAggregate.from_dict(summary['aggregate']),
+                    LatencyHistogram.from_dict(summary['histogram']))
+        return recorded
+
+    # Records aggregates and histograms of `metrics`. Metrics must have their
+    # `source` set.
+    def record_metrics(self, metrics):
+        for metric in metrics:
+            summaries = self.summaries.setdefault(metric.source, {})
+            summaries[metric.name] = {
+                'aggregate': metric.aggregate().to_dict(),
+                'histogram': metric.histogram().to_dict()}
+
+    # Returns True if chart `chart_file` needs to be drawn, as it doesn't
+    # exist or was drawn from different `metrics` (or their sources) or with
+    # different `options`. Either way, the chart is recorded as part of this
+    # analysis (unless sources of `metrics` are unknown).
+    def needs_chart(self, chart_file, metrics, options=None):
+        sources = {metric.source for metric in metrics}
+        if None in sources:
+            return True
+        chart = {'sources': sorted(sources),
+                 'metrics': sorted({metric.name for metric in metrics}),
+                 'options': options}
+        name = os.path.relpath(chart_file, os.path.dirname(self.path))
+        self.charts[name] = chart
+        return (self.previous['charts'].get(name) != chart or
+                not os.path.exists(chart_file))
+
+    # Writes the manifest. Only what was part of this analysis is kept.
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        manifest = {'version': self.version, 'sources': self.sources,
+                    'summaries': self.summaries, 'charts': self.charts}
+        # Write then rename, so an interrupted analysis doesn't leave a
+        # partial manifest
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.path)
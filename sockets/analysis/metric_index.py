@@ -0,0 +1,67 @@
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+from itertools import chain
+
+
+# Index of metrics by their type and factors (PayloadSize and
+# TransmissionInterval), so that grouping metrics doesn't need to scan all
+# metrics again for every group. Lookups return metrics in the same order
+# they were given to the index.
+class MetricIndex():
+    def __init__(self, metrics):
+        self.positions = {}
+        self.by_type = {}
+        self.by_factors = {}
+        self.by_factor = {}
+        for position, metric in enumerate(metrics):
+            metric_type = type(metric)
+            payload_size = metric.factors['PayloadSize']
+            transmission_interval = metric.factors['TransmissionInterval']
+
+            self.positions[id(metric)] = position
+            self.by_type.setdefault(metric_type, []).append(metric)
+            self.by_factors.setdefault(
+                    (metric_type, payload_size, transmission_interval),
+                    []).append(metric)
+            self.by_factor.setdefault(
+                    (metric_type, 'PayloadSize', payload_size),
+                    []).append(metric)
+            self.by_factor.setdefault(
+                    (metric_type, 'TransmissionInterval',
+                     transmission_interval), []).append(metric)
+
+    def _lookup(self, metric_type, factors):
+        if len(factors) == 0:
+            return self.by_type.get(metric_type, [])
+        if len(factors) == 2:
+            return self.by_factors.get((metric_type, factors['PayloadSize'],
+                                        factors['TransmissionInterval']), [])
+        ((factor, value),) = factors.items()
+        return self.by_factor.get((metric_type, factor, value), [])
+
+    # Returns metrics of any of `metric_types` and whose factors match
+    # `factors`. `factors` may have any of 'PayloadSize' and
+    # 'TransmissionInterval' keys; missing ones match any value.
+    def of(self, metric_types, factors={}):
+        factors = {factor: value for factor, value in factors.items()
+                   if factor in ('PayloadSize', 'TransmissionInterval')}
+        metrics = [self._lookup(metric_type, factors)
+                   for metric_type in dict.fromkeys(metric_types)]
+        if len(metrics) == 1:
+            return list(metrics[0])
+        return sorted(chain(*metrics), key=lambda m: self.positions[id(m)])
+
+    # Returns a sorted list of unique factors of `metric_types` metrics
+    def factors_of(self, metric_types):
+        factors = {(key[1], key[2]) for key in self.by_factors
+                   if key[0] in metric_types}
+        return [{'PayloadSize': payload_size,
+                 'TransmissionInterval': transmission_interval}
+                for (payload_size, transmission_interval) in sorted(factors)]
+
+    # Returns sorted values of `factor` of `metric_types` metrics
+    def factor_values(self, metric_types, factor):
+        return sorted({key[2] for key in self.by_factor
+                       if key[0] in metric_types and key[1] == factor})
@@ -3,317 +3,346 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 import numpy as np
-import pandas as pd
 import os
 
-from plots import RunSequencePlot
+from aggregates import LatencyAggregate
+from histograms import LatencyHistogram
+from render import render
+from stages import StageDeltas, stage_columns
 
 
+# Each metric is a view of one stage of the StageDeltas of a results file,
+# in integer nanoseconds. They're only scaled to microseconds where they're
+# used: aggregates and histograms scale them a block at a time, and charts
+# when drawn, so the matrix is never copied whole. Metrics of the same file
+# can share the same StageDeltas, so all their stages are calculated in a
+# single pass.
 class MetricAnalysis:
     name = 'Add a proper name!'
     short_name = 'Add a proper short name!'
+    # Name of the stage (see stages.STAGES) of the metric
+    stage = None
+    # Timestamp columns of the results CSV needed to calculate the metric
+    columns = []
+    # Hint shown when the metric columns are not found
+    missing_hint = 'Was any latency collected?'
 
     @classmethod
     def norm_name(cls):
         return cls.name.lower().replace(' ', '_')
 
-    def __init__(self, dataframe, factors, results_dir):
+    @classmethod
+    def available_on(cls, columns):
+        return set(cls.columns).issubset(columns)
+
+    # `dataframe` can be any mapping of column names to arrays, such as
+    # Columns read from a results file or a ColumnStore of memory-mapped
+    # columns.
+    # Metric values are only calculated when first needed. If `cache_metric`
+    # is True, they are kept until release() is called - otherwise, they are
+    # calculated again every time they are needed. If `stage_deltas` is None,
+    # the metric calculates its own single stage StageDeltas.
+    def __init__(self, dataframe, factors, results_dir, cache_metric=True,
+                 stage_deltas=None):
         self.dataframe = dataframe
         self.factors = factors
         self.results_dir = results_dir
-        self.metric = self.calculate_metric()
+        self.cache_metric = cache_metric
+        self.stage_deltas = stage_deltas
+        if stage_deltas is not None:
+            stage_deltas.share(self)
+        self._metric = None
+        self._aggregate = None
+        self._histogram = None
+        # Content hash of the results file, when known (see Manifest)
+        self.source = None
+
+    @property
+    def metric(self):
+        if self._metric is not None:
+            return self._metric
+        metric = self.calculate_metric()
+        if self.cache_metric:
+            self._metric = metric
+        return metric
+
+    # Calculates (and caches) the metric values, aggregate and histogram now,
+    # instead of on first use
+    def evaluate(self):
+        if self.stage_deltas is not None:
+            self.stage_deltas.evaluate()
+        if self.cache_metric:
+            self.metric
+        self.aggregate()
+        self.histogram()
+        return self
+
+    # Drops cached metric values and, once every metric sharing its
+    # StageDeltas has released them, the StageDeltas matrix. They are
+    # calculated again if needed later. The aggregate and histogram are kept,
+    # as they're small.
+    def release(self):
+        self._metric = None
+        if self.stage_deltas is not None:
+            self.stage_deltas.unshare(self)
+
+    # LatencyAggregate of the metric values. It's calculated once, and can be
+    # merged with other metrics aggregates to get stats of groups of metrics.
+    def aggregate(self):
+        if self._aggregate is None:
+            self._aggregate = LatencyAggregate.of(self.metric,
+                                                  nanoseconds=True)
+        return self._aggregate
+
+    # LatencyHistogram of the metric values, used for percentiles. Like the
+    # aggregate, it's calculated once and can be merged with other metrics
+    # histograms.
+    def histogram(self):
+        if self._histogram is None:
+            self._histogram = LatencyHistogram.of(self.metric,
+                                                  nanoseconds=True)
+        return self._histogram
+
+    # Sets aggregate and histogram previously calculated for the same values
+    def restore(self, aggregate, histogram):
+        self._aggregate = aggregate
+        self._histogram = histogram
 
     def stats(self):
-        mean = np.mean(self.metric)
-        stdev = np.std(self.metric)
-        minimum = np.min(self.metric)
-        maximum = np.max(self.metric)
-        r = maximum - minimum
-        cv = (stdev / mean) * 100
         return {'payload_size': self.factors['PayloadSize'],
                 'transmission_interval': self.factors['TransmissionInterval'],
-                'mean': mean, 'stdev': stdev, 'minimum': minimum,
-                'maximum': maximum, 'r': r, 'cv': cv}
-
-    def run_sequence(self, sw_transmit_time=False):
+                **self.aggregate().stats(), **self.histogram().stats()}
+
+    # If `manifest` is not None, the chart is only drawn if it's not up to
+    # date (see Manifest). If `renderer` is not None, the chart is drawn by
+    # it instead (see Renderer). `style` is one of RUN_SEQUENCE_STYLES.
+    # Metrics without values (of empty results files) have no chart.
+    def run_sequence(self, sw_transmit_time=False, manifest=None,
+                     renderer=None, style='scatter'):
+        if self.aggregate().count == 0:
+            return
         transmission_interval_us = int(self.factors["TransmissionInterval"] /
                                        1000)
         payload_size = self.factors["PayloadSize"]
+        norm_name = self.norm_name()
+        chart_directory = f'{self.results_dir}/{norm_name}/time_sequence'
+        chart_filename = (f'{chart_directory}/'
+                          f'graph_{payload_size}_bytes_'
+                          f'{transmission_interval_us}_us.png')
+        if manifest is not None and not manifest.needs_chart(
+                chart_filename, [self], [sw_transmit_time, style]):
+            return
+
+        metric = self.metric
         chart_title = (f'{self.name} Latency ('
                        f'Transmission Interval: {transmission_interval_us} us '
                        f'Payload: {payload_size} bytes '
-                       f'Iterations: {len(self.metric)})')
-        norm_name = self.norm_name()
-        chart_directory = f'{self.results_dir}/{norm_name}/time_sequence'
+                       f'Iterations: {len(metric)})')
 
         os.makedirs(chart_directory, exist_ok=True)
 
-        chart_filename = (f'{chart_directory}/'
-                          f'graph_{payload_size}_bytes_'
-                          f'{transmission_interval_us}_us.png')
+        # Imported only when drawing, so that stats-only runs (see
+        # run_stats.py) never load matplotlib
+        from plots import RunSequencePlot
 
         if sw_transmit_time:
-            indices = pd.to_datetime(
-                    self.dataframe['SoftwareTransmitTimestamp'])
+            indices = np.asarray(
+                    self.dataframe['SoftwareTransmitTimestamp']).astype(
+                            'datetime64[ns]')
         else:
-            indices = np.arange(len(self.metric))
-        rsp = RunSequencePlot((indices, self.metric))
-        rsp.plot(chart_title, chart_filename)
+            indices = np.arange(len(metric))
+        rsp = RunSequencePlot((indices, metric / 1000), self.histogram(),
+                              style)
+        render(rsp, chart_title, chart_filename, renderer)
 
     def calculate_metric(self):
-        raise NotImplementedError('Must implement calculate_metric()')
-
-    def _simple_metric(self, field_a, field_b, err_msg):
+        stage_deltas = self.stage_deltas
+        if stage_deltas is None:
+            stage_deltas = StageDeltas(self.dataframe, [self.stage])
+        else:
+            stage_deltas.share(self)
         try:
-            return pd.Series(np.int64(self.dataframe[field_a] -
-                                      self.dataframe[field_b]) / 1000)
+            return stage_deltas.of(self.stage)
         except KeyError as err:
-            raise KeyError(f'{err} not found. {err_msg}')
+            raise KeyError(f'{err} {self.missing_hint}')
 
 
 class E2EMetric(MetricAnalysis):
     name = 'End to End'
     short_name = 'End to End'
+    stage = 'end_to_end'
+    columns = stage_columns(stage)
+    missing_hint = 'Was any latency collected?'
 
-    def __init__(self, *args):
-        super(E2EMetric, self).__init__(*args)
-
-    def calculate_metric(self):
-        return self._simple_metric('SoftwareReceiveTimestamp',
-                                   'SoftwareTransmitTimestamp',
-                                   'Was any latency collected?')
+    def __init__(self, *args, **kwargs):
+        super(E2EMetric, self).__init__(*args, **kwargs)
 
 
 class TotalRxMetric(MetricAnalysis):
     name = 'Receive'
     short_name = 'Receive'
+    stage = 'total_rx'
+    columns = stage_columns(stage)
+    missing_hint = 'Was receive latency collected?'
 
-    def __init__(self, *args):
-        super(TotalRxMetric, self).__init__(*args)
-
-    def calculate_metric(self):
-        return self._simple_metric('SoftwareReceiveTimestamp',
-                                   'HardwareReceiveTimestamp',
-                                   'Was receive latency collected?')
+    def __init__(self, *args, **kwargs):
+        super(TotalRxMetric, self).__init__(*args, **kwargs)
 
 
 class TotalTxMetric(MetricAnalysis):
     name = 'Transmit'
     short_name = 'Transmit'
+    stage = 'total_tx'
+    columns = stage_columns(stage)
+    missing_hint = 'Was transmit latency collected?'
 
-    def __init__(self, *args):
-        super(TotalTxMetric, self).__init__(*args)
-
-    def calculate_metric(self):
-        return self._simple_metric('HardwareReceiveTimestamp',
-                                   'SoftwareTransmitTimestamp',
-                                   'Was transmit latency collected?')
+    def __init__(self, *args, **kwargs):
+        super(TotalTxMetric, self).__init__(*args, **kwargs)
 
 
 class HwRxMetric(MetricAnalysis):
     name = 'Hardware Receive'
     short_name = 'Hardware'
+    # Check stages.STAGES comment about negative Hardware Receive latency
+    stage = 'hw_rx'
+    columns = stage_columns(stage)
+    missing_hint = 'Was listener intermediate latency collected?'
 
-    def __init__(self, *args):
-        super(HwRxMetric, self).__init__(*args)
-
-    def calculate_metric(self):
-        try:
-            m = pd.Series((self.dataframe['irq_handler_entry'] -
-                          self.dataframe['HardwareReceiveTimestamp']) / 1000)
-            # Check DriverRxMetric comment about negative RxHardware
-            m.where(m > 0, 0, inplace=True)
-            return m
-        except KeyError as err:
-            raise KeyError(f'{err} not found. '
-                           'Was listener intermediate latency collected?')
+    def __init__(self, *args, **kwargs):
+        super(HwRxMetric, self).__init__(*args, **kwargs)
 
 
 class HwTxMetric(MetricAnalysis):
     name = 'Hardware Transmit'
     short_name = 'Hardware'
+    stage = 'hw_tx'
+    columns = stage_columns(stage)
+    missing_hint = 'Was talker intermediate data collected?'
 
-    def __init__(self, *args):
-        super(HwTxMetric, self).__init__(*args)
-
-    def calculate_metric(self):
-        return self._simple_metric('HardwareReceiveTimestamp',
-                                   'net_dev_xmit',
-                                   'Was talker intermediate data collected?')
+    def __init__(self, *args, **kwargs):
+        super(HwTxMetric, self).__init__(*args, **kwargs)
 
 
 class DriverRxMetric(MetricAnalysis):
     name = 'Driver Receive'
     short_name = 'Driver'
+    # Check stages.STAGES comment about negative Hardware Receive latency
+    stage = 'driver_rx'
+    columns = stage_columns(stage)
+    missing_hint = 'Was listener intermediate latency collected?'
 
-    def __init__(self, *args):
-        super(DriverRxMetric, self).__init__(*args)
-
-    # When more than one packet is processed for the same IRQ, RxHardware will
-    # be negative, since the new packet will be received after the IRQ. Instead
-    # of computing RxHardware negative, let's keep it at zero, and make
-    # RxDriver time to account for
-    # "napi_gro_receive_entry - HardwareReceiveTimestamp", as it's drivers
-    # fault (or feature) that IRQs were not used.
-    def calculate_metric(self):
-        try:
-            df = self.dataframe
-            m = pd.Series(np.int64(df['napi_gro_receive_entry'] -
-                          df['irq_handler_entry']) / 1000)
-            hw_m = df['irq_handler_entry'] - df['HardwareReceiveTimestamp']
-            m.where(hw_m > 0,
-                    np.int64(df['napi_gro_receive_entry'] -
-                             df['HardwareReceiveTimestamp']) / 1000,
-                    inplace=True)
-            return m
-        except KeyError as err:
-            raise KeyError(f'{err} not found. '
-                           'Was listener intermediate latency collected?')
+    def __init__(self, *args, **kwargs):
+        super(DriverRxMetric, self).__init__(*args, **kwargs)
 
 
 class DriverTxMetric(MetricAnalysis):
     name = 'Driver Transmit'
     short_name = 'Driver'
+    stage = 'driver_tx'
+    columns = stage_columns(stage)
+    missing_hint = 'Was talker intermediate data collected?'
 
-    def __init__(self, *args):
-        super(DriverTxMetric, self).__init__(*args)
-
-    def calculate_metric(self):
-        return self._simple_metric('net_dev_xmit',
-                                   'net_dev_start_xmit',
-                                   'Was talker intermediate data collected?')
+    def __init__(self, *args, **kwargs):
+        super(DriverTxMetric, self).__init__(*args, **kwargs)
 
 
 class NetCoreRxMetric(MetricAnalysis):
     name = 'Net-Core Receive'
     short_name = 'Net-Core'
+    stage = 'net_core_rx'
+    columns = stage_columns(stage)
+    missing_hint = 'Was listener intermediate data collected?'
 
-    def __init__(self, *args):
-        super(NetCoreRxMetric, self).__init__(*args)
-
-    def calculate_metric(self):
-        return self._simple_metric('netif_receive_skb',
-                                   'napi_gro_receive_entry',
-                                   'Was listener intermediate data collected?')
+    def __init__(self, *args, **kwargs):
+        super(NetCoreRxMetric, self).__init__(*args, **kwargs)
 
 
 class NetCoreTxMetric(MetricAnalysis):
     name = 'Net-Core Transmit'
     short_name = 'Net-Core'
+    stage = 'net_core_tx'
+    columns = stage_columns(stage)
+    missing_hint = 'Was talker intermediate data collected?'
 
-    def __init__(self, *args):
-        super(NetCoreTxMetric, self).__init__(*args)
-
-    def calculate_metric(self):
-        return self._simple_metric('net_dev_start_xmit',
-                                   'net_dev_queue',
-                                   'Was talker intermediate data collected?')
+    def __init__(self, *args, **kwargs):
+        super(NetCoreTxMetric, self).__init__(*args, **kwargs)
 
 
 class VLANTxMetric(MetricAnalysis):
     name = 'VLAN Transmit'
     short_name = 'VLAN'
+    stage = 'vlan_tx'
+    columns = stage_columns(stage)
+    missing_hint = 'Was talker intermediate data collected?'
 
-    def __init__(self, *args):
-        super(VLANTxMetric, self).__init__(*args)
-
-    def calculate_metric(self):
-        return self._simple_metric('net_dev_queue',
-                                   'net_dev_queue_vlan',
-                                   'Was talker intermediate data collected?')
+    def __init__(self, *args, **kwargs):
+        super(VLANTxMetric, self).__init__(*args, **kwargs)
 
 
 class SocketRxMetric(MetricAnalysis):
     name = 'Socket Receive'
     short_name = 'Socket'
+    stage = 'socket_rx'
+    columns = stage_columns(stage)
+    missing_hint = 'Was listener intermediate data collected?'
 
-    def __init__(self, *args):
-        super(SocketRxMetric, self).__init__(*args)
-
-    def calculate_metric(self):
-        return self._simple_metric('sys_exit_recvmsg',
-                                   'netif_receive_skb',
-                                   'Was listener intermediate data collected?')
+    def __init__(self, *args, **kwargs):
+        super(SocketRxMetric, self).__init__(*args, **kwargs)
 
 
 class SocketTxMetric(MetricAnalysis):
     name = 'Socket Transmit'
     short_name = 'Socket'
+    stage = 'socket_tx'
+    columns = stage_columns(stage)
+    missing_hint = 'Was talker intermediate data collected?'
 
-    def __init__(self, *args):
-        super(SocketTxMetric, self).__init__(*args)
-
-    def calculate_metric(self):
-        return self._simple_metric('net_dev_queue_vlan',
-                                   'sys_enter_sendto',
-                                   'Was talker intermediate data collected?')
+    def __init__(self, *args, **kwargs):
+        super(SocketTxMetric, self).__init__(*args, **kwargs)
 
 
 class ContextSwitchRxMetric(MetricAnalysis):
     name = 'Context Switch Receive'
     short_name = 'Context Switch'
+    stage = 'context_switch_rx'
+    columns = stage_columns(stage)
+    missing_hint = 'Was listener intermediate data collected?'
 
-    def __init__(self, *args):
-        super(ContextSwitchRxMetric, self).__init__(*args)
-
-    def calculate_metric(self):
-        return self._simple_metric('SoftwareReceiveTimestamp',
-                                   'sys_exit_recvmsg',
-                                   'Was listener intermediate data collected?')
+    def __init__(self, *args, **kwargs):
+        super(ContextSwitchRxMetric, self).__init__(*args, **kwargs)
 
 
 class ContextSwitchTxMetric(MetricAnalysis):
     name = 'Context Switch Transmit'
     short_name = 'Context Switch'
+    stage = 'context_switch_tx'
+    columns = stage_columns(stage)
+    missing_hint = 'Was talker intermediate data collected?'
 
-    def __init__(self, *args):
-        super(ContextSwitchTxMetric, self).__init__(*args)
-
-    def calculate_metric(self):
-        return self._simple_metric('sys_enter_sendto',
-                                   'SoftwareTransmitTimestamp',
-                                   'Was talker intermediate data collected?')
+    def __init__(self, *args, **kwargs):
+        super(ContextSwitchTxMetric, self).__init__(*args, **kwargs)
 
 
 class TotalHwMetric(MetricAnalysis):
     name = 'Total Hardware'
     short_name = 'Hardware'
+    stage = 'total_hw'
+    columns = stage_columns(stage)
+    missing_hint = 'Was talker intermediate latency collected?'
 
-    def __init__(self, *args):
-        super(TotalHwMetric, self).__init__(*args)
-
-    def calculate_metric(self):
-        # HW rx is a bit more complicated, let's use it's metric class
-        rx_hw = HwRxMetric(self.dataframe, self.results_dir, self.factors)
-        try:
-            m = np.int64(self.dataframe['HardwareReceiveTimestamp'] -
-                         self.dataframe['net_dev_xmit']) / 1000
-            return rx_hw.metric + m
-        except KeyError as err:
-            raise KeyError(f'{err} not found. '
-                           'Was talker intermediate latency collected?')
+    def __init__(self, *args, **kwargs):
+        super(TotalHwMetric, self).__init__(*args, **kwargs)
 
 
 class TotalSwMetric(MetricAnalysis):
     name = 'Total Software'
     short_name = 'Software'
+    stage = 'total_sw'
+    columns = stage_columns(stage)
+    missing_hint = 'Was talker intermediate latency collected?'
 
-    def __init__(self, *args):
-        super(TotalSwMetric, self).__init__(*args)
-
-    def calculate_metric(self):
-        # Driver rx is a bit more complicated, let's use it's metric class
-        rx_driver = DriverRxMetric(self.dataframe, self.results_dir,
-                                   self.factors)
-        try:
-            m = np.int64(self.dataframe['net_dev_xmit'] -
-                         self.dataframe['SoftwareTransmitTimestamp'] +
-                         self.dataframe['SoftwareReceiveTimestamp'] -
-                         self.dataframe['napi_gro_receive_entry']) / 1000
-            return rx_driver.metric + m
-        except KeyError as err:
-            raise KeyError(f'{err} not found. '
-                           'Was talker intermediate latency collected?')
+    def __init__(self, *args, **kwargs):
+        super(TotalSwMetric, self).__init__(*args, **kwargs)
 
 
 # Convenience lists of metric classes
@@ -323,3 +352,6 @@ tx_intermediate_classes = [HwTxMetric, DriverTxMetric, NetCoreTxMetric,
                            VLANTxMetric, SocketTxMetric,
                            ContextSwitchTxMetric]
 hw_sw_classes = [TotalHwMetric, TotalSwMetric]
+all_classes = [TotalRxMetric, TotalTxMetric, E2EMetric,
+               *rx_intermediate_classes, *tx_intermediate_classes,
+               *hw_sw_classes]
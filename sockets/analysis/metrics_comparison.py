@@ -2,33 +2,42 @@
 #
 # SPDX-License-Identifier: BSD-3-Clause
 
-import pandas as pd
 import os
 
-from plots import BiHistogram
+from histograms import merge_histograms
+from render import render
 
 
-# Generates a bihistogram comparing two sets of metrics.
+# Generates charts comparing sets of metrics: their histograms (a bihistogram,
+# if there are just two sets) and their overlaid cumulative distributions.
 class MetricsComparison():
-    # `metrics_a` and `metrics_b` should be pairs (A, B), where A is the name
-    # of the sets of metric (will appear as Y legend on bihistogram) and B is
-    # a list of metrics (such as a list of TotalRxMetric).
-    # `name` is the name of the comparison, will appear on the bihistogram
-    # title
-    def __init__(self, metrics_a, metrics_b, name, results_dir):
-        self.metrics_a = metrics_a
-        self.metrics_b = metrics_b
+    # `metric_sets` is a list of pairs (A, B), where A is the name of the set
+    # of metrics (will appear as Y legend on histograms and as legend on the
+    # CDF) and B is a list of metrics (such as a list of TotalRxMetric).
+    # `name` is the name of the comparison, will appear on the charts titles
+    def __init__(self, metric_sets, name, results_dir):
+        self.metric_sets = metric_sets
         self.results_dir = results_dir
         self.name = name
 
-    def plot(self):
-        values_a = pd.concat([metric.metric for metric in self.metrics_a[1]])
-        values_b = pd.concat([metric.metric for metric in self.metrics_b[1]])
-        bh = BiHistogram((self.metrics_a[0], values_a),
-                         (self.metrics_b[0], values_b))
+    # If `renderer` is not None, charts are drawn by it instead (see
+    # Renderer).
+    def plot(self, renderer=None):
+        from plots import BiHistogram, CdfPlot, HistogramComparison
+
+        histograms = [(label, merge_histograms(metric.histogram()
+                                               for metric in metrics))
+                      for label, metrics in self.metric_sets]
 
         os.makedirs(self.results_dir, exist_ok=True)
 
         norm_name = self.name.lower().replace(' ', '_')
-        filename = f'{self.results_dir}/{norm_name}-bi-hist.png'
-        bh.plot(self.name, filename)
+        if len(histograms) == 2:
+            render(BiHistogram(*histograms), self.name,
+                   f'{self.results_dir}/{norm_name}-bi-hist.png', renderer)
+        else:
+            render(HistogramComparison(histograms), self.name,
+                   f'{self.results_dir}/{norm_name}-hist.png', renderer)
+
+        render(CdfPlot(histograms), self.name,
+               f'{self.results_dir}/{norm_name}-cdf.png', renderer)
@@ -3,12 +3,14 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 import numpy as np
-import pandas as pd
 import os
 
+from aggregates import merge_aggregates
+from histograms import merge_histograms
+from metric_index import MetricIndex
 from metrics import (HwRxMetric, hw_sw_classes, rx_intermediate_classes,
                      tx_intermediate_classes)
-from plots import RunSequenceGroupPlot
+from render import render
 
 
 # Perform several analysis of groups of metrics, generating grouped scatter
@@ -16,51 +18,42 @@ from plots import RunSequenceGroupPlot
 class MetricGroupAnalysis():
     name = 'Add a proper name!'
 
+    # Metrics are looked up on an index of the group's own `metrics`, so
+    # that a group only ever sees them, even if other metrics of the same
+    # types were analysed.
     def __init__(self, metrics, results_dir):
         self.metrics = metrics
         self.results_dir = results_dir
+        self.index = MetricIndex(metrics)
         self.metrics_types = sorted({type(metric) for metric in self.metrics},
                                     key=lambda mt: mt.name)
         # Gets a list of unique factors
-        self.factors_list = [metric.factors for metric in self.metrics]
-        self.factors_list = [dict(f)
-                             for f in set(tuple(factor.items())
-                                          for factor in self.factors_list)]
-        self.factors_list.sort(key=lambda f:
-                               (f['PayloadSize'], f['TransmissionInterval']))
+        self.factors_list = self.index.factors_of(self.metrics_types)
 
     # Returns a list of dictionaries containing the stats for each metric, and
     # a special key 'metric', which contains the metric short name.
     # If summary is enabled, a final item is added to main list, where 'metric'
     # value is 'Total'.
+    # Stats are calculated merging the aggregates and histograms of each
+    # metric, so values are neither concatenated nor read again.
     def stats(self, summary=False):
         stats = []
+        type_aggregates = []
+        type_histograms = []
         for metric_type in self.metrics_types:
-            all_values = pd.concat([metric.metric
-                                    for metric in self.metrics
-                                    if isinstance(metric, metric_type)])
-            mean = np.mean(all_values)
-            stdev = np.std(all_values)
-            minimum = np.min(all_values)
-            maximum = np.max(all_values)
-            r = maximum - minimum
-            cv = (stdev / mean) * 100
-            stats.append({'metric': metric_type.short_name, 'mean': mean,
-                          'stdev': stdev, 'minimum': minimum,
-                          'maximum': maximum, 'r': r, 'cv': cv})
+            metrics = self.index.of([metric_type])
+            aggregate = merge_aggregates(m.aggregate() for m in metrics)
+            histogram = merge_histograms(m.histogram() for m in metrics)
+            type_aggregates.append(aggregate)
+            type_histograms.append(histogram)
+            stats.append({'metric': metric_type.short_name,
+                          **aggregate.stats(), **histogram.stats()})
 
         if summary:
-            all_values = pd.concat([metric.metric
-                                    for metric in self.metrics])
-            mean = np.mean(all_values)
-            stdev = np.std(all_values)
-            minimum = np.min(all_values)
-            maximum = np.max(all_values)
-            r = maximum - minimum
-            cv = (stdev / mean) * 100
-            stats.append({'metric': 'Total', 'mean': mean,
-                          'stdev': stdev, 'minimum': minimum,
-                          'maximum': maximum, 'r': r, 'cv': cv})
+            aggregate = merge_aggregates(type_aggregates)
+            histogram = merge_histograms(type_histograms)
+            stats.append({'metric': 'Total',
+                          **aggregate.stats(), **histogram.stats()})
 
         return stats
 
@@ -75,9 +68,7 @@ class MetricGroupAnalysis():
         stats = []
         for factors in self.factors_list:
             factor_stats = []
-            metrics = [metric
-                       for metric in self.metrics
-                       if metric.factors == factors]
+            metrics = self.index.of(self.metrics_types, factors)
             metrics.sort(key=lambda m: m.name)
 
             for metric in metrics:
@@ -87,7 +78,7 @@ class MetricGroupAnalysis():
 
         if summary:
             factor_stats = []
-            stats_per_type = self.stats()  # TODO maybe cache this?
+            stats_per_type = self.stats()
             for spt in stats_per_type:
                 factor_stats.append((spt['metric'], spt))
 
@@ -96,24 +87,35 @@ class MetricGroupAnalysis():
 
         return stats
 
-    def _plot(self, data_list, title, filename):
-        rsp = RunSequenceGroupPlot(data_list)
-        rsp.plot(title, filename)
+    def _plot(self, data_list, title, filename, renderer, style):
+        from plots import RunSequenceGroupPlot
 
-    def _run_sequence(self, metrics, title, filename, sw_transmit_time):
+        rsp = RunSequenceGroupPlot(data_list, style)
+        render(rsp, title, filename, renderer)
+
+    def _run_sequence(self, metrics, title, filename, sw_transmit_time,
+                      renderer, style):
         data_list = []
         for metric in metrics:
+            values = metric.metric / 1000
             if sw_transmit_time:
-                indices = pd.to_datetime(
-                        self.dataframe['SoftwareTransmitTimestamp'])
+                indices = np.asarray(
+                        metric.dataframe['SoftwareTransmitTimestamp']).astype(
+                                'datetime64[ns]')
             else:
-                indices = np.arange(len(metric.metric))
+                indices = np.arange(len(values))
 
-            data_list.append((metric.short_name, indices, metric.metric))
+            data_list.append((metric.short_name, indices, values,
+                              metric.histogram()))
 
-        self._plot(data_list, title, filename)
+        self._plot(data_list, title, filename, renderer, style)
 
-    def run_sequences(self, sw_transmit_time=False):
+    # If `manifest` is not None, only charts not up to date are drawn (see
+    # Manifest). If `renderer` is not None, charts are drawn by it instead
+    # (see Renderer). `style` is one of RUN_SEQUENCE_STYLES. Factors without
+    # values (of empty results files) have no chart.
+    def run_sequences(self, sw_transmit_time=False, manifest=None,
+                      renderer=None, style='scatter'):
         # Get dir ready
         charts_directory = f'{self.results_dir}/time_sequence'
         os.makedirs(charts_directory, exist_ok=True)
@@ -126,23 +128,27 @@ class MetricGroupAnalysis():
                         f'graph_{payload_size}_bytes_'
                         f'{transmission_interval_us}_us.png')
 
-            metrics = [metric
-                       for metric in self.metrics
-                       if metric.factors == factors]
+            metrics = self.index.of(self.metrics_types, factors)
+            if all(metric.aggregate().count == 0 for metric in metrics):
+                continue
+            if manifest is not None and not manifest.needs_chart(
+                    filename, metrics, [sw_transmit_time, style]):
+                continue
 
             title = (f'{self.name} Latency ('
                      f'Transmission Interval: {transmission_interval_us} us '
                      f'Payload: {payload_size} bytes '
                      f'Iterations: {len(metrics[0].metric)})')
 
-            self._run_sequence(metrics, title, filename, sw_transmit_time)
+            self._run_sequence(metrics, title, filename, sw_transmit_time,
+                               renderer, style)
 
 
 class RxIntermediateLatencyMetrics(MetricGroupAnalysis):
     name = 'Receive Intermediate'
 
-    def __init__(self, *args):
-        super(RxIntermediateLatencyMetrics, self).__init__(*args)
+    def __init__(self, *args, **kwargs):
+        super(RxIntermediateLatencyMetrics, self).__init__(*args, **kwargs)
         self._validate_metrics()
 
     def _validate_metrics(self):
@@ -151,8 +157,10 @@ class RxIntermediateLatencyMetrics(MetricGroupAnalysis):
             diff = self.metrics_types - valid_rx_metrics
             raise Exception(f'Invalid metric(s) for Rx Latency: {diff}')
 
-    def _plot(self, data_list, title, filename):
-        rsp = RunSequenceGroupPlot(data_list)
+    def _plot(self, data_list, title, filename, renderer, style):
+        from plots import RunSequenceGroupPlot
+
+        rsp = RunSequenceGroupPlot(data_list, style)
         for data in data_list:
             if data[0] == HwRxMetric.short_name:
                 rsp.colour_masks[data[0]] = [
@@ -160,14 +168,14 @@ class RxIntermediateLatencyMetrics(MetricGroupAnalysis):
                         {'mask': data[2] != 0, 'colour': 'C0'}
                 ]
 
-        rsp.plot(title, filename)
+        render(rsp, title, filename, renderer)
 
 
 class TxIntermediateLatencyMetrics(MetricGroupAnalysis):
     name = 'Transmit Intermediate'
 
-    def __init__(self, *args):
-        super(TxIntermediateLatencyMetrics, self).__init__(*args)
+    def __init__(self, *args, **kwargs):
+        super(TxIntermediateLatencyMetrics, self).__init__(*args, **kwargs)
         self._validate_metrics()
 
     def _validate_metrics(self):
@@ -180,8 +188,8 @@ class TxIntermediateLatencyMetrics(MetricGroupAnalysis):
 class HwVsSwLatencyMetrics(MetricGroupAnalysis):
     name = 'Hardware vs Software'
 
-    def __init__(self, *args):
-        super(HwVsSwLatencyMetrics, self).__init__(*args)
+    def __init__(self, *args, **kwargs):
+        super(HwVsSwLatencyMetrics, self).__init__(*args, **kwargs)
         self._validate_metrics()
 
     def _validate_metrics(self):
@@ -194,6 +202,6 @@ class HwVsSwLatencyMetrics(MetricGroupAnalysis):
 # Convenience class to group a single metric. Useful to get stats summary
 # for the metric.
 class SimpleMetricGroup(MetricGroupAnalysis):
-    def __init__(self, name, *args):
-        super(SimpleMetricGroup, self).__init__(*args)
+    def __init__(self, name, *args, **kwargs):
+        super(SimpleMetricGroup, self).__init__(*args, **kwargs)
         self.name = name
@@ -8,18 +8,139 @@ import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
 import numpy as np
 
+from histograms import LatencyHistogram
+from matplotlib.colors import LogNorm
 from matplotlib.ticker import (AutoMinorLocator, FuncFormatter, MaxNLocator,
                                FormatStrFormatter, LogLocator)
 
-
-class BiHistogram():
-    def __init__(self, values_a, values_b):
-        self.values_a = values_a
-        self.values_b = values_b
+# Run sequences with more than DECIMATION_THRESHOLD points are decimated
+# before being drawn: X-axis is split in DECIMATION_COLUMNS columns (about
+# the pixel columns of a chart at dpi=300) and only the minimum, maximum and
+# mean of each column are drawn. So drawing takes the same time whatever the
+# number of points, and isolated spikes are still shown.
+DECIMATION_COLUMNS = 2000
+DECIMATION_THRESHOLD = 10 * DECIMATION_COLUMNS
+
+# How run sequences are drawn: 'scatter' draws each point (decimated, if
+# too many), 'density' draws how many points fall on each cell of a
+# DENSITY_BINS (X-axis, Y-axis) grid, as a log-scaled image (see
+# RUN_SEQUENCE_STYLES on render.py).
+DENSITY_BINS = (500, 250)
+
+
+# X-axis values of `indices`, as numbers
+def _x_values(indices):
+    x = np.asarray(indices)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.view(np.int64)
+    return x
+
+
+# Splits X-axis range `x_range` (a pair, in _x_values() units) in `columns`
+# and returns a tuple (A, B, C, D), where A is the X-axis value of the
+# center of each column (same type of `indices`), and B, C and D are the
+# minimum, maximum and mean `values` on each column (NaN if there's none).
+def decimate(indices, values, x_range, columns=DECIMATION_COLUMNS):
+    x = _x_values(indices)
+    values = np.asarray(values, dtype=np.float64)
+    x_min, x_max = x_range
+    width = (x_max - x_min) / columns
+    scale = 1 / width if width > 0 else 0
+
+    centres = x_min + (np.arange(columns) + 0.5) * width
+    if np.issubdtype(np.asarray(indices).dtype, np.datetime64):
+        centres = centres.astype(np.int64).astype(np.asarray(indices).dtype)
+    minimum = np.full(columns, np.nan)
+    maximum = np.full(columns, np.nan)
+    mean = np.full(columns, np.nan)
+    if len(values) == 0:
+        return centres, minimum, maximum, mean
+
+    column = np.minimum(((x - x_min) * scale).astype(np.int64), columns - 1)
+    # Indices are usually sorted already
+    if np.any(column[1:] < column[:-1]):
+        order = np.argsort(column, kind='stable')
+        column = column[order]
+        values = values[order]
+
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(column)) + 1])
+    counts = np.diff(np.append(starts, len(column)))
+    used = column[starts]
+    minimum[used] = np.minimum.reduceat(values, starts)
+    maximum[used] = np.maximum.reduceat(values, starts)
+    mean[used] = np.add.reduceat(values, starts) / counts
+    return centres, minimum, maximum, mean
+
+
+# Cell of each value on `bins` cells evenly splitting `value_range`
+def _cells(values, value_range, bins):
+    low, high = value_range
+    scale = bins / (high - low) if high > low else 0
+    cells = ((values - low) * scale).astype(np.int64)
+    return np.minimum(cells, bins - 1)
+
+
+# Range of `values`, widened if they're all the same (as np.histogram2d()
+# does), so cells and the image have some size
+def _density_range(values):
+    low, high = np.min(values), np.max(values)
+    if low == high:
+        return (low - 0.5, high + 0.5)
+    return (low, high)
+
+
+# Number of points (`x`, `y`) on each cell of a `bins` grid over `x_range`
+# and `y_range`, as np.histogram2d() does. Cells are evenly spaced, so
+# they're calculated directly instead of searched for.
+def density(x, y, x_range, y_range, bins=DENSITY_BINS):
+    cells = _cells(x, x_range, bins[0]) * bins[1]
+    cells += _cells(y, y_range, bins[1])
+    counts = np.bincount(cells, minlength=bins[0] * bins[1])
+    return counts.reshape(bins)
+
+
+# Figures of charts already drawn, by layout. Charts of a layout drawn
+# before reuse its figure - with axes, scales, locators, formatters and labels
+# already set up - and only have their data, titles and limits replaced.
+# Building the figure is most of the time taken to draw a chart, and there
+# are dozens of charts of each layout on an analysis. Each process (see
+# Renderer) has its own figures.
+_templates = {}
+
+SUBPLOT_PARAMS = ['left', 'bottom', 'right', 'top', 'wspace', 'hspace']
+
+
+# Returns a pair (A, B), where A is the figure and B the axes of layout
+# `key`, built by `build` (which returns the same pair) if they don't exist
+# yet. Data of the chart previously drawn on the figure is removed.
+def _template(key, build):
+    if key not in _templates:
+        _templates[key] = build()
+    fig, axes = _templates[key]
+    for axis in fig.get_axes():
+        _clear_data(axis)
+    return fig, axes
+
+
+def _clear_data(axis):
+    for artist in [*axis.lines, *axis.collections, *axis.images,
+                   *axis.texts]:
+        artist.remove()
+    # So limits and colours are the same as on a new figure
+    axis.relim()
+    axis.set_prop_cycle(None)
+
+
+# Histograms of several sets of values, one per row, sharing the X-axis.
+# `histograms` is a list of pairs (A, B), where A is the label of the set and
+# B its LatencyHistogram.
+class HistogramComparison():
+    def __init__(self, histograms):
+        self.histograms = histograms
         self.xlabel = 'Latency (us)'
 
-    def _plot_hist(self, axis, label, data, colour):
-        hist, edges = np.histogram(data, bins='sqrt')
+    def _plot_hist(self, axis, label, histogram, colour):
+        hist, edges = histogram.bins()
         axis.fill_between(edges[:-1], hist, color=colour, antialiased=False,
                           rasterized=True)
         axis.set_yscale('log')
@@ -28,6 +149,47 @@ class BiHistogram():
         axis.set_ylabel(label)
         axis.grid(True, which='both', axis='x', linewidth=0.3)
 
+    def _format_x_axis(self, fig, axis):
+        axis.set_xlabel(self.xlabel, fontsize='x-small')
+        axis.tick_params(axis='x', which='both', labelsize='xx-small',
+                         labelrotation=45)
+
+        ax = axis.get_xaxis()
+        ax.set_minor_formatter(FormatStrFormatter("%.2f"))
+        ax.set_major_formatter(FormatStrFormatter("%.2f"))
+        for ax in fig.get_axes():
+            ax.label_outer()
+
+    def plot(self, title, filename):
+        # Rows keep the height they'd have on a bihistogram
+        height = mpl.rcParams['figure.figsize'][1]
+        fig, axes = plt.subplots(
+                len(self.histograms), 1, gridspec_kw={'hspace': 0.01},
+                sharex=True, squeeze=False,
+                figsize=(mpl.rcParams['figure.figsize'][0],
+                         max(height, height * len(self.histograms) / 2)))
+        axes = axes[:, 0]
+
+        for i, (label, histogram) in enumerate(self.histograms):
+            self._plot_hist(axes[i], label, histogram, f'C{i}')
+            axes[i].yaxis.label.set_fontsize('x-small')
+
+        self._format_x_axis(fig, axes[-1])
+        fig.suptitle(title)
+        fig.savefig(filename, dpi=300)
+        plt.close(fig)
+
+
+# Two histograms, the second one upside down below the first. `values_a` and
+# `values_b` are pairs (A, B), where A is the label and B the
+# LatencyHistogram of each side of the bihistogram. Both use the same fixed
+# bins, so they can be compared bin by bin.
+class BiHistogram(HistogramComparison):
+    def __init__(self, values_a, values_b):
+        super(BiHistogram, self).__init__([values_a, values_b])
+        self.values_a = values_a
+        self.values_b = values_b
+
     def plot(self, title, filename):
         fig, axes = plt.subplots(2, 1, gridspec_kw={'hspace': 0.01},
                                  sharex=True)
@@ -36,20 +198,78 @@ class BiHistogram():
         self._plot_hist(axes[1], self.values_b[0], self.values_b[1],
                         'cornflowerblue')
 
-        axes[1].set_xlabel(self.xlabel, fontsize='x-small')
-        axes[1].tick_params(axis='x', which='both', labelsize='xx-small',
-                            labelrotation=45)
         axes[1].invert_yaxis()
+        self._format_x_axis(fig, axes[1])
 
-        ax = axes[1].get_xaxis()
-        ax.set_minor_formatter(FormatStrFormatter("%.2f"))
-        ax.set_major_formatter(FormatStrFormatter("%.2f"))
-        for ax in fig.get_axes():
-            ax.label_outer()
+        fig.suptitle(title)
+        fig.savefig(filename, dpi=300)
+        plt.close(fig)
+
+
+# Cumulative distributions of several sets of values, overlaid. `histograms`
+# is a list of pairs (A, B), where A is the label of the set and B its
+# LatencyHistogram. Y-axis is on logit scale, so that both the median and
+# the tail percentiles are readable.
+class CdfPlot():
+    def __init__(self, histograms):
+        self.histograms = histograms
+        self.xlabel = 'Latency (us)'
+        self.ylabel = 'Fraction of values below'
+
+    def plot(self, title, filename):
+        fig, axis = plt.subplots()
+
+        for i, (label, histogram) in enumerate(self.histograms):
+            edges, fractions = histogram.cdf()
+            axis.step(edges, fractions, where='post', label=label,
+                      color=f'C{i}', linewidth=0.8)
+
+        axis.set_xscale('log')
+        axis.set_yscale('logit')
+        axis.tick_params(axis='both', which='both', labelsize='xx-small')
+        axis.grid(True, which='major', linewidth=0.3)
+        axis.set_xlabel(self.xlabel, fontsize='x-small')
+        axis.set_ylabel(self.ylabel, fontsize='x-small')
+        axis.legend(fontsize='x-small', loc='lower right')
 
         fig.suptitle(title)
-        plt.savefig(filename, dpi=300)
-        plt.close()
+        fig.savefig(filename, dpi=300)
+        plt.close(fig)
+
+
+# Latency stats over time windows (see time_windows.WindowedStats) of
+# several series, such as each factors of a metric. `series` is a list of
+# tuples (A, B, C, D), where A is the label of the series, B the start of
+# each window (in seconds since the first one), C the percentile latency
+# of each window, drawn as a line, and D its maximum, drawn dotted.
+class TimeWindowsPlot():
+    def __init__(self, series, percentile_label):
+        self.series = series
+        self.percentile_label = percentile_label
+        self.xlabel = 'Time since start (s)'
+        self.ylabel = 'Latency (us)'
+
+    def plot(self, title, filename):
+        fig, axis = plt.subplots()
+
+        for i, (label, starts, percentiles, maxima) in enumerate(
+                self.series):
+            axis.plot(starts, percentiles, color=f'C{i}', linewidth=0.8,
+                      label=f'{label} {self.percentile_label}')
+            axis.plot(starts, maxima, color=f'C{i}', linewidth=0.5,
+                      linestyle=':', label=f'{label} Max')
+
+        axis.tick_params(axis='both', which='both', labelsize='xx-small')
+        axis.grid(True, which='major', linewidth=0.3)
+        axis.set_xlabel(self.xlabel, fontsize='x-small')
+        axis.set_ylabel(self.ylabel, fontsize='x-small')
+        fig.subplots_adjust(right=0.75)
+        axis.legend(fontsize='xx-small', loc='upper left',
+                    bbox_to_anchor=(1.01, 1.))
+
+        fig.suptitle(title)
+        fig.savefig(filename, dpi=300)
+        plt.close(fig)
 
 
 class StackedBarChart():
@@ -73,6 +293,14 @@ class StackedBarChart():
 
     def plot(self, title, filename):
         values_colours = self.__attribute_colours()
+        # Room for at least 4 bars, widening the figure for more than that
+        x_max = max(4, (len(self.bars) - 1) * self.bar_distance + 1)
+        figsize = None
+        if x_max > 4:
+            width, height = mpl.rcParams['figure.figsize']
+            figsize = (width * (x_max + 1) / 5, height)
+        # Draw on a figure of its own, not on a template (see _template())
+        fig, ax = plt.subplots(figsize=figsize)
 
         indices = []
         index = 0
@@ -81,10 +309,10 @@ class StackedBarChart():
             cumu_col = 0
             for value in bar[1]:
                 height = value[1]
-                plt.bar(index, height, label=value[0],
-                        color=values_colours[value[0]], bottom=cumu_col)
-                plt.text(index, cumu_col + height / 2,  "%.3f" % height,
-                         ha='center', va='center', fontsize=7)
+                ax.bar(index, height, label=value[0],
+                       color=values_colours[value[0]], bottom=cumu_col)
+                ax.text(index, cumu_col + height / 2,  "%.3f" % height,
+                        ha='center', va='center', fontsize=7)
                 cumu_col = height + cumu_col
                 i = i + 1
 
@@ -92,45 +320,55 @@ class StackedBarChart():
             # Bigger increase to better space the bars
             index = index + self.bar_distance
 
-        ax = plt.gca()
         handles, labels = ax.get_legend_handles_labels()
         # Avoid legend repetition by using the label as a key to dict
         labels, handles = zip(*dict(zip(labels, handles)).items())
-        plt.subplots_adjust(right=0.8)
-        plt.legend(reversed(handles), reversed(labels), loc='upper left',
-                   fontsize='x-small', ncol=1, bbox_to_anchor=(1.01, 1.))
-        ax.set_xbound(-1, 4)
+        fig.subplots_adjust(right=0.8)
+        ax.legend(reversed(handles), reversed(labels), loc='upper left',
+                  fontsize='x-small', ncol=1, bbox_to_anchor=(1.01, 1.))
+        ax.set_xbound(-1, x_max)
         ax.set_xticks(indices)
         ax.set_xticklabels([bar[0] for bar in self.bars])
-        plt.title(title)
-        plt.xticks(fontsize='x-small')
-        plt.ylabel(self.ylabel)
-        plt.savefig(filename, dpi=300)
-        plt.close()
+        ax.set_title(title)
+        ax.tick_params(axis='x', labelsize='x-small')
+        ax.set_ylabel(self.ylabel)
+        fig.savefig(filename, dpi=300)
+        plt.close(fig)
 
 
+# Group of histograms sharing the same X-axis. Histograms are only kept
+# until plot(), which draws them all, so the group can be sent to another
+# process to be drawn.
 class HistogramGroupPlot():
     def __init__(self, group_size, min_latency, max_latency, iterations):
+        self.group_size = group_size
         self.min_latency = min_latency
         self.max_latency = max_latency
         self.iterations = iterations
-        self.fig, self.plots = plt.subplots(group_size, 1, sharex=True)
-        if not isinstance(self.plots, np.ndarray):
-            self.plots = np.array([self.plots])
-        self.plot_idx = 0
+        self.histograms = []
         self.xlabel = 'Latency (us)'
 
     def add_histogram(self, data, edges, mean, stdev, ylabel):
-        if self.plot_idx >= len(self.plots):
+        if len(self.histograms) >= self.group_size:
             raise Exception("Can't add more histograms: group_size too small")
 
-        plot = self.plots[self.plot_idx]
-        self.plot_idx += 1
+        self.histograms.append((data, edges, mean, stdev, ylabel))
 
-        plot.fill_between(edges[1:], data, antialiased=False, rasterized=True)
-        plot.set_xscale('log', subsx=[2, 4, 6, 8])
+    def _format_histogram(self, plot):
+        plot.set_xscale('log', subs=[2, 4, 6, 8])
         plot.set_yscale('log')
 
+        # Format the ticks and enable grid
+        ax = plot.get_xaxis()
+        ax.set_minor_formatter(FormatStrFormatter("%.2f"))
+        ax.set_major_formatter(FormatStrFormatter("%.2f"))
+        plot.tick_params(axis='x', which='both', labelsize='xx-small',
+                         labelrotation=45)
+        plot.grid(True, which='both', axis='x', linewidth=0.3)
+
+    def _plot_histogram(self, plot, data, edges, mean, stdev, ylabel):
+        plot.fill_between(edges[1:], data, antialiased=False, rasterized=True)
+
         # Set the labels
         plot.text(0.8, 0.8, f'Mean {mean:.2f} us', fontsize=5,
                   transform=plot.transAxes)
@@ -153,28 +391,47 @@ class HistogramGroupPlot():
             plot.minorticks_off()
         else:
             ax.set_major_locator(LogLocator())
+            # Minor ticks may have been turned off by a previous chart
+            plot.minorticks_on()
 
-        # Format the ticks and enable grid
-        ax.set_minor_formatter(FormatStrFormatter("%.2f"))
-        ax.set_major_formatter(FormatStrFormatter("%.2f"))
-        plot.tick_params(axis='x', which='both', labelsize='xx-small',
-                         labelrotation=45)
-        plot.grid(b=True, which='both', axis='x', linewidth=0.3)
+    def _build(self):
+        fig, plots = plt.subplots(self.group_size, 1, sharex=True)
+        if not isinstance(plots, np.ndarray):
+            plots = np.array([plots])
+
+        for plot in plots:
+            self._format_histogram(plot)
+            plot.label_outer()
+
+        plots[-1].set_xlabel(self.xlabel)
+        return fig, plots
 
     def plot(self, title, filename):
-        for ax in self.fig.get_axes():
-            ax.label_outer()
+        fig, plots = _template(('histogram_group', self.group_size),
+                               self._build)
 
-        self.plots[-1].set_xlabel(self.xlabel)
-        plt.tight_layout(pad=1.5)
-        self.fig.suptitle(title, y=0.99)
-        self.fig.savefig(filename, dpi=300)
-        plt.close()
+        for plot, histogram in zip(plots, self.histograms):
+            self._plot_histogram(plot, *histogram)
 
+        # Layout is calculated as on a new figure
+        fig.subplots_adjust(**{param: mpl.rcParams[f'figure.subplot.{param}']
+                               for param in SUBPLOT_PARAMS})
+        fig.suptitle(title, y=0.99, in_layout=False)
+        fig.tight_layout(pad=1.5)
+        fig.savefig(filename, dpi=300)
 
+
+# `data` is a pair (A, B), where A is the indices (X-axis) and B the values
+# to be plotted. The histogram beside the run sequence is drawn from
+# `histogram`, the LatencyHistogram of the values, if it's already known.
+# `style` is one of RUN_SEQUENCE_STYLES.
 class RunSequencePlot:
-    def __init__(self, data):
+    def __init__(self, data, histogram=None, style='scatter'):
         self.data = data
+        if histogram is None:
+            histogram = LatencyHistogram.of(data[1])
+        self.histogram = histogram
+        self.style = style
         self.colour_masks = [
                 {'mask': np.full_like(self.data[1], True, dtype=bool),
                     'colour': 'C0'}]
@@ -182,20 +439,27 @@ class RunSequencePlot:
     def _format_xtick(self, x, pos):
         return x / 1000000
 
-    def _plot_x_label(self, axis):
+    # Kind of X-axis for `indices`: 'iterations' or 'time'
+    def _x_kind(self, indices):
+        if np.issubdtype(np.asarray(indices).dtype, np.datetime64):
+            return 'time'
+        elif isinstance(indices, np.ndarray):
+            return 'iterations'
+        else:
+            raise Exception('Unknown indices type')
+
+    def _plot_x_label(self, axis, x_kind):
         xaxis = axis.get_xaxis()
 
-        if isinstance(self.data[0], np.ndarray):
+        if x_kind == 'iterations':
             xaxis.set_major_formatter(FuncFormatter(self._format_xtick))
             axis.set_xlabel('Iterations (millions)', fontsize='x-small')
-        elif np.issubdtype(self.data[0], np.datetime64):
+        else:
             xaxis_fmt = mdates.DateFormatter("%H:%M:%S")
             xaxis.set_major_formatter(xaxis_fmt)
             axis.set_xlabel('Time (hh:mm:ss)', fontsize='x-small')
             axis.tick_params('x', labelrotation=90)
-            plt.subplots_adjust(bottom=0.2)
-        else:
-            raise Exception('Unknown indices type')
+            axis.figure.subplots_adjust(bottom=0.2)
 
         xaxis.set_minor_locator(AutoMinorLocator())
         xaxis.set_major_locator(MaxNLocator(nbins='auto', prune='upper'))
@@ -206,84 +470,157 @@ class RunSequencePlot:
         axis.margins(x=0)
 
     def _plot_scatter(self, axis, indices, values):
+        values = np.asarray(values)
+        if len(values) > DECIMATION_THRESHOLD:
+            self._plot_decimated(axis, indices, values)
+            return
+
         for mask in self.colour_masks:
             axis.plot(indices[mask['mask']], values[mask['mask']], marker='.',
                       markersize=1, linestyle='', c=mask['colour'],
                       rasterized=True)
 
-    def _plot_histogram(self, axis, values):
-        hist, edges = np.histogram(values, bins='sqrt')
-        axis.fill_betweenx(edges[:-1], hist, color='#9ec0ff',
-                           antialiased=False, rasterized=True)
+    # Draws the range (minimum to maximum) of the values of each column as a
+    # band, and their minimum, maximum and mean as points, so that points
+    # alone on a column are still visible. Each colour mask is decimated on
+    # its own, on the same columns.
+    def _plot_decimated(self, axis, indices, values):
+        x = _x_values(indices)
+        x_range = (np.min(x), np.max(x))
+        for mask in self.colour_masks:
+            centres, minimum, maximum, mean = decimate(
+                    indices[mask['mask']], values[mask['mask']], x_range)
+            axis.fill_between(centres, minimum, maximum,
+                              where=~np.isnan(minimum), step='mid',
+                              color=mask['colour'], alpha=0.4, linewidth=0,
+                              rasterized=True)
+            for envelope in [minimum, maximum, mean]:
+                axis.plot(centres, envelope, marker='.', markersize=1,
+                          linestyle='', c=mask['colour'], rasterized=True)
+
+    # Draws the number of values on each cell of a DENSITY_BINS grid over
+    # the range of indices and values. Colour masks are not used, as the
+    # colour is the number of values.
+    def _plot_density(self, axis, indices, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        x = _x_values(indices)
+        x_range = _density_range(x)
+        y_range = _density_range(values)
+        counts = density(x, values, x_range, y_range)
+
+        extent = [*x_range, *y_range]
+        if np.issubdtype(np.asarray(indices).dtype, np.datetime64):
+            extent[:2] = mdates.date2num(np.asarray(
+                    x_range, dtype=np.asarray(indices).dtype))
+        # Empty cells are left blank
+        axis.imshow(np.ma.masked_equal(counts.T, 0), origin='lower',
+                    extent=extent, aspect='auto', interpolation='nearest',
+                    norm=LogNorm(vmin=1), cmap='viridis', rasterized=True)
+
+    def _plot_run_sequence(self, axis, indices, values):
+        if self.style == 'density':
+            self._plot_density(axis, indices, values)
+        elif self.style == 'scatter':
+            self._plot_scatter(axis, indices, values)
+        else:
+            raise Exception(f'Unknown run sequence style: {self.style}')
+
+    def _format_histogram(self, axis):
         axis.set_yticks([])
         axis.set_xscale('log')
-        axis.set_xlim(left=0.9, right=len(values))
         axis.minorticks_on()
         axis.tick_params(labelsize='xx-small')
         axis.grid(True, which='both', axis='x', linewidth=0.3)
         axis.set_xlabel('Frequency', fontsize='x-small')
 
-    def plot(self, title, filename):
+    def _plot_histogram(self, axis, histogram):
+        hist, edges = histogram.bins()
+        axis.fill_betweenx(edges[:-1], hist, color='#9ec0ff',
+                           antialiased=False, rasterized=True)
+        axis.set_xlim(left=0.9, right=histogram.count)
+
+    def _build(self, x_kind):
         fig, axes = plt.subplots(1, 2, gridspec_kw={'width_ratios': [2, 1],
                                                     'wspace': 0.01})
+        self._plot_x_label(axes[0], x_kind)
+        self._plot_y_label(axes[0])
+        self._format_histogram(axes[1])
+        return fig, axes
 
+    def plot(self, title, filename):
         indices = self.data[0]
         values = self.data[1]
 
-        self._plot_x_label(axes[0])
-        self._plot_y_label(axes[0])
-        self._plot_scatter(axes[0], indices, values)
-        self._plot_histogram(axes[1], values)
+        x_kind = self._x_kind(indices)
+        fig, axes = _template(('run_sequence', x_kind),
+                              lambda: self._build(x_kind))
+
+        self._plot_run_sequence(axes[0], indices, values)
+        self._plot_histogram(axes[1], self.histogram)
 
         fig.suptitle(title, fontsize=8)
-        plt.savefig(filename, dpi=300)
-        plt.close()
+        fig.savefig(filename, dpi=300)
 
 
+# `data_list` is a list of tuples (A, B, C) or (A, B, C, D), where A is the
+# name of the metric, B the indices, C the values and D the LatencyHistogram
+# of the values, if already known. `style` is one of RUN_SEQUENCE_STYLES.
 class RunSequenceGroupPlot(RunSequencePlot):
-    def __init__(self, data_list):
+    def __init__(self, data_list, style='scatter'):
         self.data_list = data_list
+        self.style = style
         self.colour_masks = dict()
         for data in self.data_list:
             self.colour_masks[data[0]] = [
                     {'mask': np.full_like(data[2], True, dtype=bool),
                         'colour': 'C0'}]
 
-    def plot(self, title, filename):
+    def _build(self, x_kind):
         fig, axes = plt.subplots(len(self.data_list), 2,
                                  gridspec_kw={'width_ratios': [2, 1],
                                               'wspace': 0.01})
         if not isinstance(axes[0], np.ndarray):
             axes = np.array([axes])
 
+        for ax in axes:
+            self._plot_x_label(ax[0], x_kind)
+            ax[0].tick_params(labelsize='xx-small')
+            ax[0].margins(x=0)
+            self._format_histogram(ax[1])
+
+        for ax in fig.get_axes():
+            ax.label_outer()
+
+        return fig, axes
+
+    def plot(self, title, filename):
+        x_kind = self._x_kind(self.data_list[0][1])
+        fig, axes = _template(
+                ('run_sequence_group', len(self.data_list), x_kind),
+                lambda: self._build(x_kind))
+
         # We'll lie to parent that colour_masks is a simple array of masks
         all_colour_masks = self.colour_masks
         for (ax, data) in zip(axes, self.data_list):
-            self.data = data[1:]
-
             name = data[0]
             indices = data[1]
             values = data[2]
+            if len(data) > 3:
+                histogram = data[3]
+            else:
+                histogram = LatencyHistogram.of(values)
 
             # Here we lie
             self.colour_masks = all_colour_masks[data[0]]
 
-            self._plot_x_label(ax[0])
-            self._plot_y_label(ax[0], f'{name} (us)')
-            self._plot_scatter(ax[0], indices, values)
-            self._plot_histogram(ax[1], values)
+            ax[0].set_ylabel(f'{name} (us)', fontsize='x-small')
+            self._plot_run_sequence(ax[0], indices, values)
+            self._plot_histogram(ax[1], histogram)
 
         # Undo the lie
         self.colour_masks = all_colour_masks
 
-        for ax in fig.get_axes():
-            ax.label_outer()
-
         fig.suptitle(title, fontsize=8)
-        plt.savefig(filename, dpi=300)
-        plt.close()
-
-    def _plot_y_label(self, axis, label):
-        axis.set_ylabel(label, fontsize='x-small')
-        axis.tick_params(labelsize='xx-small')
-        axis.margins(x=0)
+        fig.savefig(filename, dpi=300)
@@ -0,0 +1,127 @@
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import math
+
+from aggregates import merge_aggregates
+from histograms import merge_histograms
+from metrics import all_classes
+from significance import bootstrap_percentile_difference
+
+# Defaults of check(): significance level of the tests, and smallest change
+# (in percent) flagged, so that tiny (but significant, on millions of
+# values) shifts don't fail a check
+DEFAULT_ALPHA = 0.01
+DEFAULT_TOLERANCE = 5
+DEFAULT_MAX_TOLERANCE = 20
+
+REGRESSION = 'REGRESSION'
+IMPROVEMENT = 'improvement'
+
+
+# Two-sided p-value of Welch's t-test of the means of aggregates `a` and `b`.
+# Uses the normal approximation, fine for the thousands of values (at least)
+# of any results file.
+def welch_t_test(a, b):
+    if a.count < 2 or b.count < 2:
+        return math.nan
+    se = math.sqrt(a.m2 / (a.count - 1) / a.count +
+                   b.m2 / (b.count - 1) / b.count)
+    if se == 0:
+        return 1.0 if a.mean == b.mean else 0.0
+    return math.erfc(abs(b.mean - a.mean) / se / math.sqrt(2))
+
+
+# Change from `a` to `b`, in percent
+def _change(a, b):
+    if a == 0:
+        return 0.0 if b == 0 else math.copysign(math.inf, b)
+    return (b - a) / abs(a) * 100
+
+
+def _verdict(significant, change, tolerance):
+    if not significant or abs(change) <= tolerance:
+        return ''
+    return REGRESSION if change > 0 else IMPROVEMENT
+
+
+# Rows of check() for a single metric and factors
+def _check_summary(name, factors, baseline, current, alpha, tolerance,
+                   max_tolerance):
+    (aggregate_a, histogram_a), (aggregate_b, histogram_b) = baseline, current
+    row = {'metric': name, 'factors': factors}
+
+    p = welch_t_test(aggregate_a, aggregate_b)
+    change = _change(aggregate_a.mean, aggregate_b.mean)
+    rows = [{**row, 'stat': 'Mean', 'baseline': aggregate_a.mean,
+             'current': aggregate_b.mean, 'change': change,
+             'evidence': f'p={p:.3g}',
+             'verdict': _verdict(p < alpha, change, tolerance)}]
+
+    p99_a = histogram_a.percentile(99)
+    p99_b = histogram_b.percentile(99)
+    low, high = bootstrap_percentile_difference(
+            histogram_a, histogram_b, confidence=100 * (1 - alpha))
+    change = _change(p99_a, p99_b)
+    rows.append({**row, 'stat': 'P99', 'baseline': p99_a, 'current': p99_b,
+                 'change': change, 'evidence': f'[{low:.3f}, {high:.3f}]',
+                 'verdict': _verdict(low > 0 or high < 0, change, tolerance)})
+
+    # There's no test for the maximum, a single value: only its change
+    change = _change(aggregate_a.maximum, aggregate_b.maximum)
+    rows.append({**row, 'stat': 'Max', 'baseline': aggregate_a.maximum,
+                 'current': aggregate_b.maximum, 'change': change,
+                 'evidence': '', 'verdict': _verdict(True, change,
+                                                     max_tolerance)})
+    return rows
+
+
+# Whether the metric of `key` on `summaries` has any values. Metrics of
+# empty results files don't, and are as good as missing.
+def _has_values(summaries, key):
+    return key in summaries and summaries[key][0].count > 0
+
+
+# Checks summaries `current` against `baseline` (both in the format of
+# export.summaries_of()), for each metric and factors on both, and for each
+# metric with all those factors merged. Metrics without values are skipped.
+# The mean is compared with Welch's t-test and the P99 with a bootstrap
+# confidence interval of its change, both at `alpha` significance level.
+# Significant changes bigger than `tolerance` percent are flagged, as are
+# changes of the maximum bigger than `max_tolerance` percent.
+#
+# Returns a pair (A, B), where A is a list of dictionaries, one per metric,
+# factors and stat ('Mean', 'P99' or 'Max'), with their baseline and current
+# values, the change in percent, the test 'evidence' (p-value or confidence
+# interval, in microseconds) and the 'verdict' (REGRESSION, IMPROVEMENT or
+# empty). B is the list of keys of `baseline` missing from `current` (or
+# without values on it).
+def check(baseline, current, alpha=DEFAULT_ALPHA, tolerance=DEFAULT_TOLERANCE,
+          max_tolerance=DEFAULT_MAX_TOLERANCE):
+    rows = []
+    for metric_cls in all_classes:
+        keys = sorted(key for key in baseline
+                      if key[0] == metric_cls and
+                      _has_values(baseline, key) and
+                      _has_values(current, key))
+        if len(keys) == 0:
+            continue
+
+        pairs = [({'PayloadSize': key[1], 'TransmissionInterval': key[2]},
+                  baseline[key], current[key]) for key in keys]
+        if len(keys) > 1:
+            pairs.append(({'PayloadSize': 'ALL',
+                           'TransmissionInterval': 'ALL'},
+                          *[(merge_aggregates(s[key][0] for key in keys),
+                             merge_histograms(s[key][1] for key in keys))
+                            for s in (baseline, current)]))
+
+        for factors, summary_a, summary_b in pairs:
+            rows.extend(_check_summary(metric_cls.name, factors, summary_a,
+                                       summary_b, alpha, tolerance,
+                                       max_tolerance))
+
+    missing = [key for key in baseline if _has_values(baseline, key) and
+               not _has_values(current, key)]
+    return rows, missing
@@ -0,0 +1,60 @@
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import multiprocessing
+
+from concurrent.futures import (ALL_COMPLETED, FIRST_COMPLETED,
+                                ProcessPoolExecutor, wait)
+
+# How run sequences are drawn: 'scatter' draws each point (decimated, if
+# too many), 'density' draws how many points fall on each cell of a grid, as
+# a log-scaled image (see plots.py). Density charts take the same time
+# whatever the number of points and show where most of them are, which
+# scatters of millions of points hide. Kept here, rather than on plots.py,
+# so that scripts can offer them without loading matplotlib.
+RUN_SEQUENCE_STYLES = ['scatter', 'density']
+
+
+# Draws charts on a pool of processes. Charts are plot objects (from
+# plots.py) holding just the data they need, so they're sent as is to the
+# pool, where they're drawn (and saved) with the Agg backend. The number of
+# charts waiting to be drawn is limited, so that data of every chart of an
+# analysis doesn't pile up in memory.
+#
+# Processes are started by a fork server, rather than forked from this
+# process: matplotlib (FreeType, namely) state isn't fork-safe, so processes
+# forked after this one drew anything could draw garbled text.
+class Renderer():
+    def __init__(self, workers):
+        self.executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('forkserver'))
+        self.max_pending = 2 * workers
+        self.pending = set()
+
+    def submit(self, plot, title, filename):
+        if len(self.pending) >= self.max_pending:
+            self._wait(FIRST_COMPLETED)
+        self.pending.add(self.executor.submit(plot.plot, title, filename))
+
+    def _wait(self, return_when):
+        done, self.pending = wait(self.pending, return_when=return_when)
+        # Raise any error that happened while drawing
+        for future in done:
+            future.result()
+
+    # Waits for all charts to be drawn
+    def close(self):
+        try:
+            self._wait(ALL_COMPLETED)
+        finally:
+            self.executor.shutdown()
+
+
+# Draws `plot` on `renderer` if not None, or right away otherwise
+def render(plot, title, filename, renderer=None):
+    if renderer is None:
+        plot.plot(title, filename)
+    else:
+        renderer.submit(plot, title, filename)
@@ -0,0 +1,285 @@
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import csv
+import os
+
+from metrics import (E2EMetric, TotalRxMetric, TotalTxMetric, all_classes,
+                     hw_sw_classes, rx_intermediate_classes,
+                     tx_intermediate_classes)
+from significance import CONFIDENCE
+from streaming import group_of
+from tabulate import tabulate
+from time_windows import WINDOW_PERCENTILE
+
+
+def report_intermediate_stats(name, stats, m_classes, dir_name):
+    header = ['PayloadSize', 'TransmissionInterval']
+    for m_class in m_classes:
+        header.append(f'{m_class.short_name}\nMean')
+        header.append(f'{m_class.short_name}\nMax')
+        header.append(f'{m_class.short_name}\nP99')
+
+    table = []
+    for stat in stats:
+        table.append([stat[0]['PayloadSize'],
+                     fmt_trans_int(stat[0]['TransmissionInterval'])])
+
+        # Go over classes so we can keep table ordered by "layer"
+        for m_class in m_classes:
+            fs = [s for s in stat[1] if s[0] == m_class.short_name][0]
+            table[-1].append(fs[1]['mean'])
+            table[-1].append(fs[1]['maximum'])
+            table[-1].append(fs[1]['p99'])
+
+    with open(f'{dir_name}/latency_stats_per_experiment.txt', 'w') as f:
+        f.write(f'{name} Latency Statistics (Per Experiment)\n\n')
+        f.write(tabulate(table, header, tablefmt='grid', floatfmt='.3f'))
+
+
+def fmt_trans_int(ti):
+    return ti if isinstance(ti, str) else int(ti / 1000)
+
+
+def report_intermediate_overall_stats(name, m_classes, stats, total_stats,
+                                      dir_name):
+    header = ['Metric', 'Mean(us)', 'Stdev(us)', 'Min(us)', 'Max(us)',
+              'Range(us)', 'CV', 'P99(us)', 'P99.9(us)', 'P99.99(us)']
+    table = []
+
+    # Go over classes so we can keep table ordered by "layer"
+    for m_class in m_classes:
+        s = [s for s in stats if s['metric'] == m_class.short_name][0]
+        table.append([s['metric'], s['mean'], s['stdev'],
+                     s['minimum'], s['maximum'], s['r'], s['cv'],
+                     s['p99'], s['p99_9'], s['p99_99']])
+
+    s = total_stats[-1]
+    table.append(['Total Latency', s['mean'], s['stdev'], s['minimum'],
+                 s['maximum'], s['r'], s['cv'],
+                 s['p99'], s['p99_9'], s['p99_99']])
+
+    norm_name = name.lower().replace(' ', '_')
+    with open(f'{dir_name}/{norm_name}_latency_overall_stats.txt', 'w') as f:
+        f.write(f'Overall {name} Latency Statistics\n\n')
+        f.write(tabulate(table, header, tablefmt='grid', floatfmt='.3f'))
+
+
+def report_single_metric_stats(stats, name, dir_name):
+    header = ['Payload(bytes)', 'TransmissionInterval(us)', 'Mean(us)',
+              'Stdev(us)', 'Min(us)', 'Max(us)', 'Range(us)', 'CV',
+              'P99(us)', 'P99.9(us)', 'P99.99(us)']
+
+    table = []
+    for stat in stats:
+        # Check MetricGroupAnalysis.stats_per_factor() if curious
+        # about [1][0][1]
+        s = stat[1][0][1]
+        table.append([stat[0]['PayloadSize'],
+                     fmt_trans_int(stat[0]['TransmissionInterval'])])
+        table[-1].extend([s['mean'], s['stdev'], s['minimum'], s['maximum'],
+                         s['r'], s['cv'], s['p99'], s['p99_9'], s['p99_99']])
+
+    with open(f'{dir_name}/latency_stats_per_experiment.txt', 'w') as f:
+        f.write(f'{name} Latency Statistics (Per Experiment)\n\n')
+        f.write(tabulate(table, header, tablefmt='grid', floatfmt='.3f'))
+
+
+# `comparisons` is a list of tuples (A, B, C, D), where A is the metric
+# short name, B the factors (as on stats_per_factor()), C the name of the
+# comparison and D the results of significance.compare()
+def report_significance(comparisons, dir_name):
+    header = ['Metric', 'Payload(bytes)', 'TransmissionInterval(us)',
+              'Comparison', 'KS D', 'KS p', 'P(B>A)', 'MWU p', 'A P99(us)',
+              'B P99(us)', 'P99 B-A(us)', 'CI Low(us)', 'CI High(us)']
+    # p-values can be tiny, so they get significant digits instead
+    floatfmt = ['', '', '', '', '.4f', '.3g', '.4f', '.3g', '.3f', '.3f',
+                '.3f', '.3f', '.3f']
+
+    table = []
+    for short_name, factors, name, result in comparisons:
+        table.append([short_name, factors['PayloadSize'],
+                      fmt_trans_int(factors['TransmissionInterval']), name,
+                      result['ks_statistic'], result['ks_p'],
+                      result['mwu_probability'], result['mwu_p'],
+                      result['p99_a'], result['p99_b'],
+                      result['p99_difference'], result['p99_difference_low'],
+                      result['p99_difference_high']])
+
+    with open(f'{dir_name}/significance.txt', 'w') as f:
+        f.write('Significance of Differences (B vs A: Kolmogorov-Smirnov, '
+                'Mann-Whitney U and\n'
+                f'{CONFIDENCE}% bootstrap confidence interval of the P99 '
+                'difference)\n\n')
+        f.write(tabulate(table, header, tablefmt='grid', floatfmt=floatfmt))
+
+
+# Table of the rows of regression.check()
+def regression_table(rows):
+    header = ['Metric', 'Payload(bytes)', 'TransmissionInterval(us)', 'Stat',
+              'Baseline(us)', 'Current(us)', 'Change(%)', 'Evidence',
+              'Verdict']
+    table = [[row['metric'], row['factors']['PayloadSize'],
+              fmt_trans_int(row['factors']['TransmissionInterval']),
+              row['stat'], row['baseline'], row['current'], row['change'],
+              row['evidence'], row['verdict']] for row in rows]
+    return tabulate(table, header, tablefmt='grid', floatfmt='.3f')
+
+
+# Writes the stats reports of `summaries` (in the format of
+# export.summaries_of()) to `graphs_dir`, on the same files of the regular
+# analysis.
+def report_summaries(summaries, graphs_dir):
+    # General metrics
+    for metric_cls in [TotalRxMetric, TotalTxMetric, E2EMetric]:
+        group = group_of(summaries, [metric_cls], metric_cls.name)
+        if group is None:
+            continue
+
+        dir_name = f'{graphs_dir}/{metric_cls.norm_name()}'
+        os.makedirs(dir_name, exist_ok=True)
+        report_single_metric_stats(group.stats_per_factor(summary=True),
+                                   metric_cls.name, dir_name)
+
+    # Intermediate and HW vs SW
+    intermediate = [('Receive', rx_intermediate_classes, TotalRxMetric,
+                     'receive_intermediate'),
+                    ('Transmit', tx_intermediate_classes, TotalTxMetric,
+                     'transmit_intermediate'),
+                    ('Hardware vs Software', hw_sw_classes, None,
+                     'hw_vs_sw')]
+    for (name, m_classes, total_cls, dir_name) in intermediate:
+        group = group_of(summaries, m_classes, name)
+        if group is None:
+            continue
+
+        dir_name = f'{graphs_dir}/{dir_name}'
+        os.makedirs(dir_name, exist_ok=True)
+        report_intermediate_stats(name, group.stats_per_factor(summary=True),
+                                  m_classes, dir_name)
+
+        total_group = None
+        if total_cls is not None:
+            total_group = group_of(summaries, [total_cls])
+        if total_group is not None:
+            report_intermediate_overall_stats(name, m_classes, group.stats(),
+                                              total_group.stats(), dir_name)
+
+
+def runs_table(runs):
+    header = ['Results', 'Platform', 'Socket', 'XDP Mode', 'XDP Copy',
+              'Qdisc', 'Kernel', 'Started', 'Analysed']
+    table = [[run['results_dir'], run['platform'], run['socket_type'],
+              run['xdp_mode'], run['xdp_copy_mode'], run['qdisc_profile'],
+              run['kernel'], run['started'], run['analysed']]
+             for run in runs]
+    return tabulate(table, header, tablefmt='grid', missingval='-')
+
+
+def stats_table(rows):
+    header = ['Results', 'Platform', 'Socket', 'XDP Mode', 'Qdisc', 'Kernel',
+              'Metric', 'Payload(bytes)', 'TransmissionInterval(us)', 'Count',
+              'Mean', 'Max', 'P50', 'P99', 'P99.9', 'P99.99']
+    table = [[os.path.basename(row['results_dir']), row['platform'],
+              row['socket_type'], row['xdp_mode'], row['qdisc_profile'],
+              row['kernel'], row['metric'], row['payload_size'],
+              fmt_trans_int(row['transmission_interval']), row['count'],
+              row['mean'], row['maximum'], row['p50'], row['p99'],
+              row['p99_9'], row['p99_99']] for row in rows]
+    return tabulate(table, header, tablefmt='grid', floatfmt='.3f',
+                    missingval='-')
+
+
+def worst_packets_file(metric_cls, graphs_dir):
+    return f'{graphs_dir}/worst_packets/{metric_cls.norm_name()}.csv'
+
+
+# Writes the worst packets of `metric_cls` on `worst` (as returned by
+# worst_packets.worst_packets_of()) to its worst_packets_file(): a row per
+# packet, worst first for each factors, with its line on the results file,
+# latency, the stage it's attributed to, the latency of each stage the metric
+# is split into and all its timestamps. All latencies are in microseconds.
+# Factors without packets (such as those of empty results files) have no
+# rows.
+def report_worst_packets(metric_cls, worst, graphs_dir):
+    file_name = worst_packets_file(metric_cls, graphs_dir)
+    stage_names = {m_class.stage: m_class.name for m_class in all_classes}
+    keys = sorted(key for key in worst
+                  if key[0] == metric_cls and len(worst[key].rows) > 0)
+    packets = [(key, worst[key].packets(metric_cls.stage)) for key in keys]
+
+    parts = []
+    timestamps = []
+    for _, factor_packets in packets:
+        parts.extend(part for part in factor_packets['parts']
+                     if part not in parts)
+        timestamps.extend(column for column in factor_packets['timestamps']
+                          if column not in timestamps)
+
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    with open(file_name, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['PayloadSize', 'TransmissionInterval', 'CSVLine',
+                         'Latency(us)', 'Stage',
+                         *[f'{stage_names[part]}(us)' for part in parts],
+                         *timestamps])
+        for key, factor_packets in packets:
+            for i, row in enumerate(factor_packets['rows']):
+                part_values = [factor_packets['parts'].get(part)
+                               for part in parts]
+                columns = [factor_packets['timestamps'].get(column)
+                           for column in timestamps]
+                # Line 1 of the results file is its header
+                writer.writerow(
+                        [key[1], key[2], int(row) + 2,
+                         f'{factor_packets["values"][i]:.3f}',
+                         stage_names[factor_packets['stage'][i]],
+                         *['' if v is None else f'{v[i]:.3f}'
+                           for v in part_values],
+                         *['' if v is None else int(v[i]) for v in columns]])
+
+
+# Writes the worst packets of each metric on `worst` (as returned by
+# worst_packets.worst_packets_of()), as on report_worst_packets()
+def report_all_worst_packets(worst, graphs_dir):
+    for metric_cls in all_classes:
+        if any(key[0] == metric_cls for key in worst):
+            report_worst_packets(metric_cls, worst, graphs_dir)
+
+
+def time_windows_file(metric_cls, graphs_dir):
+    return f'{graphs_dir}/time_windows/{metric_cls.norm_name()}.csv'
+
+
+# Writes the WindowedStats of `metric_cls` on `windowed` (as returned by
+# time_windows.windowed_stats_of()) to its time_windows_file(): a row per
+# factors and window with any packet, with the window start (nanoseconds of
+# SoftwareTransmitTimestamp) and the count, mean, P99 and maximum latency of
+# its packets, in microseconds
+def report_time_windows(metric_cls, windowed, graphs_dir):
+    file_name = time_windows_file(metric_cls, graphs_dir)
+    keys = sorted(key for key in windowed if key[0] == metric_cls)
+
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    with open(file_name, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['PayloadSize', 'TransmissionInterval',
+                         'WindowStart', 'Count', 'Mean(us)',
+                         f'P{WINDOW_PERCENTILE}(us)', 'Max(us)'])
+        for key in keys:
+            series = windowed[key].series()
+            for i, start in enumerate(series['start']):
+                writer.writerow([key[1], key[2], int(start),
+                                 int(series['count'][i]),
+                                 f'{series["mean"][i]:.3f}',
+                                 f'{series["percentile"][i]:.3f}',
+                                 f'{series["maximum"][i]:.3f}'])
+
+
+# Writes the WindowedStats of each metric on `windowed`, as on
+# report_time_windows()
+def report_all_time_windows(windowed, graphs_dir):
+    for metric_cls in all_classes:
+        if any(key[0] == metric_cls for key in windowed):
+            report_time_windows(metric_cls, windowed, graphs_dir)
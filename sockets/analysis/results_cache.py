@@ -0,0 +1,248 @@
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import hashlib
+import json
+import numpy as np
+import os
+import shutil
+import warnings
+
+from itertools import islice
+
+# Timestamps are stored on the cache as raw little-endian int64 values
+COLUMN_DTYPE = np.dtype('<i8')
+
+# Number of rows parsed at a time when converting a CSV file to the cache, so
+# that conversion doesn't need the whole CSV in memory
+CONVERSION_CHUNK_ROWS = 1 << 20
+
+
+# Returns the list of columns on the header of a results CSV file
+def csv_header(file_name):
+    with open(file_name, 'r') as f:
+        return f.readline().strip().split(',')
+
+
+# Mapping of column names to arrays, with the columns of a results file.
+# Used in place of a dataframe by metrics.
+class Columns(dict):
+    @property
+    def columns(self):
+        return list(self.keys())
+
+
+# Parses `lines` of a results CSV file as Columns named `names`, taken from
+# the `usecols` fields of each line
+def _parse_lines(lines, names, usecols):
+    if len(usecols) == 0:
+        return Columns()
+    with warnings.catch_warnings():
+        # No lines is not a problem, just no rows
+        warnings.simplefilter('ignore', UserWarning)
+        rows = np.loadtxt(lines, delimiter=',', dtype=COLUMN_DTYPE,
+                          usecols=usecols, ndmin=2)
+    rows = rows.reshape(-1, len(usecols))
+    return Columns(zip(names, np.ascontiguousarray(rows.T)))
+
+
+# Yields Columns with `chunk_rows` rows (or all of them, if None) at a time
+# of a results CSV file. All columns on results files are timestamps, so they
+# are read as int64, without any type inference. If `columns` is not None,
+# only those columns (if available on the file) are read. A file without rows
+# yields a single empty chunk, so its columns are still known.
+def read_csv_chunks(file_name, columns=None, header=None, chunk_rows=None):
+    if header is None:
+        header = csv_header(file_name)
+    usecols = [i for i, column in enumerate(header)
+               if columns is None or column in columns]
+    names = [header[i] for i in usecols]
+
+    with open(file_name, 'r') as f:
+        f.readline()
+        first = True
+        while True:
+            lines = f if chunk_rows is None else islice(f, chunk_rows)
+            chunk = _parse_lines(lines, names, usecols)
+            if chunk_rows is None:
+                yield chunk
+                return
+            if len(next(iter(chunk.values()), [])) == 0 and not first:
+                return
+            yield chunk
+            first = False
+
+
+# Reads a results CSV file, as Columns. See read_csv_chunks().
+def read_results_csv(file_name, columns=None, header=None):
+    return next(read_csv_chunks(file_name, columns, header))
+
+
+# Read-only mapping of column names to memory-mapped columns. Can be used in
+# place of a dataframe by metrics, when results are too big to be loaded in
+# memory. When pickled, only the column files paths are sent, and columns
+# are mapped again on the other side.
+class ColumnStore(Columns):
+    def __init__(self, paths):
+        super(ColumnStore, self).__init__(
+                (name, self._map(path)) for name, path in paths.items())
+        self.paths = paths
+
+    @staticmethod
+    def _map(path):
+        # An empty file can't be mapped
+        if os.path.getsize(path) == 0:
+            return np.empty(0, dtype=COLUMN_DTYPE)
+        return np.memmap(path, dtype=COLUMN_DTYPE, mode='r')
+
+    def __reduce__(self):
+        return (ColumnStore, (self.paths,))
+
+
+# Mapping of column names to arrays, that reads columns only when they're
+# first accessed. `columns` are the names of the available columns and
+# `read` a function returning a mapping (such as a dataframe) with all of
+# them.
+class DeferredColumns():
+    def __init__(self, columns, read):
+        self.columns = columns
+        self.read = read
+        self.loaded = None
+
+    def keys(self):
+        return self.columns
+
+    def __getitem__(self, column):
+        if self.loaded is None:
+            self.loaded = self.read()
+        return self.loaded[column]
+
+
+# Keeps a typed, columnar copy of results CSV files, so that analysing the
+# same results again doesn't need to parse the CSV text. Each CSV file gets
+# its own directory on the cache, with one raw little-endian int64 file per
+# column and an index file recording the CSV header, the columns already
+# cached and the size and modification time of the source CSV. Columns are
+# cached as they are first requested. If the source changes, its cache entry
+# is rebuilt on the next read. Entries are keyed on the source path as well,
+# so a single cache directory can be shared by several results directories.
+#
+# Cached columns can be either loaded in memory, as Columns, or be
+# memory-mapped, as a ColumnStore.
+class ResultsCache():
+    index_name = 'index.json'
+    index_version = 2
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def _entry_dir(self, file_name):
+        name = os.path.splitext(os.path.basename(file_name))[0]
+        path_hash = hashlib.sha1(
+                os.path.abspath(file_name).encode()).hexdigest()[:12]
+        return f'{self.cache_dir}/{name}-{path_hash}'
+
+    @staticmethod
+    def _source_info(file_name):
+        st = os.stat(file_name)
+        return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+    def _read_index(self, entry_dir):
+        try:
+            with open(f'{entry_dir}/{self.index_name}', 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_index(self, entry_dir, index):
+        # Write then rename, so a reader never sees a partial index
+        tmp_name = f'{entry_dir}/{self.index_name}.tmp'
+        with open(tmp_name, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_name, f'{entry_dir}/{self.index_name}')
+
+    def _new_entry(self, entry_dir, file_name, source):
+        # Drop any stale entry first, so that columns of a different source
+        # are never mixed with the new ones
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.makedirs(entry_dir)
+        index = {'version': self.index_version, 'source': source,
+                 'header': csv_header(file_name), 'columns': {}}
+        self._write_index(entry_dir, index)
+        return index
+
+    def _entry_index(self, entry_dir, file_name):
+        source = self._source_info(file_name)
+        index = self._read_index(entry_dir)
+        if (index is None or index.get('version') != self.index_version or
+                index['source'] != source):
+            index = self._new_entry(entry_dir, file_name, source)
+        return index
+
+    # Converts `columns` of the CSV to column files, one chunk of rows at a
+    # time. Columns are only added to the index once fully written.
+    def _store(self, entry_dir, index, file_name, columns):
+        column_files = {column: f'{len(index["columns"]) + i}.i64'
+                        for i, column in enumerate(columns)}
+        outputs = {column: open(f'{entry_dir}/{column_file}', 'wb')
+                   for column, column_file in column_files.items()}
+        try:
+            for chunk in read_csv_chunks(file_name, columns, index['header'],
+                                         CONVERSION_CHUNK_ROWS):
+                for column, output in outputs.items():
+                    chunk[column].tofile(output)
+        finally:
+            for output in outputs.values():
+                output.close()
+
+        index['columns'].update(column_files)
+        self._write_index(entry_dir, index)
+
+    def _cached_columns(self, file_name, columns):
+        entry_dir = self._entry_dir(file_name)
+        index = self._entry_index(entry_dir, file_name)
+
+        wanted = [column for column in index['header']
+                  if columns is None or column in columns]
+        missing = [column for column in wanted
+                   if column not in index['columns']]
+        if len(missing) > 0:
+            self._store(entry_dir, index, file_name, missing)
+
+        return {column: f'{entry_dir}/{index["columns"][column]}'
+                for column in wanted}
+
+    # Reads `columns` (or all columns, if None) of results CSV `file_name`,
+    # as Columns. Columns not present on the CSV are ignored. Returned
+    # Columns keep the column order of the CSV.
+    def read_csv(self, file_name, columns=None):
+        try:
+            paths = self._cached_columns(file_name, columns)
+            return Columns((column, np.fromfile(path, COLUMN_DTYPE))
+                           for column, path in paths.items())
+        except (OSError, ValueError) as err:
+            # Damaged entry, drop it so it's rebuilt on next read
+            print(f'WARNING: Could not cache {file_name}: {err}')
+            shutil.rmtree(self._entry_dir(file_name), ignore_errors=True)
+            return read_results_csv(file_name, columns)
+
+    # Same as read_csv(), but columns are memory-mapped instead of loaded in
+    # memory. As there's no fallback to reading the CSV in this case, errors
+    # are not silenced.
+    def map_csv(self, file_name, columns=None):
+        return ColumnStore(self._cached_columns(file_name, columns))
+
+
+def default_cache_dir(csv_dir):
+    return f'{csv_dir}/.cache'
+
+
+# Cache directory of `csv_dir` as chosen by the --cache-dir and
+# --disable-cache options on `args`, or None if there's no cache
+def cache_dir_of(csv_dir, args):
+    if args.disable_cache:
+        return None
+    if args.cache_dir is not None:
+        return args.cache_dir
+    return default_cache_dir(csv_dir)
@@ -0,0 +1,165 @@
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import json
+import math
+import os
+import sqlite3
+
+from datetime import datetime
+from export import summary_entries
+
+DEFAULT_DB_FILE = 'experiments.db'
+
+# Written by run_experiment.py on the results directory, with the setup of the
+# experiment (see experiment/experiment.py)
+INFO_FILE = 'experiment.json'
+
+# Dimensions runs can be queried by, all indexed. Runs without an INFO_FILE
+# (such as those from before it existed) have them all NULL.
+RUN_DIMENSIONS = ['platform', 'socket_type', 'xdp_mode', 'xdp_copy_mode',
+                  'qdisc_profile', 'kernel']
+RUN_COLUMNS = ['results_dir', *RUN_DIMENSIONS, 'hostname', 'started',
+               'analysed']
+
+FACTOR_COLUMNS = ['payload_size', 'transmission_interval']
+STAT_COLUMNS = ['count', 'mean', 'stdev', 'minimum', 'maximum', 'p50', 'p99',
+                'p99_9', 'p99_99']
+
+SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    results_dir TEXT NOT NULL UNIQUE,
+    {', '.join(f'{column} TEXT' for column in RUN_COLUMNS[1:])}
+);
+{''.join(f'CREATE INDEX IF NOT EXISTS runs_{column} ON runs ({column});'
+         for column in RUN_DIMENSIONS)}
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    metric TEXT NOT NULL,
+    payload_size INTEGER NOT NULL,
+    transmission_interval INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    {', '.join(f'{column} REAL' for column in STAT_COLUMNS[1:])},
+    PRIMARY KEY (run_id, metric, payload_size, transmission_interval)
+);
+CREATE INDEX IF NOT EXISTS metrics_factors
+    ON metrics (metric, payload_size, transmission_interval);
+'''
+
+
+# Returns the setup of the experiment whose results are on `results_dir`, as
+# saved by run_experiment.py, or an empty dictionary if there's none
+def run_info(results_dir):
+    try:
+        with open(f'{results_dir}/{INFO_FILE}') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# NULL, rather than NaN (as the stdev of a single value), on the database
+def _db_value(value):
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def _where(filters):
+    if len(filters) == 0:
+        return '', []
+    # Column names are checked by callers, only values are user given
+    return (' WHERE ' + ' AND '.join(f'{column} = ?' for column in filters),
+            list(filters.values()))
+
+
+# Local database of analysed runs: the setup of each one (see RUN_DIMENSIONS)
+# and the stats of each of its metrics and factors, as on the export (see
+# export.py), 'ALL' factors included. Meant for queries across many runs,
+# which then don't need to analyse (or even have) their CSV files again.
+# Runs are identified by the absolute path of their results directory, so
+# analysing one again replaces its previous stats.
+class ResultsDatabase():
+    def __init__(self, db_file=DEFAULT_DB_FILE):
+        self.connection = sqlite3.connect(db_file)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    # Records the run whose results are on `results_dir`, with `summaries`
+    # (in the format of export.summaries_of()) of its metrics. Returns the id
+    # of the run.
+    def record(self, results_dir, summaries):
+        results_dir = os.path.abspath(results_dir)
+        info = run_info(results_dir)
+        run = {'results_dir': results_dir,
+               **{column: info.get(column) for column in RUN_COLUMNS[1:]},
+               'analysed': datetime.now().isoformat(timespec='seconds')}
+
+        rows = []
+        for (metric_cls, payload_size, transmission_interval, aggregate,
+             histogram) in summary_entries(summaries):
+            stats = {**aggregate.stats(), **histogram.stats(),
+                     'p50': histogram.percentile(50)}
+            rows.append([metric_cls.name, payload_size,
+                         transmission_interval, int(aggregate.count),
+                         *[_db_value(stats[column])
+                           for column in STAT_COLUMNS[1:]]])
+
+        with self.connection:
+            previous = self.connection.execute(
+                    'SELECT id FROM runs WHERE results_dir = ?',
+                    [results_dir]).fetchone()
+            if previous is not None:
+                self.connection.execute('DELETE FROM metrics WHERE run_id = ?',
+                                        [previous['id']])
+                self.connection.execute('DELETE FROM runs WHERE id = ?',
+                                        [previous['id']])
+
+            run_id = self.connection.execute(
+                    f'INSERT INTO runs ({", ".join(RUN_COLUMNS)}) '
+                    f'VALUES ({", ".join("?" * len(RUN_COLUMNS))})',
+                    [run[column] for column in RUN_COLUMNS]).lastrowid
+            columns = ['run_id', 'metric', *FACTOR_COLUMNS, *STAT_COLUMNS]
+            self.connection.executemany(
+                    f'INSERT INTO metrics ({", ".join(columns)}) '
+                    f'VALUES ({", ".join("?" * len(columns))})',
+                    [[run_id, *row] for row in rows])
+        return run_id
+
+    # Returns the runs (as dictionaries with their RUN_COLUMNS and 'id')
+    # matching `filters`, a dictionary of RUN_COLUMNS to their values
+    def runs(self, filters=None):
+        filters = filters or {}
+        for column in filters:
+            if column not in RUN_COLUMNS:
+                raise Exception(f'Unknown run column: {column}')
+        where, values = _where(filters)
+        return [dict(row) for row in self.connection.execute(
+                f'SELECT * FROM runs{where} ORDER BY started, results_dir',
+                values)]
+
+    # Returns the stats matching `filters`, a dictionary of RUN_COLUMNS,
+    # 'metric' (its name, like 'Driver Receive') and FACTOR_COLUMNS to their
+    # values. Each row is a dictionary with the run columns and the metric,
+    # factors and STAT_COLUMNS ('ALL' factors are 'ALL').
+    def stats(self, filters=None):
+        filters = filters or {}
+        for column in filters:
+            if column not in [*RUN_COLUMNS, 'metric', *FACTOR_COLUMNS]:
+                raise Exception(f'Unknown stats column: {column}')
+        where, values = _where(filters)
+        return [dict(row) for row in self.connection.execute(
+                f'SELECT {", ".join(RUN_COLUMNS)}, metric, '
+                f'{", ".join(FACTOR_COLUMNS)}, {", ".join(STAT_COLUMNS)} '
+                f'FROM metrics JOIN runs ON runs.id = metrics.run_id{where} '
+                f'ORDER BY metric, started, results_dir, payload_size, '
+                f'transmission_interval', values)]
@@ -10,85 +10,35 @@ import sys
 
 from analysis import Analysis
 from datetime import datetime
+from export import export, summaries_of
 from factors import (PayloadFactor, TxIntervalFactor)
 from latency_profile import IntermediateLatencyProfile
+from manifest import Manifest
 from metrics import (E2EMetric, TotalRxMetric, TotalTxMetric,
                      hw_sw_classes, rx_intermediate_classes,
                      tx_intermediate_classes)
 from metrics_groups import (HwVsSwLatencyMetrics, RxIntermediateLatencyMetrics,
                             SimpleMetricGroup, TxIntermediateLatencyMetrics)
-from tabulate import tabulate
+from render import RUN_SEQUENCE_STYLES, Renderer
+from reports import (report_intermediate_overall_stats,
+                     report_intermediate_stats, report_single_metric_stats,
+                     report_time_windows, report_worst_packets,
+                     time_windows_file, worst_packets_file)
+from results_cache import cache_dir_of
+from streaming import DEFAULT_CHUNK_ROWS
+from streaming_reports import record, streaming_analysis, window_ns
+from time_windows import time_windows_chart, windowed_stats_of
+from worst_packets import DEFAULT_TOP_K, worst_packets_of
 
 
-def report_intermediate_stats(name, stats, m_classes, dir_name):
-    header = ['PayloadSize', 'TransmissionInterval']
-    for m_class in m_classes:
-        header.append(f'{m_class.short_name}\nMean')
-        header.append(f'{m_class.short_name}\nMax')
-
-    table = []
-    for stat in stats:
-        table.append([stat[0]['PayloadSize'],
-                     fmt_trans_int(stat[0]['TransmissionInterval'])])
-
-        # Go over classes so we can keep table ordered by "layer"
-        for m_class in m_classes:
-            fs = [s for s in stat[1] if s[0] == m_class.short_name][0]
-            table[-1].append(fs[1]['mean'])
-            table[-1].append(fs[1]['maximum'])
-
-    with open(f'{dir_name}/latency_stats_per_experiment.txt', 'w') as f:
-        f.write(f'{name} Latency Statistics (Per Experiment)\n\n')
-        f.write(tabulate(table, header, tablefmt='grid', floatfmt='.3f'))
-
-
-def fmt_trans_int(ti):
-    return ti if isinstance(ti, str) else int(ti / 1000)
-
-
-def report_intermediate_overall_stats(name, m_classes, stats, total_stats,
-                                      dir_name):
-    header = ['Metric', 'Mean(us)', 'Stdev(us)', 'Min(us)', 'Max(us)',
-              'Range(us)', 'CV']
-    table = []
-
-    # Go over classes so we can keep table ordered by "layer"
-    for m_class in m_classes:
-        s = [s for s in stats if s['metric'] == m_class.short_name][0]
-        table.append([s['metric'], s['mean'], s['stdev'],
-                     s['minimum'], s['maximum'], s['r'], s['cv']])
-
-    s = total_stats[-1]
-    table.append(['Total Latency', s['mean'], s['stdev'], s['minimum'],
-                 s['maximum'], s['r'], s['cv']])
-
-    norm_name = name.lower().replace(' ', '_')
-    with open(f'{dir_name}/{norm_name}_latency_overall_stats.txt', 'w') as f:
-        f.write(f'Overall {name} Latency Statistics\n\n')
-        f.write(tabulate(table, header, tablefmt='grid', floatfmt='.3f'))
-
-
-def report_single_metric_stats(stats, name, dir_name):
-    header = ['Payload(bytes)', 'TransmissionInterval(us)', 'Mean(us)',
-              'Stdev(us)', 'Min(us)', 'Max(us)', 'Range(us)', 'CV']
-
-    table = []
-    for stat in stats:
-        # Check MetricGroupAnalysis.stats_per_factor() if curious
-        # about [1][0][1]
-        s = stat[1][0][1]
-        table.append([stat[0]['PayloadSize'],
-                     fmt_trans_int(stat[0]['TransmissionInterval'])])
-        table[-1].extend([s['mean'], s['stdev'], s['minimum'], s['maximum'],
-                         s['r'], s['cv']])
-
-    with open(f'{dir_name}/latency_stats_per_experiment.txt', 'w') as f:
-        f.write(f'{name} Latency Statistics (Per Experiment)\n\n')
-        f.write(tabulate(table, header, tablefmt='grid', floatfmt='.3f'))
+def release(metrics):
+    for metric in metrics:
+        metric.release()
 
 
 def intermediate_latency_analysis(metrics, name, ilm_cls, total_stats,
-                                  dir_name, m_classes, args):
+                                  dir_name, m_classes, args, manifest=None,
+                                  renderer=None):
     dir_name = f'{args.graphs_dir}/{dir_name}'
     os.makedirs(dir_name, exist_ok=True)
     ilm = ilm_cls(metrics, dir_name)
@@ -100,12 +50,52 @@ def intermediate_latency_analysis(metrics, name, ilm_cls, total_stats,
                                           total_stats, dir_name)
 
     if not args.disable_time_sequence:
-        ilm.run_sequences()
+        ilm.run_sequences(manifest=manifest, renderer=renderer,
+                          style=args.run_sequence_style)
 
     if not args.disable_grouped:
         hist_dir = f'{dir_name}/grouped_histograms'
-        PayloadFactor(metrics, hist_dir).histograms()
-        TxIntervalFactor(metrics, hist_dir).histograms()
+        PayloadFactor(metrics, hist_dir).histograms(manifest, renderer)
+        TxIntervalFactor(metrics, hist_dir).histograms(manifest, renderer)
+
+
+# Writes the worst packets of each metric class on `metric_classes`. As for
+# charts, unless `manifest` is None, they're only found again if their
+# metrics changed.
+def worst_packets_analysis(analysis, metric_classes, args, manifest=None):
+    for metric_cls in metric_classes:
+        metrics = analysis.metrics_of([metric_cls])
+        if len(metrics) == 0:
+            continue
+        if manifest is not None and not manifest.needs_chart(
+                worst_packets_file(metric_cls, args.graphs_dir), metrics,
+                [args.worst_packets]):
+            continue
+        report_worst_packets(metric_cls,
+                             worst_packets_of(metrics, args.worst_packets),
+                             args.graphs_dir)
+        release(metrics)
+
+
+# Writes the stats over time windows of each metric class on
+# `metric_classes`, and draws them. As for other charts, unless `manifest` is
+# None, they're only done again if their metrics changed.
+def time_windows_analysis(analysis, metric_classes, args, manifest=None,
+                          renderer=None):
+    for metric_cls in metric_classes:
+        metrics = analysis.metrics_of([metric_cls])
+        if len(metrics) == 0:
+            continue
+        file_name = time_windows_file(metric_cls, args.graphs_dir)
+        chart_name = f'{os.path.splitext(file_name)[0]}.png'
+        if manifest is not None and not any(
+                [manifest.needs_chart(name, metrics, [args.time_window])
+                 for name in [file_name, chart_name]]):
+            continue
+        windowed = windowed_stats_of(metrics, window_ns(args))
+        report_time_windows(metric_cls, windowed, args.graphs_dir)
+        time_windows_chart(metric_cls, windowed, chart_name, renderer)
+        release(metrics)
 
 
 def main():
@@ -123,6 +113,11 @@ def main():
     parser.add_argument('--disable-time-sequence',
                         dest='disable_time_sequence', action='store_true',
                         help='Don\'t create time-sequence graphs')
+    parser.add_argument('--run-sequence-style', dest='run_sequence_style',
+                        choices=RUN_SEQUENCE_STYLES, default='scatter',
+                        help='How time-sequence graphs are drawn: each '
+                             'point (scatter) or how many points are on each '
+                             'area of the graph (density)')
     parser.add_argument('--disable-grouped', dest='disable_grouped',
                         action='store_true',
                         help='Don\'t create grouped graphs')
@@ -138,9 +133,52 @@ def main():
     parser.add_argument('--disable-hw-vs-sw', dest='disable_hw_vs_sw',
                         action='store_true',
                         help='Don\'t produce HW vs SW report')
+    parser.add_argument('--cache-dir', dest='cache_dir',
+                        help='Directory where parsed CSV data is cached. '
+                             'Defaults to .cache inside CSV directory')
+    parser.add_argument('--disable-cache', dest='disable_cache',
+                        action='store_true',
+                        help='Don\'t cache parsed CSV data')
+    parser.add_argument('--memmap', dest='memmap', action='store_true',
+                        help='Memory-map cached CSV data instead of loading '
+                             'it. Useful for results bigger than memory')
+    parser.add_argument('--streaming', dest='streaming',
+                        action='store_true',
+                        help='Compute stats reading CSV data in chunks, with '
+                             'bounded memory usage. No charts are generated')
+    parser.add_argument('--chunk-rows', dest='chunk_rows', type=int,
+                        default=DEFAULT_CHUNK_ROWS,
+                        help='Rows per chunk on streaming analysis')
+    parser.add_argument('--disable-manifest', dest='disable_manifest',
+                        action='store_true',
+                        help='Analyse all CSV files and draw all graphs, '
+                             'instead of only what changed since the last '
+                             'analysis on the same graphs directory')
+    parser.add_argument('--disable-export', dest='disable_export',
+                        action='store_true',
+                        help='Don\'t export stats and histograms to '
+                             'analysis.json and analysis.npz')
+    parser.add_argument('--worst-packets', dest='worst_packets', type=int,
+                        default=DEFAULT_TOP_K,
+                        help='Number of worst packets of each metric and '
+                             'factors saved, with their timestamps, on '
+                             'worst_packets folder. 0 disables it')
+    parser.add_argument('--time-window', dest='time_window', type=float,
+                        help='Window, in seconds (such as 0.1, 1 or 10), of '
+                             'the count, mean, P99 and maximum latency of '
+                             'each metric over time, saved (and drawn) on '
+                             'time_windows folder. Disabled if not given')
+    parser.add_argument('--db', dest='db_file',
+                        help='Database file of analysed runs where the stats '
+                             'are recorded, to be queried with run_query.py')
+    parser.add_argument('-j', dest='jobs', type=int, default=1,
+                        help='Number of processes used to load CSV files, '
+                             'calculate metrics and draw graphs')
     args = parser.parse_args()
 
-    analysis = Analysis(args.csv_dir, args.graphs_dir)
+    if args.memmap and args.disable_cache:
+        print('--memmap needs the CSV data cache. Remove --disable-cache')
+        sys.exit(1)
 
     rx_int_metric_cls = rx_intermediate_classes
     tx_int_metric_cls = tx_intermediate_classes
@@ -166,9 +204,32 @@ def main():
         print('Nothing to do. Were all analysis disabled?')
         sys.exit(0)
 
-    analysis.analyse(metrics_of_interest)
+    if args.streaming:
+        streaming_analysis(metrics_of_interest, args)
+        print(f'Results saved at {args.graphs_dir}')
+        return
+
+    analysis = Analysis(args.csv_dir, args.graphs_dir,
+                        cache_dir_of(args.csv_dir, args), args.memmap)
+    # Unless disabled, only CSV files that changed since the last analysis
+    # on the same graphs directory are analysed again, and only graphs
+    # affected by them are drawn again
+    manifest = None
+    if not args.disable_manifest:
+        manifest = Manifest(args.graphs_dir)
+    analysis.analyse(metrics_of_interest, args.jobs, manifest)
+
+    # Graphs are drawn by a pool of processes, if there's more than one job
+    renderer = None
+    if args.jobs > 1:
+        renderer = Renderer(args.jobs)
+
+    # Metrics values are calculated when first needed, and released as soon
+    # as each report below is done with them, so only a few are kept in
+    # memory at any time.
 
     # General metrics
+    total_stats = {}
     for metric_cls in [TotalRxMetric, TotalTxMetric, E2EMetric]:
         metrics = analysis.metrics_of([metric_cls])
         if len(metrics) == 0:
@@ -180,38 +241,48 @@ def main():
         os.makedirs(dir_name, exist_ok=True)
         report_single_metric_stats(smg.stats_per_factor(summary=True),
                                    metric_cls.name, dir_name)
+        # Used by intermediate reports below
+        total_stats[metric_cls] = smg.stats()
 
         if not args.disable_time_sequence:
-            [m.run_sequence() for m in metrics]
+            [m.run_sequence(manifest=manifest, renderer=renderer,
+                            style=args.run_sequence_style)
+             for m in metrics]
 
         if not args.disable_grouped:
             hist_dir = f'{dir_name}/grouped_histograms'
-            PayloadFactor(metrics, hist_dir).histograms()
-            TxIntervalFactor(metrics, hist_dir).histograms()
+            PayloadFactor(metrics, hist_dir).histograms(manifest, renderer)
+            TxIntervalFactor(metrics, hist_dir).histograms(manifest, renderer)
+
+        release(metrics)
 
     # RX intermediate
     metrics = analysis.metrics_of(rx_int_metric_cls)
     if len(metrics) > 0:
-        smg = SimpleMetricGroup(None, analysis.metrics_of([TotalRxMetric]), '')
         intermediate_latency_analysis(metrics, 'Receive',
                                       RxIntermediateLatencyMetrics,
-                                      smg.stats(), 'receive_intermediate',
-                                      rx_int_metric_cls, args)
+                                      total_stats.get(TotalRxMetric),
+                                      'receive_intermediate',
+                                      rx_int_metric_cls, args,
+                                      manifest=manifest, renderer=renderer)
 
     # TX intermediate
     metrics = analysis.metrics_of(tx_int_metric_cls)
     if len(metrics) > 0:
-        smg = SimpleMetricGroup(None, analysis.metrics_of([TotalTxMetric]), '')
         intermediate_latency_analysis(metrics, 'Transmit',
                                       TxIntermediateLatencyMetrics,
-                                      smg.stats(), 'transmit_intermediate',
-                                      tx_int_metric_cls, args)
+                                      total_stats.get(TotalTxMetric),
+                                      'transmit_intermediate',
+                                      tx_int_metric_cls, args,
+                                      manifest=manifest, renderer=renderer)
 
     # Average of all intermediate
     metrics = analysis.metrics_of([*rx_int_metric_cls, *tx_int_metric_cls])
     if len(metrics) > 0:
         ilp = IntermediateLatencyProfile(metrics, args.graphs_dir)
-        ilp.chart()
+        ilp.chart(manifest, renderer)
+        ilp.percentile_chart(manifest, renderer)
+        release(metrics)
 
     # HW vs SW
     metrics = analysis.metrics_of(sw_hw_metric_cls)
@@ -219,7 +290,29 @@ def main():
         # Hw vs Sw is, at the end, another intermediate latency
         intermediate_latency_analysis(metrics, 'Hardware vs Software',
                                       HwVsSwLatencyMetrics, None, 'hw_vs_sw',
-                                      sw_hw_metric_cls, args)
+                                      sw_hw_metric_cls, args,
+                                      manifest=manifest, renderer=renderer)
+        release(metrics)
+
+    if args.worst_packets > 0:
+        worst_packets_analysis(analysis, metrics_of_interest, args, manifest)
+
+    if args.time_window is not None:
+        time_windows_analysis(analysis, metrics_of_interest, args, manifest,
+                              renderer)
+
+    if renderer is not None:
+        renderer.close()
+
+    if manifest is not None:
+        manifest.record_metrics(analysis.metrics_collection)
+        manifest.save()
+
+    if not args.disable_export or args.db_file is not None:
+        summaries = summaries_of(analysis.metrics_collection)
+        if not args.disable_export:
+            export(summaries, args.graphs_dir)
+        record(summaries, args)
 
     print(f'Results saved at {args.graphs_dir}')
 
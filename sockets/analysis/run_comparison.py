@@ -5,77 +5,183 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 import argparse
+import os
 
-from analysis import Analysis
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from latency_profile import IntermediateLatencyComparisonProfile
+from histograms import merge_histograms
+from itertools import repeat, zip_longest
+from latency_profile import (INTERMEDIATE_TYPES,
+                             IntermediateLatencyComparisonProfile)
 from metrics import (TotalRxMetric, TotalTxMetric, rx_intermediate_classes,
                      tx_intermediate_classes)
 from metrics_comparison import MetricsComparison
+from render import Renderer
+from reports import report_significance
+from results_cache import cache_dir_of
+from significance import compare
+from streaming import StreamingAnalysis, metrics_of
+
+
+# Comparisons only need the aggregates and histograms of the metrics, so each
+# CSV directory is loaded just once, a chunk of rows at a time, and only the
+# summaries of its metrics are kept (see StreamingAnalysis), along with the
+# StageProfile of each type of intermediate metrics. Returns a pair (A, B)
+# with the summaries and the profiles.
+def load_summaries(csv_dir, cache_dir, metrics_of_interest):
+    analysis = StreamingAnalysis(csv_dir, cache_dir)
+    analysis.analyse(metrics_of_interest, profile_types=[
+            types for _, types in INTERMEDIATE_TYPES])
+    return analysis.summaries(), analysis.stage_profiles()
+
+
+# Returns a pair (A, B) for each pair on `csv_dirs` (of a CSV directory and
+# its label, or None), where A is the directory and B its label. Directories
+# without a label are labelled by their name or, if other directories have
+# the same name, by their path.
+def labelled(csv_dirs):
+    names = [os.path.basename(os.path.normpath(csv_dir))
+             for csv_dir, _ in csv_dirs]
+    return [(csv_dir, label if label is not None else
+             name if names.count(name) == 1 else os.path.normpath(csv_dir))
+            for (csv_dir, label), name in zip(csv_dirs, names)]
+
+
+# Returns pairs (A, B), where A is the label of each set and B its metrics of
+# `metric_cls`, for the sets having any of them
+def metric_sets(sets, metric_cls, results_dir):
+    sets = [(label, metrics_of(summaries, metric_cls, results_dir))
+            for label, summaries in sets]
+    return [(label, metrics) for label, metrics in sets if len(metrics) > 0]
+
+
+# Compares each set against the first one, per metric of `metric_classes`
+# and factors, and per metric with all factors merged. Only factors on both
+# sets are compared, and merged, so that merged factors of both sets are of
+# the same workload. Returns a list in the format of report_significance().
+def significance_of(sets, metric_classes):
+    (label_a, summaries_a), others = sets[0], sets[1:]
+    comparisons = []
+    for metric_cls in metric_classes:
+        for label_b, summaries_b in others:
+            keys = sorted(key for key in summaries_a
+                          if key[0] == metric_cls and key in summaries_b)
+            if len(keys) == 0:
+                continue
+
+            pairs = [({'PayloadSize': key[1], 'TransmissionInterval': key[2]},
+                      summaries_a[key][1], summaries_b[key][1])
+                     for key in keys]
+            pairs.append(({'PayloadSize': 'ALL',
+                           'TransmissionInterval': 'ALL'},
+                          *[merge_histograms(s[key][1] for key in keys)
+                            for s in (summaries_a, summaries_b)]))
+
+            for factors, histogram_a, histogram_b in pairs:
+                result = compare(histogram_a, histogram_b)
+                if result is not None:
+                    comparisons.append((metric_cls.short_name, factors,
+                                        f'{label_b} vs {label_a}', result))
+    return comparisons
 
 
 def main():
     parser = argparse.ArgumentParser()
+    parser.add_argument('--csv-dir', dest='csv_dirs', action='append',
+                        default=[],
+                        help='CSV directory with timestamp data to compare. '
+                             'Repeat for each directory to compare')
+    parser.add_argument('--label', dest='labels', action='append',
+                        default=[],
+                        help='Label for each --csv-dir, in the same order. '
+                             'Defaults to the directory name (or path, if '
+                             'names clash)')
     parser.add_argument('--csv-dir-1', dest='csv_dir_1',
-                        required=True,
-                        help='CSV directory with timestamp data to compare')
+                        help='Same as a first --csv-dir')
     parser.add_argument('--csv-dir-1-label', dest='csv_dir_1_label',
-                        required=True,
-                        help='Label for csv-file-1')
+                        help='Label for csv-dir-1')
     parser.add_argument('--csv-dir-2', dest='csv_dir_2',
-                        required=True,
-                        help='CSV directory with timestamp data to compare')
+                        help='Same as a second --csv-dir')
     parser.add_argument('--csv-dir-2-label', dest='csv_dir_2_label',
-                        required=True,
-                        help='Label for csv-file-2')
+                        help='Label for csv-dir-2')
     parser.add_argument('-g', dest='comp_graph_dir',
                         default='graph_'
                                 f'{datetime.now().strftime("%Y-%m-%d-%H-%M")}',
                         help='Directory where comparison graph will be stored')
+    parser.add_argument('--cache-dir', dest='cache_dir',
+                        help='Directory where parsed CSV data is cached. '
+                             'Defaults to .cache inside each CSV directory')
+    parser.add_argument('--disable-cache', dest='disable_cache',
+                        action='store_true',
+                        help='Don\'t cache parsed CSV data')
+    parser.add_argument('-j', dest='jobs', type=int, default=1,
+                        help='Number of processes used to load CSV '
+                             'directories and draw graphs')
     args = parser.parse_args()
 
+    if len(args.labels) > len(args.csv_dirs):
+        parser.error('More --label than --csv-dir')
+    csv_dirs = [(args.csv_dir_1, args.csv_dir_1_label),
+                (args.csv_dir_2, args.csv_dir_2_label),
+                *zip_longest(args.csv_dirs, args.labels)]
+    csv_dirs = [(csv_dir, label) for csv_dir, label in csv_dirs
+                if csv_dir is not None]
+    if len(csv_dirs) < 2:
+        parser.error('At least two CSV directories are needed to compare')
+    csv_dirs = labelled(csv_dirs)
+    # Sets are told apart by their labels
+    labels = [label for _, label in csv_dirs]
+    for label in labels:
+        if labels.count(label) > 1:
+            parser.error(f'Label {label} is used for more than one CSV '
+                         'directory. Give each one a different --label')
+
     metrics_of_interest = [TotalRxMetric, *rx_intermediate_classes,
                            TotalTxMetric, *tx_intermediate_classes]
 
-    analysis_1 = Analysis(args.csv_dir_1, args.comp_graph_dir)
-    analysis_2 = Analysis(args.csv_dir_2, args.comp_graph_dir)
-
-    analysis_1.analyse(metrics_of_interest)
-    analysis_2.analyse(metrics_of_interest)
-
-    mc = MetricsComparison((args.csv_dir_1_label,
-                            analysis_1.metrics_of([TotalTxMetric])),
-                           (args.csv_dir_2_label,
-                            analysis_2.metrics_of([TotalTxMetric])),
-                           'Total Transmit Comparison', args.comp_graph_dir)
-    mc.plot()
-
-    mc = MetricsComparison((args.csv_dir_1_label,
-                            analysis_1.metrics_of([TotalRxMetric])),
-                           (args.csv_dir_2_label,
-                            analysis_2.metrics_of([TotalRxMetric])),
-                           'Total Receive Comparison', args.comp_graph_dir)
-    mc.plot()
-
-    if (len(analysis_1.metrics_of([*rx_intermediate_classes])) > 0 and
-            len(analysis_2.metrics_of([*rx_intermediate_classes])) > 0):
-        ilcp = IntermediateLatencyComparisonProfile(
-                (args.csv_dir_1_label,
-                    analysis_1.metrics_of([*rx_intermediate_classes])),
-                (args.csv_dir_2_label,
-                    analysis_2.metrics_of([*rx_intermediate_classes])),
-                'receive', args.comp_graph_dir)
-        ilcp.chart()
-
-    if (len(analysis_1.metrics_of([*tx_intermediate_classes])) > 0 and
-            len(analysis_2.metrics_of([*tx_intermediate_classes])) > 0):
-        ilcp = IntermediateLatencyComparisonProfile(
-                (args.csv_dir_1_label,
-                    analysis_1.metrics_of([*tx_intermediate_classes])),
-                (args.csv_dir_2_label,
-                    analysis_2.metrics_of([*tx_intermediate_classes])),
-                'transmit', args.comp_graph_dir)
-        ilcp.chart()
+    cache_dirs = [cache_dir_of(csv_dir, args) for csv_dir, _ in csv_dirs]
+    if args.jobs > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            summaries = list(executor.map(
+                    load_summaries, [csv_dir for csv_dir, _ in csv_dirs],
+                    cache_dirs, repeat(metrics_of_interest)))
+    else:
+        summaries = [load_summaries(csv_dir, cache, metrics_of_interest)
+                     for (csv_dir, _), cache in zip(csv_dirs, cache_dirs)]
+    sets = list(zip(labels, [s for s, _ in summaries]))
+    stage_profiles = {(label, name): profiles[tuple(types)]
+                      for label, (_, profiles) in zip(labels, summaries)
+                      for name, types in INTERMEDIATE_TYPES
+                      if tuple(types) in profiles}
+
+    # Graphs are drawn by a pool of processes, if there's more than one job
+    renderer = None
+    if args.jobs > 1:
+        renderer = Renderer(args.jobs)
+
+    for metric_cls, name in [(TotalTxMetric, 'Total Transmit Comparison'),
+                             (TotalRxMetric, 'Total Receive Comparison')]:
+        metrics = metric_sets(sets, [metric_cls], args.comp_graph_dir)
+        if len(metrics) > 1:
+            mc = MetricsComparison(metrics, name, args.comp_graph_dir)
+            mc.plot(renderer)
+
+    for m_classes, name in [(rx_intermediate_classes, 'receive'),
+                            (tx_intermediate_classes, 'transmit')]:
+        metrics = metric_sets(sets, m_classes, args.comp_graph_dir)
+        if len(metrics) > 1:
+            ilcp = IntermediateLatencyComparisonProfile(
+                    metrics, name, args.comp_graph_dir, stage_profiles)
+            ilcp.chart(renderer=renderer)
+            ilcp.percentile_chart(renderer=renderer)
+
+    comparisons = significance_of(sets, metrics_of_interest)
+    if len(comparisons) > 0:
+        os.makedirs(args.comp_graph_dir, exist_ok=True)
+        report_significance(comparisons, args.comp_graph_dir)
+
+    if renderer is not None:
+        renderer.close()
 
     print(f'Results saved at {args.comp_graph_dir}')
 
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+# Queries the database of analysed runs (see results_db.py), populated by
+# run_analysis.py and run_stats.py with --db. Stats of any metric and
+# factors across all runs with a given setup come straight from the
+# database, without analysing their CSV files again.
+
+import argparse
+import os
+
+from reports import runs_table, stats_table
+from results_db import DEFAULT_DB_FILE, ResultsDatabase
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', dest='db_file', default=DEFAULT_DB_FILE,
+                        help='Database file of analysed runs')
+    parser.add_argument('--runs', dest='runs', action='store_true',
+                        help='List the matching runs, instead of their stats')
+    parser.add_argument('-r', dest='results_dir',
+                        help='Results directory of the run, as analysed')
+    parser.add_argument('--platform', dest='platform',
+                        help='Platform, such as i210')
+    parser.add_argument('--socket-type', dest='socket_type',
+                        choices=['AF_PACKET', 'AF_XDP'],
+                        help='Socket family type')
+    parser.add_argument('--xdp-mode', dest='xdp_mode',
+                        choices=['SKB', 'Native'],
+                        help='Mode of XDP socket')
+    parser.add_argument('--xdp-copy-mode', dest='xdp_copy_mode',
+                        choices=['Copy', 'Zero-Copy'],
+                        help='Copy mode of XDP socket')
+    parser.add_argument('--qdisc-profile', dest='qdisc_profile',
+                        help='Qdisc profile, such as PFifo')
+    parser.add_argument('--kernel', dest='kernel',
+                        help='Kernel release, as on uname -r')
+    parser.add_argument('-m', dest='metric',
+                        help='Name of the metric, such as "Driver Receive"')
+    parser.add_argument('--payload-size', dest='payload_size',
+                        help='Payload size, in bytes, or ALL')
+    parser.add_argument('--transmission-interval',
+                        dest='transmission_interval',
+                        help='Transmission interval, in microseconds, or ALL')
+    args = parser.parse_args()
+
+    filters = {column: getattr(args, column)
+               for column in ['results_dir', 'platform', 'socket_type',
+                              'xdp_mode', 'xdp_copy_mode', 'qdisc_profile',
+                              'kernel']
+               if getattr(args, column) is not None}
+    if args.results_dir is not None:
+        filters['results_dir'] = os.path.abspath(args.results_dir)
+
+    with ResultsDatabase(args.db_file) as db:
+        if args.runs:
+            print(runs_table(db.runs(filters)))
+            return
+
+        if args.metric is not None:
+            filters['metric'] = args.metric
+        if args.payload_size is not None:
+            filters['payload_size'] = args.payload_size
+        if args.transmission_interval is not None:
+            interval = args.transmission_interval
+            filters['transmission_interval'] = (
+                    interval if interval == 'ALL' else int(interval) * 1000)
+        print(stats_table(db.stats(filters)))
+
+
+if __name__ == "__main__":
+    main()
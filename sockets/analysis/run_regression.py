@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+# Keeps baselines of analysed results and checks new results against them,
+# flagging significant latency regressions. Exits with status 1 if any is
+# found, so it can be used as a gate on CI. Results are either a CSV
+# directory, analysed in streaming mode, or the export of a previous
+# analysis (see export.py), which only needs the compact summaries.
+
+import argparse
+import os
+import sys
+
+from baselines import DEFAULT_STORE_DIR, BaselineStore
+from export import load_summaries
+from metrics import all_classes
+from regression import (DEFAULT_ALPHA, DEFAULT_MAX_TOLERANCE,
+                        DEFAULT_TOLERANCE, REGRESSION, check)
+from reports import regression_table
+from results_cache import cache_dir_of
+from streaming import StreamingAnalysis
+
+
+# Summaries of the results given on `args`, and a description of them
+def results_summaries(args):
+    if args.export_dir is not None:
+        return (load_summaries(args.export_dir),
+                os.path.abspath(args.export_dir))
+
+    analysis = StreamingAnalysis(args.csv_dir,
+                                 cache_dir_of(args.csv_dir, args))
+    analysis.analyse(all_classes)
+    return analysis.summaries(), os.path.abspath(args.csv_dir)
+
+
+def save(store, args):
+    summaries, source = results_summaries(args)
+    store.save(args.name, summaries, source)
+    print(f'Baseline {args.name} saved at {store.store_dir}')
+
+
+def check_baseline(store, args):
+    baseline = store.load(args.name)
+    current, _ = results_summaries(args)
+    rows, missing = check(baseline, current, args.alpha, args.tolerance,
+                          args.max_tolerance)
+
+    table = regression_table(rows)
+    print(table)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            f.write(f'Check against baseline {args.name}\n\n')
+            f.write(table)
+
+    for key in missing:
+        print(f'WARNING: {key[0].name} ({key[1]} bytes, '
+              f'{int(key[2] / 1000)} us) is on the baseline, but not on '
+              f'the results')
+
+    regressions = [row for row in rows if row['verdict'] == REGRESSION]
+    if len(regressions) > 0:
+        print(f'{len(regressions)} regression(s) against baseline '
+              f'{args.name}')
+        sys.exit(1)
+    print(f'No regressions against baseline {args.name}')
+
+
+def list_baselines(store, args):
+    for name in store.names():
+        info = store.info(name)
+        print(f'{name}: {info.get("source", "")} ({info.get("saved", "")})')
+
+
+def add_results_arguments(parser):
+    results = parser.add_mutually_exclusive_group(required=True)
+    results.add_argument('-d', dest='csv_dir',
+                         help='Directory with CSV data from all test runs')
+    results.add_argument('-e', dest='export_dir',
+                         help='Graphs directory of a previous analysis, with '
+                              'its exported analysis.json and analysis.npz')
+    parser.add_argument('--cache-dir', dest='cache_dir',
+                        help='Directory where parsed CSV data is cached. '
+                             'Defaults to .cache inside CSV directory')
+    parser.add_argument('--disable-cache', dest='disable_cache',
+                        action='store_true',
+                        help='Don\'t cache parsed CSV data')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--store', dest='store_dir',
+                        default=DEFAULT_STORE_DIR,
+                        help='Directory where baselines are kept')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    save_parser = commands.add_parser(
+            'save', help='Save results as a baseline')
+    save_parser.add_argument('name', help='Name of the baseline')
+    add_results_arguments(save_parser)
+    save_parser.set_defaults(function=save)
+
+    check_parser = commands.add_parser(
+            'check', help='Check results against a baseline')
+    check_parser.add_argument('name', help='Name of the baseline')
+    add_results_arguments(check_parser)
+    check_parser.add_argument('--alpha', dest='alpha', type=float,
+                              default=DEFAULT_ALPHA,
+                              help='Significance level of the tests')
+    check_parser.add_argument('--tolerance', dest='tolerance', type=float,
+                              default=DEFAULT_TOLERANCE,
+                              help='Smallest significant change of mean or '
+                                   'P99 flagged, in percent')
+    check_parser.add_argument('--max-tolerance', dest='max_tolerance',
+                              type=float, default=DEFAULT_MAX_TOLERANCE,
+                              help='Smallest change of maximum flagged, in '
+                                   'percent')
+    check_parser.add_argument('-o', dest='output',
+                              help='File where the check table is saved')
+    check_parser.set_defaults(function=check_baseline)
+
+    list_parser = commands.add_parser('list', help='List baselines')
+    list_parser.set_defaults(function=list_baselines)
+
+    args = parser.parse_args()
+    args.function(BaselineStore(args.store_dir), args)
+
+
+if __name__ == "__main__":
+    main()
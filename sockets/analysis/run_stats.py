@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+# Produces the stats reports (and the export) of run_analysis.py, but no
+# charts. Only NumPy and tabulate are needed, so it's quick to start and
+# suits places such as CI, where charts are not looked at. Stats are
+# computed as on `run_analysis.py --streaming`, so memory usage is bounded.
+
+import argparse
+import sys
+
+from datetime import datetime
+from metrics import (E2EMetric, TotalRxMetric, TotalTxMetric, hw_sw_classes,
+                     rx_intermediate_classes, tx_intermediate_classes)
+from streaming import DEFAULT_CHUNK_ROWS
+from streaming_reports import streaming_analysis
+from worst_packets import DEFAULT_TOP_K
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', dest='csv_dir',
+                        required=True,
+                        help='Directory with CSV data from all test runs')
+    parser.add_argument('-g', dest='graphs_dir',
+                        default='graph_'
+                                f'{datetime.now().strftime("%Y-%m-%d-%H-%M")}',
+                        help='Directory where results will be stored')
+    parser.add_argument('--disable-rx', dest='disable_rx',
+                        action='store_true',
+                        help='Don\'t analyze RX data')
+    parser.add_argument('--disable-tx', dest='disable_tx',
+                        action='store_true',
+                        help='Don\'t analyze TX data')
+    parser.add_argument('--disable-end-to-end', dest='disable_end_to_end',
+                        action='store_true',
+                        help='Don\'t produce end-to-end report')
+    parser.add_argument('--disable-hw-vs-sw', dest='disable_hw_vs_sw',
+                        action='store_true',
+                        help='Don\'t produce HW vs SW report')
+    parser.add_argument('--cache-dir', dest='cache_dir',
+                        help='Directory where parsed CSV data is cached. '
+                             'Defaults to .cache inside CSV directory')
+    parser.add_argument('--disable-cache', dest='disable_cache',
+                        action='store_true',
+                        help='Don\'t cache parsed CSV data')
+    parser.add_argument('--chunk-rows', dest='chunk_rows', type=int,
+                        default=DEFAULT_CHUNK_ROWS,
+                        help='Rows of CSV data processed at a time')
+    parser.add_argument('--disable-export', dest='disable_export',
+                        action='store_true',
+                        help='Don\'t export stats and histograms to '
+                             'analysis.json and analysis.npz')
+    parser.add_argument('--worst-packets', dest='worst_packets', type=int,
+                        default=DEFAULT_TOP_K,
+                        help='Number of worst packets of each metric and '
+                             'factors saved, with their timestamps, on '
+                             'worst_packets folder. 0 disables it')
+    parser.add_argument('--time-window', dest='time_window', type=float,
+                        help='Window, in seconds (such as 0.1, 1 or 10), of '
+                             'the count, mean, P99 and maximum latency of '
+                             'each metric over time, saved on time_windows '
+                             'folder. Disabled if not given')
+    parser.add_argument('--db', dest='db_file',
+                        help='Database file of analysed runs where the stats '
+                             'are recorded, to be queried with run_query.py')
+    args = parser.parse_args()
+
+    metrics_of_interest = []
+    if not args.disable_rx:
+        metrics_of_interest.extend([TotalRxMetric, *rx_intermediate_classes])
+
+    if not args.disable_tx:
+        metrics_of_interest.extend([TotalTxMetric, *tx_intermediate_classes])
+
+    if not args.disable_end_to_end:
+        metrics_of_interest.append(E2EMetric)
+
+    if not args.disable_hw_vs_sw:
+        metrics_of_interest.extend(hw_sw_classes)
+
+    if len(metrics_of_interest) == 0:
+        print('Nothing to do. Were all analysis disabled?')
+        sys.exit(0)
+
+    streaming_analysis(metrics_of_interest, args)
+    print(f'Results saved at {args.graphs_dir}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import math
+
+import numpy as np
+
+from histograms import aligned_counts
+
+# Bootstrap resamples used for confidence intervals. The generator is
+# seeded, so the same results always get the same intervals.
+BOOTSTRAP_ITERATIONS = 1000
+BOOTSTRAP_SEED = 0
+BOOTSTRAP_MARGIN = 10
+CONFIDENCE = 95
+
+# Two-sample tests comparing sets of latency values. Tests work on the
+# LatencyHistogram of each set: as histograms of any set share the same
+# buckets, they're already sorted, aligned samples, and tests cost as much as
+# the number of buckets, not of values. Values on the same bucket (about 0.2%
+# apart at most) are taken as ties.
+
+
+# Probability of a Kolmogorov distribution value above `statistic`
+# (asymptotic, for samples of sizes `n` and `m`). Its series doesn't converge
+# for small values, where the probability is 1 anyway.
+def _ks_p_value(statistic, n, m):
+    en = math.sqrt(n * m / (n + m))
+    lam = (en + 0.12 + 0.11 / en) * statistic
+    if lam < 0.3:
+        return 1.0
+    k = np.arange(1, 101)
+    p = 2 * np.sum((-1.0) ** (k - 1) * np.exp(-2 * k ** 2 * lam ** 2))
+    return float(min(max(p, 0.0), 1.0))
+
+
+# Kolmogorov-Smirnov test of counts `a` and `b`, aligned on the same buckets.
+# Returns a pair (A, B), where A is the statistic (largest distance between
+# the cumulative distributions) and B its p-value.
+def ks_test(a, b):
+    n, m = a.sum(), b.sum()
+    statistic = float(np.max(np.abs(np.cumsum(a) / n - np.cumsum(b) / m)))
+    return statistic, _ks_p_value(statistic, n, m)
+
+
+# Mann-Whitney U test of counts `a` and `b`, aligned on the same buckets.
+# Returns a pair (A, B), where A is the probability of a value of `b` being
+# bigger than one of `a` (ties counting half) and B the p-value (normal
+# approximation, with tie correction).
+def mann_whitney_u(a, b):
+    n, m = int(a.sum()), int(b.sum())
+    a_below = np.cumsum(a) - a
+    u = float(np.sum(b * (a_below + a / 2)))
+
+    total = n + m
+    ties = (a + b).astype(np.float64)
+    tie_term = float(np.sum(ties ** 3 - ties)) / (total * (total - 1))
+    sigma = math.sqrt(n * m / 12 * ((total + 1) - tie_term))
+    if sigma == 0:
+        return u / (n * m), 1.0
+    z = (u - n * m / 2) / sigma
+    return u / (n * m), math.erfc(abs(z) / math.sqrt(2))
+
+
+# Index of the bucket of `counts` where the `rank`th value of each resample
+# (with replacement) falls, given `drawn`, the number of values of each
+# resample already drawn below bucket `first`. The rest are drawn a bucket at
+# a time, for all resamples at once (a binomial of the values left to draw),
+# only until every resample gets to `rank`.
+def _percentile_indices(counts, first, drawn, rank, rng):
+    n = int(counts.sum())
+    drawn = drawn.copy()
+    indices = np.full(len(drawn), len(counts) - 1)
+    pending = drawn < rank
+    left = n - int(counts[:first].sum())
+    for index in range(first, len(counts)):
+        if not np.any(pending):
+            break
+        count = int(counts[index])
+        if count == 0:
+            continue
+        drawn += rng.binomial(n - drawn, count / left)
+        left -= count
+        reached = pending & (drawn >= rank)
+        indices[reached] = index
+        pending &= ~reached
+    return indices
+
+
+# `q` percentile of each of `iterations` resamples (with replacement) of
+# counts `counts` of buckets `values`. Buckets well below the percentile
+# (BOOTSTRAP_MARGIN standard deviations of the number of values below it)
+# are drawn as a whole. The few resamples where the percentile still falls
+# below them are drawn again from the first bucket.
+def _bootstrap_percentiles(values, counts, q, iterations, rng):
+    n = int(counts.sum())
+    rank = max(int(np.ceil(q / 100 * n)), 1)
+    cumulative = np.cumsum(counts)
+    sd = math.sqrt(n * q / 100 * (1 - q / 100))
+    first = int(np.searchsorted(cumulative, rank - BOOTSTRAP_MARGIN * sd,
+                                side='right'))
+    below_first = cumulative[first - 1] / n if first > 0 else 0.0
+
+    below = rng.binomial(n, below_first, size=iterations)
+    indices = _percentile_indices(counts, first, below, rank, rng)
+
+    missed = below >= rank
+    if np.any(missed):
+        indices[missed] = _percentile_indices(
+                counts, 0, np.zeros(int(missed.sum()), dtype=np.int64), rank,
+                rng)
+    return values[indices]
+
+
+# Bootstrap confidence interval (percentile method) of the difference of the
+# `q` percentile of `histogram_b` minus that of `histogram_a`. Returns a pair
+# (A, B) with the interval bounds, in microseconds.
+def bootstrap_percentile_difference(histogram_a, histogram_b, q=99,
+                                    iterations=BOOTSTRAP_ITERATIONS,
+                                    confidence=CONFIDENCE):
+    values, (a, b) = aligned_counts([histogram_a, histogram_b])
+    rng = np.random.default_rng(BOOTSTRAP_SEED)
+
+    # Limited by actual extremes, as on LatencyHistogram.percentile()
+    percentiles_a = np.clip(values, histogram_a.minimum / 1000,
+                            histogram_a.maximum / 1000)
+    percentiles_b = np.clip(values, histogram_b.minimum / 1000,
+                            histogram_b.maximum / 1000)
+    differences = (
+            _bootstrap_percentiles(percentiles_b, b, q, iterations, rng) -
+            _bootstrap_percentiles(percentiles_a, a, q, iterations, rng))
+
+    alpha = (100 - confidence) / 2
+    low, high = np.percentile(differences, [alpha, 100 - alpha])
+    return float(low), float(high)
+
+
+# Compares `histogram_b` against `histogram_a` with all tests above. Returns
+# a dictionary with the results, or None if any of them is empty.
+def compare(histogram_a, histogram_b):
+    if histogram_a.count == 0 or histogram_b.count == 0:
+        return None
+
+    _, (a, b) = aligned_counts([histogram_a, histogram_b])
+    ks_statistic, ks_p = ks_test(a, b)
+    mwu_probability, mwu_p = mann_whitney_u(a, b)
+    p99_a = histogram_a.percentile(99)
+    p99_b = histogram_b.percentile(99)
+    p99_low, p99_high = bootstrap_percentile_difference(histogram_a,
+                                                        histogram_b)
+
+    return {'ks_statistic': ks_statistic, 'ks_p': ks_p,
+            'mwu_probability': mwu_probability, 'mwu_p': mwu_p,
+            'p99_a': p99_a, 'p99_b': p99_b, 'p99_difference': p99_b - p99_a,
+            'p99_difference_low': p99_low, 'p99_difference_high': p99_high}
@@ -0,0 +1,142 @@
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import numpy as np
+
+from histograms import bucket_index
+from metric_index import MetricIndex
+
+# Percentiles of the total latency whose stage breakdown is profiled: that of
+# the packets ranked PROFILE_BAND percentage points around each of them
+PROFILE_PERCENTILES = [(50, 'P50'), (99, 'P99'), (99.9, 'P99.9')]
+PROFILE_BAND = 0.05
+# Packets whose total latency is above this percentile make the tail profile
+TAIL_PERCENTILE = 99
+
+
+def _add_rows(rows, other):
+    if len(other) > len(rows):
+        rows, other = other, rows
+    rows = rows.copy()
+    rows[:len(other)] += other
+    return rows
+
+
+# Breakdown of latency by stage, conditioned on the total latency of each
+# packet (the sum of its stages). Packets are counted on the buckets of
+# LatencyHistogram, by total latency, and each bucket keeps the sum of each
+# stage latency of its packets. So, just like a LatencyHistogram, it's
+# calculated in a single pass, can be merged, and its size depends only on
+# the range of the values. From it, the mean breakdown of the packets at any
+# percentile of total latency (or above it) is exact up to the bucket
+# resolution.
+class StageProfile():
+    # `stages` are the names of the stages, in order
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.sums = np.zeros((0, len(self.stages)))
+
+    @property
+    def count(self):
+        return int(np.sum(self.counts))
+
+    # `values` is a matrix with a row per packet and a column per stage,
+    # with its latency in microseconds or, if `nanoseconds` is True, in
+    # integer nanoseconds (as metrics values)
+    def update(self, values, nanoseconds=False):
+        if nanoseconds:
+            values = np.asarray(values, dtype=np.int64)
+        else:
+            values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return self
+        # Negative totals (which shouldn't happen, but clocks are not
+        # perfect) are taken as zero: they're the lowest ones anyway
+        if nanoseconds:
+            ns = np.maximum(values.sum(axis=1), 0)
+        else:
+            ns = np.maximum(np.rint(values.sum(axis=1) * 1000), 0)
+        buckets = bucket_index(ns.astype(np.int64))
+        length = int(buckets.max()) + 1
+        sums = np.column_stack([np.bincount(buckets, weights=values[:, i],
+                                            minlength=length)
+                                for i in range(len(self.stages))])
+        if nanoseconds:
+            sums /= 1000
+        self.counts = _add_rows(self.counts, np.bincount(buckets))
+        self.sums = _add_rows(self.sums, sums)
+        return self
+
+    def merge(self, other):
+        self.counts = _add_rows(self.counts, other.counts)
+        self.sums = _add_rows(self.sums, other.sums)
+        return self
+
+    # Bucket where the packet of rank `rank` (from 1) falls
+    def _bucket_of(self, rank):
+        rank = min(max(rank, 1), self.count)
+        return int(np.searchsorted(np.cumsum(self.counts), rank))
+
+    # Mean latency of each stage of the packets on buckets `first` to `last`
+    # (inclusive), or None if there's none
+    def _means(self, first, last):
+        count = np.sum(self.counts[first:last + 1])
+        if count == 0:
+            return None
+        return (self.sums[first:last + 1].sum(axis=0) / count).tolist()
+
+    # Mean latency of each stage of the packets whose total latency is at
+    # the `q` percentile: those ranked `band` percentage points around it
+    def percentile_means(self, q, band=PROFILE_BAND):
+        count = self.count
+        if count == 0:
+            return None
+        first = self._bucket_of(int(np.ceil((q - band) / 100 * count)))
+        last = self._bucket_of(int(np.ceil((q + band) / 100 * count)))
+        return self._means(first, last)
+
+    # Mean latency of each stage of the packets whose total latency is above
+    # the `q` percentile (that is, on buckets above its bucket)
+    def tail_means(self, q=TAIL_PERCENTILE):
+        if self.count == 0:
+            return None
+        return self._means(
+                self._bucket_of(int(np.ceil(q / 100 * self.count))) + 1,
+                len(self.counts) - 1)
+
+    # Returns a list of pairs (A, B), where A is the name of each profile
+    # (PROFILE_PERCENTILES and the tail one) and B the mean latency of each
+    # stage on it. Profiles without packets are left out.
+    def profiles(self):
+        profiles = [(name, self.percentile_means(q))
+                    for q, name in PROFILE_PERCENTILES]
+        profiles.append((f'>P{TAIL_PERCENTILE:g}', self.tail_means()))
+        return [(name, means) for name, means in profiles
+                if means is not None]
+
+
+# StageProfile of `metrics` of `metric_types` (whose values are available),
+# with a stage per type of metric, named by its short name. Metrics of the
+# same factors are taken as stages of the same packets. Returns None if
+# there are no such metrics.
+def stage_profile_of(metrics, metric_types):
+    index = MetricIndex(metrics)
+    metric_types = [metric_type for metric_type in metric_types
+                    if len(index.of([metric_type])) > 0]
+    if len(metric_types) == 0:
+        return None
+
+    profile = StageProfile(metric_type.short_name
+                           for metric_type in metric_types)
+    for factors in index.factors_of(metric_types):
+        factor_metrics = [index.of([metric_type], factors)
+                          for metric_type in metric_types]
+        # Stages of the same packets come from the same results file
+        if any(len(m) != 1 for m in factor_metrics):
+            continue
+        profile.update(np.column_stack([m[0].metric
+                                        for m in factor_metrics]),
+                       nanoseconds=True)
+    return profile
@@ -0,0 +1,175 @@
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import numpy as np
+
+# Number of rows processed at a time when calculating stage deltas. Working
+# on blocks of rows avoids full-size temporaries, which matters when columns
+# are memory-mapped from the results cache.
+BLOCK_ROWS = 1 << 18
+
+# Latency stages a packet goes through. Each stage is the sum of its positive
+# timestamp columns minus the sum of its negative ones. Some stages also need
+# the hardware receive adjustment, whose sign is the third element of the
+# tuple (or 0 if not needed):
+#
+# When more than one packet is processed for the same IRQ, Hardware Receive
+# latency (irq_handler_entry - HardwareReceiveTimestamp) will be negative,
+# since the new packet will be received after the IRQ. Instead of having it
+# negative, let's keep it at zero, and make Driver Receive latency account
+# for "napi_gro_receive_entry - HardwareReceiveTimestamp", as it's drivers
+# fault (or feature) that IRQs were not used. So, on those packets, stages
+# with adjustment -1 have the raw Hardware Receive latency subtracted and
+# stages with adjustment 1 have it added.
+STAGES = {
+    'end_to_end': (['SoftwareReceiveTimestamp'],
+                   ['SoftwareTransmitTimestamp'], 0),
+    'total_rx': (['SoftwareReceiveTimestamp'],
+                 ['HardwareReceiveTimestamp'], 0),
+    'total_tx': (['HardwareReceiveTimestamp'],
+                 ['SoftwareTransmitTimestamp'], 0),
+    'hw_rx': (['irq_handler_entry'], ['HardwareReceiveTimestamp'], -1),
+    'driver_rx': (['napi_gro_receive_entry'], ['irq_handler_entry'], 1),
+    'net_core_rx': (['netif_receive_skb'], ['napi_gro_receive_entry'], 0),
+    'socket_rx': (['sys_exit_recvmsg'], ['netif_receive_skb'], 0),
+    'context_switch_rx': (['SoftwareReceiveTimestamp'],
+                          ['sys_exit_recvmsg'], 0),
+    'hw_tx': (['HardwareReceiveTimestamp'], ['net_dev_xmit'], 0),
+    'driver_tx': (['net_dev_xmit'], ['net_dev_start_xmit'], 0),
+    'net_core_tx': (['net_dev_start_xmit'], ['net_dev_queue'], 0),
+    'vlan_tx': (['net_dev_queue'], ['net_dev_queue_vlan'], 0),
+    'socket_tx': (['net_dev_queue_vlan'], ['sys_enter_sendto'], 0),
+    'context_switch_tx': (['sys_enter_sendto'],
+                          ['SoftwareTransmitTimestamp'], 0),
+    # Hardware Receive + Hardware Transmit
+    'total_hw': (['irq_handler_entry'], ['net_dev_xmit'], -1),
+    # Everything else, from SoftwareTransmitTimestamp to
+    # SoftwareReceiveTimestamp
+    'total_sw': (['net_dev_xmit', 'SoftwareReceiveTimestamp'],
+                 ['SoftwareTransmitTimestamp', 'irq_handler_entry'], 1),
+}
+
+_HW_RX_COLUMNS = ['irq_handler_entry', 'HardwareReceiveTimestamp']
+
+# Timestamp columns, in the order a packet goes through them
+TIMESTAMPS = ['SoftwareTransmitTimestamp', 'sys_enter_sendto',
+              'net_dev_queue_vlan', 'net_dev_queue', 'net_dev_start_xmit',
+              'net_dev_xmit', 'HardwareReceiveTimestamp', 'irq_handler_entry',
+              'napi_gro_receive_entry', 'netif_receive_skb',
+              'sys_exit_recvmsg', 'SoftwareReceiveTimestamp']
+
+_TX_PARTS = ['context_switch_tx', 'socket_tx', 'vlan_tx', 'net_core_tx',
+             'driver_tx', 'hw_tx']
+_RX_PARTS = ['hw_rx', 'driver_rx', 'net_core_rx', 'socket_rx',
+             'context_switch_rx']
+
+# Consecutive stages each stage above is the sum of (hardware receive
+# adjustments included), from the finest split to the coarsest. Stages not
+# here are not split.
+STAGE_PARTS = {
+    'end_to_end': [_TX_PARTS + _RX_PARTS, ['total_tx', 'total_rx']],
+    'total_rx': [_RX_PARTS],
+    'total_tx': [_TX_PARTS],
+    'total_hw': [['hw_rx', 'hw_tx']],
+    'total_sw': [_TX_PARTS[:-1] + _RX_PARTS[1:]],
+}
+
+
+# Timestamp columns needed to calculate `stage`
+def stage_columns(stage):
+    positive, negative, adjustment = STAGES[stage]
+    columns = positive + negative
+    if adjustment != 0:
+        columns += [c for c in _HW_RX_COLUMNS if c not in columns]
+    return columns
+
+
+# Finest split of `stage` (see STAGE_PARTS) whose stages can all be
+# calculated from `columns`. Stages that can't be split are their only part.
+def stage_parts(stage, columns):
+    columns = set(columns)
+    for parts in STAGE_PARTS.get(stage, []):
+        if all(columns.issuperset(stage_columns(part)) for part in parts):
+            return parts
+    return [stage]
+
+
+# Latency, in nanoseconds, of each packet on each stage of a results file, as
+# an N x stages int64 matrix. All stages are calculated in a single pass
+# over the timestamp columns, a block of rows at a time. The matrix is stored
+# in column-major order, so each stage is a contiguous view of the matrix.
+# It's calculated on first use.
+class StageDeltas():
+    # `dataframe` is any mapping of column names to arrays. Only `stages` (all
+    # stages if None) whose columns are on `dataframe` are calculated.
+    def __init__(self, dataframe, stages=None):
+        if stages is None:
+            stages = STAGES.keys()
+        self.dataframe = dataframe
+        available = set(dataframe.keys())
+        self.stages = [stage for stage in dict.fromkeys(stages)
+                       if available.issuperset(stage_columns(stage))]
+        self.index = {stage: i for i, stage in enumerate(self.stages)}
+        self.matrix = None
+        # Metrics sharing it (see share())
+        self.users = set()
+
+    def evaluate(self):
+        if self.matrix is not None:
+            return self.matrix
+
+        columns = {c: np.asarray(self.dataframe[c])
+                   for stage in self.stages for c in stage_columns(stage)}
+        rows = len(next(iter(columns.values()), []))
+        matrix = np.empty((rows, len(self.stages)), dtype=np.int64,
+                          order='F')
+
+        adjust = any(STAGES[stage][2] != 0 for stage in self.stages)
+        for start in range(0, rows, BLOCK_ROWS):
+            block = slice(start, start + BLOCK_ROWS)
+            values = {c: v[block] for c, v in columns.items()}
+
+            if adjust:
+                hw_rx = (values['irq_handler_entry'] -
+                         values['HardwareReceiveTimestamp'])
+                negative_hw_rx = hw_rx <= 0
+                hw_rx_adjustment = hw_rx[negative_hw_rx]
+
+            for i, stage in enumerate(self.stages):
+                positive, negative, adjustment = STAGES[stage]
+                delta = matrix[block, i]
+                np.subtract(values[positive[0]], values[negative[0]],
+                            out=delta)
+                for c in positive[1:]:
+                    delta += values[c]
+                for c in negative[1:]:
+                    delta -= values[c]
+                if adjustment != 0:
+                    delta[negative_hw_rx] += adjustment * hw_rx_adjustment
+
+        self.matrix = matrix
+        return matrix
+
+    # Latencies, in nanoseconds, of `stage`
+    def of(self, stage):
+        if stage not in self.index:
+            missing = [c for c in stage_columns(stage)
+                       if c not in self.dataframe.keys()]
+            raise KeyError(f'{missing} not found')
+        return self.evaluate()[:, self.index[stage]]
+
+    # Drops the matrix. It's calculated again if needed later.
+    def release(self):
+        self.matrix = None
+
+    # Metrics share the StageDeltas of their file from when they're built,
+    # or calculate their values again, until they release them. When the
+    # last one does, the matrix is dropped.
+    def share(self, user):
+        self.users.add(user)
+
+    def unshare(self, user):
+        self.users.discard(user)
+        if len(self.users) == 0:
+            self.release()
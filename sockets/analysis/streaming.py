@@ -0,0 +1,231 @@
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import numpy as np
+
+from aggregates import LatencyAggregate, merge_aggregates
+from analysis import Analysis
+from histograms import LatencyHistogram, merge_histograms
+from results_cache import read_csv_chunks
+from stage_profile import StageProfile
+from stages import StageDeltas
+from time_windows import TimeWindows, WindowedStats
+from worst_packets import WorstPackets
+
+DEFAULT_CHUNK_ROWS = 1 << 20
+
+
+# Computes metrics stats reading results files a chunk of rows at a time.
+# Only a LatencyAggregate and a LatencyHistogram per metric and factors are
+# kept, so memory usage is
+# bounded by the chunk size, no matter how long the experiments ran. As no
+# metric values are kept, this analysis can produce stats, but not charts.
+class StreamingAnalysis(Analysis):
+    def __init__(self, csv_dir, cache_dir=None,
+                 chunk_rows=DEFAULT_CHUNK_ROWS):
+        super(StreamingAnalysis, self).__init__(csv_dir, None, cache_dir)
+        self.chunk_rows = chunk_rows
+
+    # Yields chunks of `file_name` as mappings of column to values. If there
+    # is a cache, chunks are slices of its memory-mapped columns. A file
+    # without rows yields a single empty chunk, so its metrics are still
+    # there (without values), as on Analysis.
+    def _chunks(self, file_name, columns):
+        if self.cache is not None:
+            store = self.cache.map_csv(file_name, columns)
+            rows = len(next(iter(store.values()), []))
+            for start in range(0, max(rows, 1), self.chunk_rows):
+                yield {column: values[start:start + self.chunk_rows]
+                       for column, values in store.items()}
+        else:
+            for chunk in read_csv_chunks(file_name, columns,
+                                         chunk_rows=self.chunk_rows):
+                yield chunk
+
+    # If `top_k` is bigger than zero, the WorstPackets of each metric and
+    # factors are kept as well (see worst_packets()). So is the StageProfile
+    # of each list of metric classes on `profile_types` (see
+    # stage_profiles()). If `window_ns` is not None, so are the WindowedStats
+    # of each metric and factors, on windows of that many nanoseconds (see
+    # windowed_stats()).
+    def analyse(self, metrics_of_interest, top_k=0, profile_types=(),
+                window_ns=None):
+        columns = set()
+        if window_ns is not None:
+            columns.add('SoftwareTransmitTimestamp')
+        for metric in metrics_of_interest:
+            columns.update(metric.columns)
+
+        self.aggregates = {}
+        self.histograms = {}
+        self.worst = {}
+        self.profiles = {}
+        self.windowed = {}
+        for file_name in self.file_names:
+            factors = self._factors_from_filename(file_name)
+            first_row = 0
+            for chunk in self._chunks(file_name, columns):
+                metrics_cls = [metric for metric in metrics_of_interest
+                               if metric.available_on(chunk.keys())]
+                stage_deltas = StageDeltas(chunk, [metric.stage
+                                                   for metric in metrics_cls])
+                windows = None
+                if window_ns is not None:
+                    windows = TimeWindows(chunk['SoftwareTransmitTimestamp'],
+                                          window_ns)
+                chunk_values = {}
+                for metric_cls in metrics_cls:
+                    metric = metric_cls(chunk, factors, self.results_dir,
+                                        cache_metric=False,
+                                        stage_deltas=stage_deltas)
+                    key = (metric_cls, factors['PayloadSize'],
+                           factors['TransmissionInterval'])
+                    values = metric.metric
+                    chunk_values[metric_cls] = values
+                    self.aggregates.setdefault(
+                            key, LatencyAggregate()).update(
+                                    values, nanoseconds=True)
+                    self.histograms.setdefault(
+                            key, LatencyHistogram()).update(
+                                    values, nanoseconds=True)
+                    if top_k > 0:
+                        self.worst.setdefault(
+                                key, WorstPackets(top_k)).update(
+                                        chunk, values, first_row,
+                                        nanoseconds=True)
+                    if windows is not None:
+                        self.windowed.setdefault(
+                                key, WindowedStats(window_ns)).update(
+                                        windows, values, nanoseconds=True)
+                first_row += len(next(iter(chunk.values()), []))
+
+                for types in profile_types:
+                    if not all(t in chunk_values for t in types):
+                        continue
+                    self.profiles.setdefault(tuple(types), StageProfile(
+                            t.short_name for t in types)).update(
+                                    np.column_stack([chunk_values[t]
+                                                     for t in types]),
+                                    nanoseconds=True)
+
+    # Returns the aggregates and histograms of the metrics analysed, in the
+    # format of export.summaries_of()
+    def summaries(self):
+        return {key: (self.aggregates[key], self.histograms[key])
+                for key in self.aggregates}
+
+    # Returns the WorstPackets of the metrics analysed, in the format of
+    # worst_packets.worst_packets_of(), if analysed with `top_k`
+    def worst_packets(self):
+        return self.worst
+
+    # Returns the WindowedStats of the metrics analysed, in the format of
+    # time_windows.windowed_stats_of(), if analysed with `window_ns`
+    def windowed_stats(self):
+        return self.windowed
+
+    # Returns a dictionary whose keys are tuples of the metric classes of each
+    # list on `profile_types`, when analysed, and values their StageProfile,
+    # with all factors merged
+    def stage_profiles(self):
+        return self.profiles
+
+    # Returns a StreamingMetricGroup with the aggregates and histograms of
+    # `metric_cls` metrics, or None if there's none.
+    def group_of(self, metric_cls, name=None):
+        return group_of(self.summaries(), metric_cls, name)
+
+    # See metrics_of() below
+    def metrics_of(self, metric_cls):
+        return metrics_of(self.summaries(), metric_cls, self.results_dir)
+
+
+# Returns a metric of each class on `metric_cls` and factors on `summaries`
+# (in the format of export.summaries_of()), holding only its aggregate and
+# histogram. Metric values are not available, but stats, groups and charts
+# of aggregates and histograms (such as comparisons) work as with metrics of
+# an Analysis. Metrics are sorted by factors, then by their order on
+# `metric_cls`.
+def metrics_of(summaries, metric_cls, results_dir=None):
+    metric_cls = list(metric_cls)
+    keys = [key for key in summaries if key[0] in metric_cls]
+    keys.sort(key=lambda key: (key[1], key[2], metric_cls.index(key[0])))
+
+    metrics = []
+    for key in keys:
+        factors = {'PayloadSize': key[1], 'TransmissionInterval': key[2]}
+        metric = key[0](None, factors, results_dir)
+        metric.restore(*summaries[key])
+        metrics.append(metric)
+    return metrics
+
+
+# Returns a StreamingMetricGroup with the aggregates and histograms of
+# `metric_cls` metrics on `summaries` (in the format of
+# export.summaries_of()), or None if there's none.
+def group_of(summaries, metric_cls, name=None):
+    keys = [key for key in summaries if key[0] in metric_cls]
+    if len(keys) == 0:
+        return None
+    return StreamingMetricGroup(
+            name, {key: summaries[key][0] for key in keys},
+            {key: summaries[key][1] for key in keys})
+
+
+# Provides the same stats of MetricGroupAnalysis (in the same format), but
+# from aggregates computed by StreamingAnalysis.
+class StreamingMetricGroup():
+    # `aggregates` is a dictionary whose keys are tuples (A, B, C), where A
+    # is the metric class, B the payload size and C the transmission interval
+    # and values are LatencyAggregate. `histograms` has the same keys, with
+    # LatencyHistogram values.
+    def __init__(self, name, aggregates, histograms):
+        self.name = name
+        self.aggregates = aggregates
+        self.histograms = histograms
+        self.metrics_types = sorted({key[0] for key in self.aggregates},
+                                    key=lambda mt: mt.name)
+        self.factors_list = sorted({key[1:] for key in self.aggregates})
+
+    def stats(self, summary=False):
+        stats = []
+        for metric_type in self.metrics_types:
+            keys = [key for key in self.aggregates if key[0] == metric_type]
+            aggregate = merge_aggregates(self.aggregates[key] for key in keys)
+            histogram = merge_histograms(self.histograms[key] for key in keys)
+            stats.append({'metric': metric_type.short_name,
+                          **aggregate.stats(), **histogram.stats()})
+
+        if summary:
+            aggregate = merge_aggregates(self.aggregates.values())
+            histogram = merge_histograms(self.histograms.values())
+            stats.append({'metric': 'Total',
+                          **aggregate.stats(), **histogram.stats()})
+
+        return stats
+
+    def stats_per_factor(self, summary=False):
+        stats = []
+        for (payload_size, transmission_interval) in self.factors_list:
+            factors = {'PayloadSize': payload_size,
+                       'TransmissionInterval': transmission_interval}
+            factor_stats = []
+            for metric_type in self.metrics_types:
+                key = (metric_type, payload_size, transmission_interval)
+                if key not in self.aggregates:
+                    continue
+                factor_stats.append((metric_type.short_name, {
+                    'payload_size': payload_size,
+                    'transmission_interval': transmission_interval,
+                    **self.aggregates[key].stats(),
+                    **self.histograms[key].stats()}))
+
+            stats.append((factors, factor_stats))
+
+        if summary:
+            factor_stats = [(spt['metric'], spt) for spt in self.stats()]
+            stats.append(({'PayloadSize': 'ALL',
+                         'TransmissionInterval': 'ALL'}, factor_stats))
+
+        return stats
@@ -0,0 +1,49 @@
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+# Stats reports of a StreamingAnalysis, shared by run_analysis.py (with
+# --streaming) and run_stats.py. `args` are the options parsed by them. Only
+# NumPy and tabulate are needed, so nothing here loads matplotlib.
+
+from export import export
+from reports import (report_all_time_windows, report_all_worst_packets,
+                     report_summaries)
+from results_cache import cache_dir_of
+from results_db import ResultsDatabase
+from streaming import StreamingAnalysis
+
+
+# Seconds of --time-window, in nanoseconds, or None if not given
+def window_ns(args):
+    if args.time_window is None:
+        return None
+    return int(round(args.time_window * 1e9))
+
+
+# Records `summaries` on the --db database, if given
+def record(summaries, args):
+    if args.db_file is None:
+        return
+    with ResultsDatabase(args.db_file) as db:
+        db.record(args.csv_dir, summaries)
+
+
+# Produces the same stats reports of the regular analysis, but using a
+# StreamingAnalysis, so memory usage is bounded. No charts are generated.
+def streaming_analysis(metrics_of_interest, args):
+    analysis = StreamingAnalysis(args.csv_dir,
+                                 cache_dir_of(args.csv_dir, args),
+                                 args.chunk_rows)
+    analysis.analyse(metrics_of_interest, args.worst_packets,
+                     window_ns=window_ns(args))
+
+    summaries = analysis.summaries()
+    report_summaries(summaries, args.graphs_dir)
+    report_all_worst_packets(analysis.worst_packets(), args.graphs_dir)
+    report_all_time_windows(analysis.windowed_stats(), args.graphs_dir)
+
+    if not args.disable_export:
+        export(summaries, args.graphs_dir)
+
+    record(summaries, args)
@@ -0,0 +1,245 @@
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import numpy as np
+
+from histograms import SUB_BUCKET_BITS, bucket_highest, bucket_index
+from render import render
+
+# Resolution of the per window histograms used for percentiles: buckets are
+# those of LatencyHistogram, merged 2^(SUB_BUCKET_BITS -
+# WINDOW_SUB_BUCKET_BITS) at a time, so each power of two range has
+# 2^(WINDOW_SUB_BUCKET_BITS - 1) buckets. Percentiles are then within
+# 2^-(WINDOW_SUB_BUCKET_BITS - 1) (about 1.6%) of their value, while each
+# window needs only a few hundred buckets.
+WINDOW_SUB_BUCKET_BITS = 7
+_BUCKET_SHIFT = SUB_BUCKET_BITS - WINDOW_SUB_BUCKET_BITS
+_OCTAVE_BUCKETS = 1 << (WINDOW_SUB_BUCKET_BITS - 1)
+
+# Percentile reported for each window
+WINDOW_PERCENTILE = 99
+
+
+# Range [A, B) (a pair) covering both range [`low`, `high`) and range
+# [`need_low`, `need_high`). Ranges are grown at least by their size on
+# each side they need to, so that arrays grown to cover them are only
+# reallocated a logarithmic number of times.
+def _grown(low, high, need_low, need_high):
+    if low == high:
+        return need_low, need_high
+    size = high - low
+    if need_low < low:
+        low = min(need_low, low - size)
+    if need_high > high:
+        high = max(need_high, high + size)
+    return low, high
+
+
+# Window of `window_ns` nanoseconds of each of `timestamps` (the
+# SoftwareTransmitTimestamp of packets), counting from window `first`.
+# Windows are aligned on multiples of `window_ns`, so those of chunks of the
+# same results file line up. As they're the same for every metric of a
+# chunk, they're found once and shared by their WindowedStats.
+class TimeWindows():
+    def __init__(self, timestamps, window_ns):
+        self.window_ns = int(window_ns)
+        windows = np.asarray(timestamps, dtype=np.int64) // self.window_ns
+        self.first = int(windows.min()) if len(windows) > 0 else 0
+        windows -= self.first
+        self.windows = windows
+        self.length = int(windows.max()) + 1 if len(windows) > 0 else 0
+        # Packets are sent in order, so windows are usually sorted. If so,
+        # where each window starts, for np.maximum.reduceat
+        self.starts = None
+        if np.all(windows[1:] >= windows[:-1]):
+            self.starts = np.flatnonzero(np.diff(windows, prepend=-1))
+
+
+# Count, mean, percentile and maximum latency of a metric on each window of
+# SoftwareTransmitTimestamp (see TimeWindows), merged across chunks and
+# files. Everything is computed with np.bincount (and, for the maximum,
+# np.maximum.reduceat), with no loop over values or windows: a window's
+# percentile comes from a histogram of its values, all windows' histograms
+# counted by a single 2D bincount.
+#
+# Arrays hold windows from `first` on, and buckets from `first_bucket` on.
+# Windows grow geometrically (see _grown()) and buckets a power of two range
+# at a time (as there are few of them), so each chunk is added in place,
+# costing only its own windows and buckets. Latencies are summed as integer
+# nanoseconds, so stats don't depend on how values are split into chunks.
+class WindowedStats():
+    def __init__(self, window_ns):
+        self.window_ns = int(window_ns)
+        self.first = 0
+        self.first_bucket = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.sums = np.zeros(0, dtype=np.int64)
+        self.maxima = np.zeros(0)
+        self.buckets = np.zeros((0, 0), dtype=np.int64)
+
+    @classmethod
+    def of(cls, timestamps, values, window_ns):
+        return cls(window_ns).update(TimeWindows(timestamps, window_ns),
+                                     values)
+
+    # `windows` are the TimeWindows of each of `values` (latencies, in
+    # microseconds or, if `nanoseconds` is True, in integer nanoseconds, as
+    # metrics values)
+    def update(self, windows, values, nanoseconds=False):
+        if nanoseconds:
+            ns = np.asarray(values, dtype=np.int64)
+            values = ns
+        else:
+            values = np.asarray(values, dtype=np.float64)
+            ns = np.rint(values * 1000).astype(np.int64)
+        if len(values) == 0:
+            return self
+        if windows.window_ns != self.window_ns:
+            raise Exception('Time windows of different lengths')
+        chunk = WindowedStats(self.window_ns)
+        chunk.first = windows.first
+        length = windows.length
+
+        chunk.counts = np.bincount(windows.windows, minlength=length)
+        # Sums of integers are exact on float64 (up to 2^53 ns, that is,
+        # about 104 days of latency on a window), whatever the order
+        chunk.sums = np.bincount(windows.windows, weights=ns,
+                                 minlength=length).astype(np.int64)
+        chunk.maxima = np.full(length, -np.inf)
+        if windows.starts is not None:
+            chunk.maxima[windows.windows[windows.starts]] = (
+                    np.maximum.reduceat(values, windows.starts))
+        else:
+            np.maximum.at(chunk.maxima, windows.windows, values)
+        if nanoseconds:
+            chunk.maxima /= 1000
+
+        # Negative values (which shouldn't happen, but clocks are not
+        # perfect) are counted on the lowest bucket
+        buckets = bucket_index(np.maximum(ns, 0)) >> _BUCKET_SHIFT
+        chunk.first_bucket = int(buckets.min())
+        buckets -= chunk.first_bucket
+        width = int(buckets.max()) + 1
+        chunk.buckets = np.bincount(windows.windows * width + buckets,
+                                    minlength=length * width).reshape(
+                                            length, width)
+        return self.merge(chunk)
+
+    # Grows the arrays, if needed, to hold `length` windows from window
+    # `first` and `width` buckets from bucket `first_bucket`
+    def _reserve(self, first, length, first_bucket, width):
+        low, high = _grown(self.first, self.first + len(self.counts),
+                           first, first + length)
+        bucket_low = min(first_bucket, self.first_bucket)
+        bucket_high = max(first_bucket + width,
+                          self.first_bucket + self.buckets.shape[1])
+        if self.buckets.shape[1] == 0:
+            bucket_low, bucket_high = first_bucket, first_bucket + width
+        bucket_low -= bucket_low % _OCTAVE_BUCKETS
+        bucket_high += -bucket_high % _OCTAVE_BUCKETS
+        if (low == self.first and high - low == len(self.counts) and
+                bucket_low == self.first_bucket and
+                bucket_high - bucket_low == self.buckets.shape[1]):
+            return
+
+        windows = slice(self.first - low,
+                        self.first - low + len(self.counts))
+        buckets = slice(self.first_bucket - bucket_low,
+                        self.first_bucket - bucket_low +
+                        self.buckets.shape[1])
+        counts = np.zeros(high - low, dtype=np.int64)
+        counts[windows] = self.counts
+        sums = np.zeros(high - low, dtype=np.int64)
+        sums[windows] = self.sums
+        maxima = np.full(high - low, -np.inf)
+        maxima[windows] = self.maxima
+        bucket_counts = np.zeros((high - low, bucket_high - bucket_low),
+                                 dtype=np.int64)
+        bucket_counts[windows, buckets] = self.buckets
+
+        self.first, self.first_bucket = low, bucket_low
+        self.counts, self.sums, self.maxima = counts, sums, maxima
+        self.buckets = bucket_counts
+
+    def merge(self, other):
+        if len(other.counts) == 0:
+            return self
+        if other.window_ns != self.window_ns:
+            raise Exception('Time windows of different lengths')
+        self._reserve(other.first, len(other.counts), other.first_bucket,
+                      other.buckets.shape[1])
+
+        windows = slice(other.first - self.first,
+                        other.first - self.first + len(other.counts))
+        buckets = slice(other.first_bucket - self.first_bucket,
+                        other.first_bucket - self.first_bucket +
+                        other.buckets.shape[1])
+        self.counts[windows] += other.counts
+        self.sums[windows] += other.sums
+        np.maximum(self.maxima[windows], other.maxima,
+                   out=self.maxima[windows])
+        self.buckets[windows, buckets] += other.buckets
+        return self
+
+    # Returns a dictionary with the stats of each window with any packet:
+    # 'start' (timestamp of the start of the window, in nanoseconds),
+    # 'count', 'mean', 'percentile' (WINDOW_PERCENTILE, limited by the
+    # window maximum, as on LatencyHistogram) and 'maximum', in microseconds
+    def series(self, q=WINDOW_PERCENTILE):
+        used = np.flatnonzero(self.counts)
+        counts = self.counts[used]
+        maxima = self.maxima[used]
+        if len(used) == 0:
+            percentile = np.zeros(0)
+        else:
+            cumulative = np.cumsum(self.buckets[used], axis=1)
+            ranks = np.maximum(np.ceil(q / 100 * counts), 1)
+            bucket = np.argmax(cumulative >= ranks[:, None], axis=1)
+            percentile = bucket_highest(
+                    ((bucket + self.first_bucket + 1) << _BUCKET_SHIFT) - 1)
+        return {'start': (used + self.first) * self.window_ns,
+                'count': counts,
+                'mean': self.sums[used] / counts / 1000,
+                'percentile': np.minimum(percentile / 1000, maxima),
+                'maximum': maxima}
+
+
+# Returns a dictionary whose keys are tuples (A, B, C) as on
+# export.summaries_of() and values are the WindowedStats of all `metrics` of
+# that class and factors, on windows of `window_ns` nanoseconds
+def windowed_stats_of(metrics, window_ns):
+    windowed = {}
+    for metric in metrics:
+        key = (type(metric), metric.factors['PayloadSize'],
+               metric.factors['TransmissionInterval'])
+        windows = TimeWindows(metric.dataframe['SoftwareTransmitTimestamp'],
+                              window_ns)
+        windowed.setdefault(key, WindowedStats(window_ns)).update(
+                windows, metric.metric, nanoseconds=True)
+    return windowed
+
+
+# Draws the WindowedStats of `metric_cls` on `windowed` (as on
+# windowed_stats_of()) to chart `filename`: a series per factors, whose
+# windows are timed from the first one of that factors. If `renderer` is not
+# None, the chart is drawn by it instead (see Renderer). There's no chart if
+# there are no packets.
+def time_windows_chart(metric_cls, windowed, filename, renderer=None):
+    from plots import TimeWindowsPlot
+
+    series = []
+    for key in sorted(key for key in windowed if key[0] == metric_cls):
+        stats = windowed[key].series()
+        if len(stats['start']) == 0:
+            continue
+        series.append((f'{key[1]} bytes {int(key[2] / 1000)} us',
+                       (stats['start'] - stats['start'][0]) / 1e9,
+                       stats['percentile'], stats['maximum']))
+    if len(series) == 0:
+        return
+
+    window_ns = next(iter(windowed.values())).window_ns
+    render(TimeWindowsPlot(series, f'P{WINDOW_PERCENTILE}'),
+           f'{metric_cls.name} Latency per {window_ns / 1e9:g} s window',
+           filename, renderer)
@@ -0,0 +1,105 @@
+# Copyright (c) 2021, Intel Corporation
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import numpy as np
+
+from stages import TIMESTAMPS, StageDeltas, stage_parts
+
+# Packets kept per metric and factors, unless told otherwise
+DEFAULT_TOP_K = 10
+
+
+# Indices of the `k` biggest `values`, in no particular order. Linear time,
+# as np.argpartition doesn't sort.
+def _top(values, k):
+    if len(values) <= k:
+        return np.arange(len(values))
+    return np.argpartition(values, -k)[-k:]
+
+
+# The `k` packets with the highest latency on a metric, with their row on the
+# results file and all their timestamps, so the worst spikes can be traced
+# back to their CSV rows. Like LatencyAggregate, it can be updated a chunk of
+# values at a time and merged, in constant memory: each update only keeps the
+# top `k` of its chunk (found in linear time) and of what was kept before.
+class WorstPackets():
+    def __init__(self, k=DEFAULT_TOP_K):
+        self.k = k
+        self.rows = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0, dtype=np.float64)
+        self.columns = {}
+
+    # WorstPackets of a metric, from its values and `dataframe` columns
+    @classmethod
+    def of(cls, dataframe, values, k=DEFAULT_TOP_K):
+        return cls(k).update(dataframe, values)
+
+    # `values` are the metric values of the rows of `dataframe` (a chunk of a
+    # results file, whose first row is row `first_row` of the file), in
+    # microseconds or, if `nanoseconds` is True, in integer nanoseconds. Only
+    # the values kept are converted.
+    def update(self, dataframe, values, first_row=0, nanoseconds=False):
+        values = np.asarray(values)
+        top = _top(values, self.k)
+        chunk = WorstPackets(self.k)
+        chunk.rows = top.astype(np.int64) + first_row
+        chunk.values = values[top].astype(np.float64)
+        if nanoseconds:
+            chunk.values /= 1000
+        chunk.columns = {column: np.asarray(dataframe[column])[top]
+                         for column in dataframe.keys()}
+        return self.merge(chunk)
+
+    def merge(self, other):
+        if len(other.rows) == 0:
+            return self
+        if len(self.rows) == 0:
+            self.columns = other.columns
+        columns = [c for c in self.columns if c in other.columns]
+
+        values = np.concatenate([self.values, other.values])
+        top = _top(values, self.k)
+        self.values = values[top]
+        self.rows = np.concatenate([self.rows, other.rows])[top]
+        self.columns = {c: np.concatenate([self.columns[c],
+                                           other.columns[c]])[top]
+                        for c in columns}
+        return self
+
+    # Timestamp columns kept, in the order a packet goes through them
+    def timestamps(self):
+        return ([c for c in TIMESTAMPS if c in self.columns] +
+                sorted(c for c in self.columns if c not in TIMESTAMPS))
+
+    # Returns a dictionary with the packets, worst first: 'rows', 'values'
+    # (metric latency, in microseconds), 'timestamps' (a dictionary of column
+    # to values) and, for each stage `stage` of the metric is split into (see
+    # stages.STAGE_PARTS), its latency in microseconds on 'parts', a
+    # dictionary of stage to values. Each packet is attributed to the part it
+    # spent the most time on, on 'stage'.
+    def packets(self, stage):
+        order = np.lexsort((self.rows, -self.values))
+        timestamps = {c: self.columns[c][order] for c in self.timestamps()}
+
+        parts = stage_parts(stage, timestamps.keys())
+        deltas = StageDeltas(timestamps, parts)
+        part_values = {part: deltas.of(part) / 1000 for part in parts}
+        matrix = np.column_stack([part_values[part] for part in parts])
+
+        return {'rows': self.rows[order], 'values': self.values[order],
+                'timestamps': timestamps, 'parts': part_values,
+                'stage': [parts[i] for i in np.argmax(matrix, axis=1)]}
+
+
+# Returns a dictionary whose keys are tuples (A, B, C) as on
+# export.summaries_of() and values are the WorstPackets of all `metrics` of
+# that class and factors
+def worst_packets_of(metrics, k=DEFAULT_TOP_K):
+    worst = {}
+    for metric in metrics:
+        key = (type(metric), metric.factors['PayloadSize'],
+               metric.factors['TransmissionInterval'])
+        worst.setdefault(key, WorstPackets(k)).update(
+                metric.dataframe, metric.metric, nanoseconds=True)
+    return worst
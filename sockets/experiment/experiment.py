@@ -4,6 +4,8 @@
 
 import csv
 import errno
+import json
+import os
 import pickle
 import platforms
 import runners
@@ -14,6 +16,10 @@ from time import sleep
 from util import MPPSocket
 from util import util
 
+# File on the results directory describing the setup of the experiment, so
+# that analysis can tell runs apart (see analysis/results_db.py)
+INFO_FILE = 'experiment.json'
+
 
 class Experiment:
     def __init__(self, config, results_dir):
@@ -209,9 +215,29 @@ class Experiment:
         print(f'Accepted connection from {addr[0]}:{addr[1]}')
         return MPPSocket(conn)
 
+    def _save_info(self):
+        xdp = self.socket_type == 'AF_XDP'
+        info = {
+            'role': self.role,
+            'platform': util.get_configuration_key(self.config,
+                                                   'General Setup',
+                                                   'Platform'),
+            'socket_type': self.socket_type,
+            'xdp_mode': self.xdp_mode if xdp else None,
+            'xdp_copy_mode': self.xdp_copy_mode if xdp else None,
+            'qdisc_profile': util.get_configuration_key(self.config,
+                                                        'General Setup',
+                                                        'Qdisc profile'),
+            'kernel': os.uname().release,
+            'hostname': socket.gethostname(),
+            'started': datetime.now().isoformat(timespec='seconds')}
+        with open(f'{self.results_dir}/{INFO_FILE}', 'w') as f:
+            json.dump(info, f, indent=1)
+
     def setup(self):
         self.platform = platforms.get_platform(self.config)
         self.platform.setup()
+        self._save_info()
         self.listener_ip = self.platform.listener_ip
         self.talker_ip = self.platform.talker_ip
         self.experiment_port = self.platform.experiment_port
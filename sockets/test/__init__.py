@@ -1 +1,29 @@
-from .test_message_passing_protocol import *
\ No newline at end of file
+import os
+import sys
+
+# Analysis modules import each other as top level modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'analysis'))
+
+from .test_message_passing_protocol import *
+from .test_results_cache import *
+from .test_analysis import *
+from .test_memmap import *
+from .test_streaming import *
+from .test_metrics import *
+from .test_stages import *
+from .test_metric_index import *
+from .test_aggregates import *
+from .test_histograms import *
+from .test_factors import *
+from .test_manifest import *
+from .test_render import *
+from .test_plots import *
+from .test_export import *
+from .test_run_stats import *
+from .test_run_comparison import *
+from .test_significance import *
+from .test_regression import *
+from .test_results_db import *
+from .test_worst_packets import *
+from .test_stage_profile import *
+from .test_time_windows import *
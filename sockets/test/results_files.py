@@ -0,0 +1,66 @@
+import numpy as np
+import os
+import tempfile
+
+# Timestamp columns of a results CSV file, as written by the experiments
+COLUMNS = ['SoftwareTransmitTimestamp', 'sys_enter_sendto',
+           'net_dev_queue_vlan', 'net_dev_start_xmit_vlan', 'net_dev_queue',
+           'net_dev_start_xmit', 'net_dev_xmit', 'net_dev_xmit_vlan',
+           'HardwareReceiveTimestamp', 'irq_handler_entry',
+           'napi_gro_receive_entry', 'netif_receive_skb', 'sys_exit_recvmsg',
+           'SoftwareReceiveTimestamp']
+
+
+# Synthetic timestamps of `rows` packets, as a dictionary of column to int64
+# array. Each column is some (random) nanoseconds after the previous one,
+# plus `shift` on every stage, except for irq_handler_entry, which sometimes
+# comes before HardwareReceiveTimestamp (more than one packet per IRQ).
+def results_columns(rows, interval=125000, seed=0, shift=0):
+    rng = np.random.default_rng(seed)
+    current = (1600000000000000000 +
+               np.arange(rows, dtype=np.int64) * interval)
+    columns = {COLUMNS[0]: current}
+    for column in COLUMNS[1:]:
+        step = rng.gamma(2.0, 1500, rows).astype(np.int64) + 100 + shift
+        if column == 'irq_handler_entry':
+            step = np.where(rng.random(rows) < 0.1, -500, step)
+        current = current + step
+        columns[column] = current
+    return columns
+
+
+# Writes `columns` (see results_columns()) as results CSV file of the given
+# factors on `csv_dir`. Returns the file name.
+def write_results(csv_dir, payload, interval, columns):
+    file_name = f'{csv_dir}/results-{payload}-{interval}.csv'
+    with open(file_name, 'w') as f:
+        f.write(','.join(columns.keys()) + '\n')
+        if len(next(iter(columns.values()))) > 0:
+            np.savetxt(f, np.column_stack(list(columns.values())), fmt='%d',
+                       delimiter=',')
+    return file_name
+
+
+# Temporary directory, removed when `test` (a TestCase) finishes. Returns
+# its name.
+def temporary_dir(test):
+    tmp = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp.cleanup)
+    return tmp.name
+
+
+# Writes a results file of `rows` packets (see results_columns()) for each
+# pair of payload and interval on `factors`, seeded by its position, to
+# `csv_dir` (created if needed). The file of each payload on `empty` has only
+# the header, as left by an experiment that got no packets. Returns the file
+# names.
+def write_run(csv_dir, factors=((48, 125000), (100, 125000)), rows=1000,
+              empty=()):
+    os.makedirs(csv_dir, exist_ok=True)
+    file_names = [write_results(csv_dir, payload, interval,
+                                results_columns(rows, interval, seed))
+                  for seed, (payload, interval) in enumerate(factors)]
+    file_names += [write_results(csv_dir, payload, 125000,
+                                 results_columns(0))
+                   for payload in empty]
+    return file_names
@@ -0,0 +1,88 @@
+import math
+import numpy as np
+import unittest
+from unittest.mock import patch
+
+from aggregates import LatencyAggregate, merge_aggregates
+
+
+class TestLatencyAggregate(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.values = rng.gamma(2.0, 15.0, 10000) + 50
+
+    def assertStatsOf(self, aggregate, values):
+        stats = aggregate.stats()
+        self.assertEqual(aggregate.count, len(values))
+        self.assertAlmostEqual(stats['mean'], np.mean(values), places=9)
+        self.assertAlmostEqual(stats['stdev'], np.std(values), places=9)
+        self.assertEqual(stats['minimum'], np.min(values))
+        self.assertEqual(stats['maximum'], np.max(values))
+        self.assertAlmostEqual(stats['r'], np.ptp(values), places=9)
+        self.assertAlmostEqual(stats['cv'],
+                               np.std(values) / np.mean(values) * 100,
+                               places=9)
+
+    def test_single_pass_stats(self):
+        self.assertStatsOf(LatencyAggregate.of(self.values), self.values)
+
+    def test_blocks_equal_a_single_block(self):
+        for block_values in [1, 3, 1000]:
+            with patch('aggregates.BLOCK_VALUES', block_values):
+                self.assertStatsOf(LatencyAggregate.of(self.values),
+                                   self.values)
+
+    def test_merge_equals_a_single_pass(self):
+        single = LatencyAggregate.of(self.values)
+        for splits in [[1], [5000], [10, 20, 9999],
+                       list(range(0, 10000, 777))]:
+            parts = np.split(self.values, splits)
+            merged = merge_aggregates(LatencyAggregate.of(part)
+                                      for part in parts)
+            self.assertEqual(merged.count, single.count)
+            self.assertAlmostEqual(merged.mean, single.mean, places=9)
+            self.assertAlmostEqual(merged.m2 / single.m2, 1, places=12)
+            self.assertEqual(merged.minimum, single.minimum)
+            self.assertEqual(merged.maximum, single.maximum)
+
+    def test_update_equals_a_single_pass(self):
+        aggregate = LatencyAggregate()
+        for part in np.array_split(self.values, 13):
+            aggregate.update(part)
+        self.assertStatsOf(aggregate, self.values)
+
+    def test_merge_order_does_not_matter(self):
+        parts = [LatencyAggregate.of(part)
+                 for part in np.array_split(self.values, 5)]
+        forward = merge_aggregates(parts).stats()
+        parts = [LatencyAggregate.of(part)
+                 for part in np.array_split(self.values, 5)]
+        backward = merge_aggregates(reversed(parts)).stats()
+        for name, value in forward.items():
+            self.assertAlmostEqual(backward[name], value, places=9)
+
+    def test_large_offset_keeps_precision(self):
+        values = self.values + 1e9
+        self.assertStatsOf(merge_aggregates(
+                LatencyAggregate.of(part)
+                for part in np.array_split(values, 7)), values)
+
+    def test_dict_round_trip(self):
+        aggregate = LatencyAggregate.of(self.values)
+        restored = LatencyAggregate.from_dict(aggregate.to_dict())
+        self.assertEqual(restored.stats(), aggregate.stats())
+
+    def test_empty_stats_are_nan(self):
+        for aggregate in [LatencyAggregate(), LatencyAggregate.of([]),
+                          merge_aggregates([]),
+                          merge_aggregates([LatencyAggregate.of([])] * 2)]:
+            self.assertEqual(aggregate.count, 0)
+            for name, value in aggregate.stats().items():
+                self.assertTrue(math.isnan(value), name)
+
+    def test_merge_with_empty_changes_nothing(self):
+        aggregate = LatencyAggregate.of(self.values)
+        stats = aggregate.stats()
+        aggregate.merge(LatencyAggregate())
+        self.assertEqual(aggregate.stats(), stats)
+        self.assertEqual(LatencyAggregate().merge(aggregate).stats(), stats)
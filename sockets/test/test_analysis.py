@@ -0,0 +1,96 @@
+import numpy as np
+import unittest
+
+from analysis import Analysis
+from metrics import E2EMetric, HwRxMetric, TotalRxMetric, all_classes
+from .results_files import (results_columns, temporary_dir, write_results,
+                            write_run)
+
+
+class TestParallelAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.csv_dir = temporary_dir(self)
+        write_run(self.csv_dir, [(48, 125000), (48, 250000), (100, 125000)],
+                  2000)
+
+    def analysed(self, workers):
+        analysis = Analysis(self.csv_dir, None)
+        analysis.analyse(all_classes, workers)
+        return analysis
+
+    def test_workers_get_the_same_metrics_in_the_same_order(self):
+        serial = self.analysed(1).metrics_collection
+        parallel = self.analysed(3).metrics_collection
+        self.assertEqual([(type(m), m.factors) for m in parallel],
+                         [(type(m), m.factors) for m in serial])
+        for metric, expected in zip(parallel, serial):
+            self.assertEqual(metric.stats(), expected.stats())
+
+    def test_workers_evaluate_metrics(self):
+        for metric in self.analysed(2).metrics_collection:
+            self.assertIsNotNone(metric._metric)
+            self.assertIsNotNone(metric._aggregate)
+            self.assertIsNotNone(metric._histogram)
+
+    def test_stage_deltas_are_dropped_with_the_last_metric(self):
+        for workers in [1, 2]:
+            metrics = self.analysed(workers).metrics_collection
+            files = {}
+            for metric in metrics:
+                files.setdefault(id(metric.stage_deltas), []).append(metric)
+            self.assertEqual(len(files), 3)
+            for file_metrics in files.values():
+                stage_deltas = file_metrics[0].stage_deltas
+                values = [np.array(m.evaluate().metric) for m in file_metrics]
+                for metric in file_metrics[:-1]:
+                    metric.release()
+                    self.assertIsNotNone(stage_deltas.matrix)
+                file_metrics[-1].release()
+                self.assertIsNone(stage_deltas.matrix)
+                # Released values are calculated again
+                for metric, expected in zip(file_metrics, values):
+                    np.testing.assert_array_equal(metric.metric, expected)
+                for metric in file_metrics:
+                    metric.release()
+                self.assertIsNone(stage_deltas.matrix)
+
+    def test_no_results_are_refused(self):
+        with self.assertRaises(Exception):
+            Analysis(temporary_dir(self), None)
+
+
+class TestAnalysisColumns(unittest.TestCase):
+    def setUp(self):
+        self.csv_dir = temporary_dir(self)
+        self.columns = results_columns(1000)
+        write_results(self.csv_dir, 48, 125000, self.columns)
+        # Without intermediate latency
+        write_results(self.csv_dir, 100, 125000, {
+                column: self.columns[column]
+                for column in ['SoftwareTransmitTimestamp',
+                               'HardwareReceiveTimestamp',
+                               'SoftwareReceiveTimestamp']})
+
+    def test_only_needed_columns_are_read(self):
+        cache_dir = f'{self.csv_dir}/.cache'
+        for kwargs in [{}, {'cache_dir': cache_dir},
+                       {'cache_dir': cache_dir, 'memmap': True}]:
+            analysis = Analysis(self.csv_dir, None, **kwargs)
+            analysis.analyse([HwRxMetric])
+            metric, = analysis.metrics_collection
+            self.assertEqual(set(metric.dataframe.keys()),
+                             {'SoftwareTransmitTimestamp',
+                              'HardwareReceiveTimestamp',
+                              'irq_handler_entry'})
+            for column, values in metric.dataframe.items():
+                self.assertEqual(values.dtype, np.int64)
+                np.testing.assert_array_equal(values, self.columns[column])
+
+    def test_metrics_missing_columns_are_skipped(self):
+        analysis = Analysis(self.csv_dir, None)
+        analysis.analyse([E2EMetric, HwRxMetric, TotalRxMetric])
+        self.assertEqual([(type(m), m.factors['PayloadSize'])
+                          for m in analysis.metrics_collection],
+                         [(E2EMetric, 100), (TotalRxMetric, 100),
+                          (E2EMetric, 48), (HwRxMetric, 48),
+                          (TotalRxMetric, 48)])
@@ -0,0 +1,77 @@
+import json
+import numpy as np
+import unittest
+
+from analysis import Analysis
+from export import JSON_FILE, export, load, load_summaries, summaries_of
+from histograms import merge_histograms
+from metrics import E2EMetric, HwRxMetric, TotalRxMetric
+from .results_files import temporary_dir, write_run
+
+
+# JSON constants (NaN and infinities) are not valid JSON
+def reject_constant(constant):
+    raise ValueError(f'Not valid JSON: {constant}')
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        csv_dir = temporary_dir(self)
+        self.graphs_dir = f'{csv_dir}/graphs'
+        write_run(csv_dir, rows=2000, empty=[64])
+
+        analysis = Analysis(csv_dir, None)
+        analysis.analyse([E2EMetric, HwRxMetric, TotalRxMetric])
+        self.summaries = summaries_of(analysis.metrics_collection)
+        export(self.summaries, self.graphs_dir)
+
+    def test_summaries_round_trip(self):
+        loaded = load_summaries(self.graphs_dir)
+        self.assertEqual(loaded.keys(), self.summaries.keys())
+        for key, (aggregate, histogram) in self.summaries.items():
+            self.assertEqual(vars(loaded[key][0]), vars(aggregate), key)
+            self.assertEqual(loaded[key][1].to_dict(), histogram.to_dict(),
+                             key)
+            for q in [50, 99, 100]:
+                np.testing.assert_equal(loaded[key][1].percentile(q),
+                                        histogram.percentile(q))
+
+    def test_all_entries_merge_factors(self):
+        entries = [entry for entry in load(self.graphs_dir)
+                   if entry['payload_size'] == 'ALL']
+        self.assertEqual(len(entries), 3)
+        for entry in entries:
+            histograms = [histogram for key, (_, histogram)
+                          in self.summaries.items()
+                          if key[0].name == entry['metric']]
+            self.assertEqual(entry['histogram'].to_dict(),
+                             merge_histograms(histograms).to_dict())
+            self.assertEqual(entry['count'], 4000)
+
+    def test_valid_json(self):
+        with open(f'{self.graphs_dir}/{JSON_FILE}') as f:
+            exported = json.load(f, parse_constant=reject_constant)
+        empty = [entry for entry in exported['metrics']
+                 if entry['payload_size'] == 64]
+        self.assertEqual(len(empty), 3)
+        for entry in empty:
+            self.assertEqual(entry['count'], 0)
+            self.assertEqual(set(entry['stats'].values()), {None})
+
+    def test_empty_metrics_stay_empty(self):
+        loaded = load_summaries(self.graphs_dir)
+        aggregate, histogram = loaded[(E2EMetric, 64, 125000)]
+        self.assertEqual(aggregate.count, 0)
+        self.assertEqual(aggregate.minimum, np.inf)
+        self.assertEqual(histogram.count, 0)
+        self.assertTrue(np.isnan(aggregate.stats()['mean']))
+
+    def test_unknown_version(self):
+        file_name = f'{self.graphs_dir}/{JSON_FILE}'
+        with open(file_name) as f:
+            exported = json.load(f)
+        exported['version'] += 1
+        with open(file_name, 'w') as f:
+            json.dump(exported, f)
+        with self.assertRaises(Exception):
+            load(self.graphs_dir)
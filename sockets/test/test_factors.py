@@ -0,0 +1,48 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from analysis import Analysis
+from factors import PayloadFactor, TxIntervalFactor
+from metrics import E2EMetric, HwRxMetric
+from .results_files import temporary_dir, write_run
+
+
+class TestFactorHistograms(unittest.TestCase):
+    def setUp(self):
+        tmp = temporary_dir(self)
+        csv_dir = f'{tmp}/results'
+        self.graphs_dir = f'{tmp}/graphs'
+        write_run(csv_dir, empty=[64])
+        self.analysis = Analysis(csv_dir, self.graphs_dir)
+        self.analysis.analyse([E2EMetric, HwRxMetric])
+
+    def test_a_chart_per_metric_type(self):
+        PayloadFactor(self.analysis.metrics_collection,
+                      self.graphs_dir).histograms()
+        TxIntervalFactor(self.analysis.metrics_collection,
+                         self.graphs_dir).histograms()
+        self.assertEqual(sorted(os.listdir(self.graphs_dir)), [
+                'vary_payload_size_for_end_to_end.png',
+                'vary_payload_size_for_hardware_receive.png',
+                'vary_transmission_interval_for_end_to_end.png',
+                'vary_transmission_interval_for_hardware_receive.png'])
+
+    def test_charts_have_the_histograms_of_each_factor_value(self):
+        from plots import HistogramGroupPlot
+        metrics = self.analysis.metrics_of([E2EMetric])
+        with patch.object(HistogramGroupPlot, 'plot'):
+            with patch.object(HistogramGroupPlot, 'add_histogram',
+                              autospec=True) as add_histogram:
+                PayloadFactor(metrics, self.graphs_dir).histograms()
+
+        # Empty results files are left out
+        labels = [call.args[5] for call in add_histogram.mock_calls]
+        self.assertEqual(labels, ['48 bytes', '100 bytes'])
+        by_label = {f'{m.factors["PayloadSize"]} bytes': m for m in metrics}
+        for call in add_histogram.mock_calls:
+            metric = by_label[call.args[5]]
+            counts, edges = metric.histogram().bins()
+            self.assertEqual(list(call.args[1]), list(counts))
+            self.assertEqual(list(call.args[2]), list(edges))
+            self.assertEqual(call.args[3], metric.aggregate().stats()['mean'])
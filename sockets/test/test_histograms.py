@@ -0,0 +1,117 @@
+import math
+import numpy as np
+import unittest
+
+from histograms import (DISPLAY_SUB_BUCKET_BITS, PERCENTILES,
+                        SUB_BUCKET_BITS, LatencyHistogram, merge_histograms)
+
+# Highest relative error of a percentile, given the bucket resolution
+RESOLUTION = 2.0 ** -(SUB_BUCKET_BITS - 1)
+
+QS = [0, 1, 25, 50, 90, 99, 99.9, 99.99, 100]
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        # Microseconds, on a long tail, with sub-microsecond values as well
+        self.values = np.concatenate([rng.gamma(2.0, 15.0, 20000) + 0.2,
+                                      rng.pareto(1.5, 500) * 1000])
+
+    def assertPercentilesOf(self, histogram, values):
+        self.assertEqual(histogram.count, len(values))
+        for q in QS:
+            exact = np.percentile(np.rint(values * 1000) / 1000, q,
+                                  method='inverted_cdf')
+            self.assertLessEqual(abs(histogram.percentile(q) - exact),
+                                 abs(exact) * RESOLUTION + 1e-3,
+                                 f'p{q}')
+
+    def test_percentiles_within_resolution(self):
+        self.assertPercentilesOf(LatencyHistogram.of(self.values),
+                                 self.values)
+
+    def test_extremes_are_exact(self):
+        histogram = LatencyHistogram.of(self.values)
+        self.assertAlmostEqual(histogram.percentile(0),
+                               np.min(self.values), places=3)
+        self.assertAlmostEqual(histogram.percentile(100),
+                               np.max(self.values), places=3)
+
+    def test_negative_values(self):
+        values = self.values - 30
+        self.assertPercentilesOf(LatencyHistogram.of(values), values)
+
+    def test_merge_equals_a_single_pass(self):
+        single = LatencyHistogram.of(self.values)
+        parts = [LatencyHistogram.of(part)
+                 for part in np.array_split(self.values - 10, 7)]
+        merged = merge_histograms(parts)
+        self.assertEqual(merged.to_dict(),
+                         LatencyHistogram.of(self.values - 10).to_dict())
+
+        merged = LatencyHistogram()
+        for part in np.array_split(self.values, 9):
+            merged.update(part)
+        self.assertEqual(merged.to_dict(), single.to_dict())
+
+    def test_dict_round_trip(self):
+        histogram = LatencyHistogram.of(self.values - 10)
+        restored = LatencyHistogram.from_dict(histogram.to_dict())
+        for q in QS:
+            self.assertEqual(restored.percentile(q), histogram.percentile(q))
+
+    def test_bins_hold_all_values(self):
+        histogram = LatencyHistogram.of(self.values - 10)
+        counts, edges = histogram.bins()
+        self.assertEqual(len(edges), len(counts) + 1)
+        self.assertEqual(np.sum(counts), len(self.values))
+        self.assertTrue(np.all(np.diff(edges) > 0))
+        self.assertLessEqual(edges[0], np.min(self.values - 10))
+        self.assertGreater(edges[-1], np.max(self.values - 10))
+
+    def test_bins_equal_numpy_histogram(self):
+        ns = np.rint(self.values * 1000).astype(np.int64)
+        histogram = LatencyHistogram.of(self.values)
+        for bits in [DISPLAY_SUB_BUCKET_BITS, SUB_BUCKET_BITS]:
+            counts, edges = histogram.bins(bits)
+            expected, _ = np.histogram(ns, np.rint(edges * 1000))
+            np.testing.assert_array_equal(counts, expected)
+
+    def test_bins_of_merged_histograms_line_up(self):
+        a = LatencyHistogram.of(self.values[:1000])
+        b = LatencyHistogram.of(self.values[1000:])
+        counts_a, edges_a = a.bins()
+        counts_b, edges_b = b.bins()
+        counts, edges = merge_histograms([a, b]).bins()
+        merged = {}
+        for c, e in [(counts_a, edges_a), (counts_b, edges_b)]:
+            for count, edge in zip(c, e):
+                merged[edge] = merged.get(edge, 0) + count
+        self.assertEqual({edge: count for edge, count in zip(edges, counts)
+                          if count > 0},
+                         {edge: count for edge, count in merged.items()
+                          if count > 0})
+
+    def test_cdf_counts_values_below_each_edge(self):
+        ns = np.sort(np.rint(self.values * 1000).astype(np.int64))
+        edges, cdf = LatencyHistogram.of(self.values).cdf()
+        self.assertEqual((cdf[0], cdf[-1]), (0, 1))
+        np.testing.assert_allclose(
+                cdf, np.searchsorted(ns, np.rint(edges * 1000)) / len(ns))
+
+    def test_empty_percentiles_are_nan(self):
+        for histogram in [LatencyHistogram(), LatencyHistogram.of([]),
+                          merge_histograms([])]:
+            self.assertEqual(histogram.count, 0)
+            self.assertEqual(len(histogram.stats()), len(PERCENTILES))
+            for name, value in histogram.stats().items():
+                self.assertTrue(math.isnan(value), name)
+
+    def test_merge_with_empty_changes_nothing(self):
+        histogram = LatencyHistogram.of(self.values)
+        fields = histogram.to_dict()
+        histogram.merge(LatencyHistogram())
+        self.assertEqual(histogram.to_dict(), fields)
+        self.assertEqual(LatencyHistogram().merge(histogram).to_dict(),
+                         fields)
@@ -0,0 +1,93 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from analysis import Analysis
+from manifest import Manifest
+from metrics import E2EMetric, HwRxMetric, all_classes
+from results_cache import read_results_csv
+from .results_files import (results_columns, temporary_dir, write_results,
+                            write_run)
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        tmp = temporary_dir(self)
+        self.csv_dir = f'{tmp}/results'
+        self.graphs_dir = f'{tmp}/graphs'
+        self.file_a, self.file_b = write_run(self.csv_dir)
+        self.chart = f'{self.graphs_dir}/chart.png'
+        self.first = self.analyse()
+
+    # Analyses the results with a manifest, as run_analysis.py does, and
+    # returns the pair (A, B), where A is the dictionary of metric class and
+    # payload to stats, and B the set of files read
+    def analyse(self, chart_options=None):
+        manifest = Manifest(self.graphs_dir)
+        analysis = Analysis(self.csv_dir, self.graphs_dir)
+        with patch('analysis.read_results_csv',
+                   wraps=read_results_csv) as read:
+            analysis.analyse(all_classes, manifest=manifest)
+            stats = {(type(m), m.factors['PayloadSize']): m.stats()
+                     for m in analysis.metrics_collection}
+            read_files = {call.args[0] for call in read.mock_calls}
+
+        chart_metrics = [m for m in analysis.metrics_collection
+                         if type(m) in [E2EMetric, HwRxMetric]]
+        self.needed_chart = manifest.needs_chart(self.chart, chart_metrics,
+                                                 chart_options)
+        if self.needed_chart:
+            os.makedirs(self.graphs_dir, exist_ok=True)
+            open(self.chart, 'w').close()
+
+        manifest.record_metrics(analysis.metrics_collection)
+        manifest.save()
+        return stats, read_files
+
+    def test_first_analysis_reads_everything(self):
+        self.assertEqual(self.first[1], {self.file_a, self.file_b})
+        self.assertTrue(self.needed_chart)
+
+    def test_unchanged_results_are_skipped(self):
+        stats, read_files = self.analyse()
+        self.assertEqual(read_files, set())
+        self.assertFalse(self.needed_chart)
+        self.assertEqual(stats, self.first[0])
+
+    def test_touched_results_are_skipped(self):
+        os.utime(self.file_a, ns=(0, 0))
+        stats, read_files = self.analyse()
+        self.assertEqual(read_files, set())
+        self.assertFalse(self.needed_chart)
+
+    def test_changed_results_are_analysed_again(self):
+        write_results(self.csv_dir, 48, 125000, results_columns(1000, seed=2))
+        stats, read_files = self.analyse()
+        self.assertEqual(read_files, {self.file_a})
+        self.assertTrue(self.needed_chart)
+        for key, value in stats.items():
+            if key[1] == 100:
+                self.assertEqual(value, self.first[0][key])
+            else:
+                self.assertNotEqual(value['mean'], self.first[0][key]['mean'])
+
+        # And skipped again, once recorded
+        self.assertEqual(self.analyse()[1], set())
+        self.assertFalse(self.needed_chart)
+
+    def test_missing_chart_is_drawn_again(self):
+        os.remove(self.chart)
+        self.analyse()
+        self.assertTrue(self.needed_chart)
+
+    def test_chart_with_other_options_is_drawn_again(self):
+        self.analyse(['density'])
+        self.assertTrue(self.needed_chart)
+        self.analyse(['density'])
+        self.assertFalse(self.needed_chart)
+
+    def test_older_manifest_is_ignored(self):
+        with patch.object(Manifest, 'version', Manifest.version + 1):
+            stats, read_files = self.analyse()
+        self.assertEqual(read_files, {self.file_a, self.file_b})
+        self.assertTrue(self.needed_chart)
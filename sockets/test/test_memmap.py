@@ -0,0 +1,65 @@
+import math
+import numpy as np
+import pickle
+import unittest
+
+from analysis import Analysis
+from metrics import all_classes
+from results_cache import ResultsCache
+from .results_files import temporary_dir, write_run
+
+
+class TestMemoryMappedAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.csv_dir = temporary_dir(self)
+        self.cache_dir = f'{self.csv_dir}/.cache'
+        self.file_name, self.empty_name = write_run(
+                self.csv_dir, [(48, 125000)], 3000, empty=[100])
+
+    def analysed(self, **kwargs):
+        analysis = Analysis(self.csv_dir, None, **kwargs)
+        analysis.analyse(all_classes)
+        return {(type(m), m.factors['PayloadSize']): m.stats()
+                for m in analysis.metrics_collection}
+
+    def test_mapped_columns_are_the_csv_columns(self):
+        cache = ResultsCache(self.cache_dir)
+        store = cache.map_csv(self.file_name)
+        loaded = cache.read_csv(self.file_name)
+        for column in loaded:
+            self.assertIsInstance(store[column], np.memmap)
+            np.testing.assert_array_equal(store[column], loaded[column])
+
+    def test_mapped_columns_survive_pickling(self):
+        store = ResultsCache(self.cache_dir).map_csv(self.file_name)
+        unpickled = pickle.loads(pickle.dumps(store))
+        for column in store:
+            np.testing.assert_array_equal(unpickled[column], store[column])
+
+    def test_empty_file_maps_to_empty_columns(self):
+        store = ResultsCache(self.cache_dir).map_csv(self.empty_name)
+        self.assertGreater(len(store), 0)
+        for values in store.values():
+            self.assertEqual(len(values), 0)
+
+    def test_mapped_stats_equal_loaded_stats(self):
+        mapped = self.analysed(cache_dir=self.cache_dir, memmap=True)
+        loaded = self.analysed()
+        self.assertEqual(mapped.keys(), loaded.keys())
+        for key, stats in loaded.items():
+            if key[1] == 100:
+                continue
+            for name, value in stats.items():
+                self.assertAlmostEqual(mapped[key][name], value, places=6,
+                                       msg=f'{key} {name}')
+
+    def test_empty_file_stats_are_nan(self):
+        for kwargs in [{}, {'cache_dir': self.cache_dir},
+                       {'cache_dir': self.cache_dir, 'memmap': True}]:
+            stats = self.analysed(**kwargs)
+            empty = [s for key, s in stats.items() if key[1] == 100]
+            self.assertEqual(len(empty), len(all_classes))
+            for s in empty:
+                for name in ['mean', 'stdev', 'minimum', 'maximum', 'cv',
+                             'p99', 'p99_9', 'p99_99']:
+                    self.assertTrue(math.isnan(s[name]), f'{kwargs} {name}')
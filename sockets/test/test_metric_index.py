@@ -0,0 +1,99 @@
+import unittest
+
+from analysis import Analysis
+from factors import PayloadFactor
+from metric_index import MetricIndex
+from metrics import E2EMetric, HwRxMetric, TotalRxMetric
+from metrics_groups import SimpleMetricGroup
+from unittest.mock import patch
+from .results_files import temporary_dir, write_run
+
+FACTORS = [{'PayloadSize': payload, 'TransmissionInterval': interval}
+           for payload in [100, 48] for interval in [250000, 125000]]
+TYPES = [E2EMetric, HwRxMetric, TotalRxMetric]
+
+
+class TestMetricIndex(unittest.TestCase):
+    def setUp(self):
+        self.metrics = [metric_type(None, factors, None)
+                        for factors in FACTORS for metric_type in TYPES]
+        # Some factors without HwRxMetric
+        self.metrics.pop(1)
+        self.index = MetricIndex(self.metrics)
+
+    # Metrics of `metric_types` matching `factors`, by scanning all metrics
+    def scanned(self, metric_types, factors={}):
+        return [metric for metric in self.metrics
+                if type(metric) in metric_types and
+                all(metric.factors[f] == v for f, v in factors.items())]
+
+    def test_lookups_equal_a_scan(self):
+        lookups = [{}, {'PayloadSize': 48}, {'TransmissionInterval': 125000},
+                   {'PayloadSize': 100, 'TransmissionInterval': 250000},
+                   {'PayloadSize': 64}]
+        for metric_types in [[E2EMetric], [HwRxMetric, E2EMetric], TYPES,
+                             [HwRxMetric, HwRxMetric]]:
+            for factors in lookups:
+                self.assertEqual(
+                        [id(m) for m in self.index.of(metric_types,
+                                                      factors)],
+                        [id(m) for m in self.scanned(metric_types,
+                                                     factors)],
+                        f'{metric_types} {factors}')
+
+    def test_other_factors_are_ignored(self):
+        self.assertEqual(self.index.of([E2EMetric], {'Other': 1}),
+                         self.scanned([E2EMetric]))
+
+    def test_factors_of_types(self):
+        self.assertEqual(self.index.factors_of([E2EMetric]),
+                         sorted(FACTORS, key=lambda f: (
+                                 f['PayloadSize'],
+                                 f['TransmissionInterval'])))
+        self.assertEqual(self.index.factors_of([HwRxMetric]),
+                         [{'PayloadSize': 48, 'TransmissionInterval': 125000},
+                          {'PayloadSize': 48, 'TransmissionInterval': 250000},
+                          {'PayloadSize': 100,
+                           'TransmissionInterval': 125000}])
+        self.assertEqual(self.index.factors_of([]), [])
+
+    def test_factor_values(self):
+        self.assertEqual(self.index.factor_values(TYPES, 'PayloadSize'),
+                         [48, 100])
+        self.assertEqual(self.index.factor_values([HwRxMetric],
+                                                  'TransmissionInterval'),
+                         [125000, 250000])
+
+
+# Groups and factors of a subset of the analysed metrics only see the subset
+class TestSubsetOfMetrics(unittest.TestCase):
+    def setUp(self):
+        tmp = temporary_dir(self)
+        csv_dir = f'{tmp}/results'
+        self.graphs_dir = f'{tmp}/graphs'
+        write_run(csv_dir)
+        analysis = Analysis(csv_dir, self.graphs_dir)
+        analysis.analyse([E2EMetric])
+        self.all = analysis.metrics_of([E2EMetric])
+        self.subset = [m for m in self.all if m.factors['PayloadSize'] == 48]
+
+    def test_group_stats(self):
+        group = SimpleMetricGroup('E2E', self.subset, self.graphs_dir)
+        (metric,) = self.subset
+        stats_per_factor = group.stats_per_factor(summary=True)
+        self.assertEqual([factors for factors, _ in stats_per_factor],
+                         [metric.factors, {'PayloadSize': 'ALL',
+                                           'TransmissionInterval': 'ALL'}])
+        (_, [(_, stats)]), (_, [(_, total)]) = stats_per_factor
+        self.assertEqual(stats, metric.stats())
+        self.assertEqual(total.pop('metric'), metric.short_name)
+        self.assertEqual(total, {key: stats[key] for key in total})
+
+    def test_factor_histograms(self):
+        from plots import HistogramGroupPlot
+        with patch.object(HistogramGroupPlot, 'plot'):
+            with patch.object(HistogramGroupPlot, 'add_histogram',
+                              autospec=True) as add_histogram:
+                PayloadFactor(self.subset, self.graphs_dir).histograms()
+        labels = [call.args[5] for call in add_histogram.mock_calls]
+        self.assertEqual(labels, ['48 bytes'])
@@ -0,0 +1,88 @@
+import numpy as np
+import unittest
+from unittest.mock import patch
+
+from aggregates import LatencyAggregate
+from histograms import LatencyHistogram
+from metrics import DriverRxMetric, E2EMetric
+from stages import StageDeltas
+from .results_files import results_columns
+
+FACTORS = {'PayloadSize': 48, 'TransmissionInterval': 125000}
+
+
+class TestLazyMetrics(unittest.TestCase):
+    def setUp(self):
+        self.df = results_columns(1000)
+        self.e2e = (self.df['SoftwareReceiveTimestamp'] -
+                    self.df['SoftwareTransmitTimestamp'])
+
+    def counted(self, **kwargs):
+        metric = E2EMetric(self.df, FACTORS, None, **kwargs)
+        calculate = patch.object(metric, 'calculate_metric',
+                                 wraps=metric.calculate_metric).start()
+        self.addCleanup(patch.stopall)
+        return metric, calculate
+
+    def test_values_are_calculated_on_first_use(self):
+        metric, calculate = self.counted()
+        calculate.assert_not_called()
+        np.testing.assert_array_equal(metric.metric, self.e2e)
+        metric.metric
+        metric.stats()
+        self.assertEqual(calculate.call_count, 1)
+
+    def test_released_values_are_calculated_again(self):
+        metric, calculate = self.counted()
+        stats = metric.stats()
+        metric.release()
+        self.assertIsNone(metric._metric)
+        # Stats are kept
+        self.assertEqual(metric.stats(), stats)
+        self.assertEqual(calculate.call_count, 1)
+        np.testing.assert_array_equal(metric.metric, self.e2e)
+        self.assertEqual(calculate.call_count, 2)
+
+    def test_uncached_values_are_calculated_every_time(self):
+        metric, calculate = self.counted(cache_metric=False)
+        metric.metric
+        metric.metric
+        self.assertIsNone(metric._metric)
+        self.assertEqual(calculate.call_count, 2)
+
+    def test_evaluate_calculates_everything(self):
+        metric, calculate = self.counted()
+        metric.evaluate()
+        self.assertEqual(calculate.call_count, 1)
+        self.assertIsNotNone(metric._aggregate)
+        self.assertIsNotNone(metric._histogram)
+
+    def test_restored_metrics_are_not_calculated(self):
+        metric, calculate = self.counted()
+        metric.restore(LatencyAggregate.of(self.e2e / 1000),
+                       LatencyHistogram.of(self.e2e / 1000))
+        self.assertEqual(metric.stats(),
+                         E2EMetric(self.df, FACTORS, None).stats())
+        calculate.assert_not_called()
+
+    def test_values_are_a_view_of_stage_deltas(self):
+        stage_deltas = StageDeltas(self.df, [E2EMetric.stage])
+        metric = E2EMetric(self.df, FACTORS, None,
+                           stage_deltas=stage_deltas)
+        self.assertEqual(metric.metric.dtype, np.int64)
+        self.assertTrue(np.shares_memory(metric.metric, stage_deltas.matrix))
+        # Stats are in microseconds
+        self.assertEqual(metric.aggregate().stats(),
+                         LatencyAggregate.of(self.e2e / 1000).stats())
+        self.assertEqual(metric.histogram().stats(),
+                         LatencyHistogram.of(self.e2e / 1000).stats())
+
+    def test_missing_columns_are_reported(self):
+        df = {column: self.df[column]
+              for column in ['SoftwareTransmitTimestamp',
+                             'SoftwareReceiveTimestamp']}
+        self.assertTrue(E2EMetric.available_on(df.keys()))
+        self.assertFalse(DriverRxMetric.available_on(df.keys()))
+        with self.assertRaises(KeyError) as cm:
+            DriverRxMetric(df, FACTORS, None).metric
+        self.assertIn(DriverRxMetric.missing_hint, str(cm.exception))
@@ -0,0 +1,209 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import plots
+import unittest
+
+from histograms import LatencyHistogram
+from plots import (BiHistogram, HistogramComparison, HistogramGroupPlot,
+                   RunSequencePlot, StackedBarChart, _density_range,
+                   decimate, density)
+from .results_files import temporary_dir
+
+
+# Per-column stats as drawn before decimation: every value of each column
+def brute_force_decimate(x, values, x_range, columns):
+    x_min, x_max = x_range
+    edges = np.linspace(x_min, x_max, columns + 1)
+    minimum = np.full(columns, np.nan)
+    maximum = np.full(columns, np.nan)
+    mean = np.full(columns, np.nan)
+    for column in range(columns):
+        if column == columns - 1:
+            inside = (x >= edges[column]) & (x <= edges[column + 1])
+        else:
+            inside = (x >= edges[column]) & (x < edges[column + 1])
+        if np.any(inside):
+            minimum[column] = np.min(values[inside])
+            maximum[column] = np.max(values[inside])
+            mean[column] = np.mean(values[inside])
+    return minimum, maximum, mean
+
+
+class TestDecimate(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        # Indices with gaps, so some columns are empty. Columns are 4096
+        # wide, so their edges are exact on both calculations.
+        self.indices = np.sort(rng.choice(1 << 20, 50000, replace=False))
+        self.values = rng.gamma(2.0, 15.0, len(self.indices))
+        # Isolated spikes must survive decimation
+        self.values[[100, 30000]] = [5000.0, 9000.0]
+        self.x_range = (0, 1 << 20)
+
+    def assertDecimated(self, indices, values, x_range, columns):
+        _, minimum, maximum, mean = decimate(indices, values, x_range,
+                                             columns)
+        x = np.asarray(indices)
+        if np.issubdtype(x.dtype, np.datetime64):
+            x = x.view(np.int64)
+        expected = brute_force_decimate(x, values, x_range, columns)
+        for got, want in zip([minimum, maximum, mean], expected):
+            np.testing.assert_allclose(got, want, rtol=1e-12)
+
+    def test_matches_brute_force(self):
+        self.assertDecimated(self.indices, self.values, self.x_range, 256)
+
+    def test_keeps_spikes(self):
+        _, _, maximum, _ = decimate(self.indices, self.values, self.x_range,
+                                    256)
+        self.assertEqual(np.nanmax(maximum), 9000.0)
+        self.assertIn(5000.0, maximum)
+
+    def test_empty_columns_are_nan(self):
+        indices = np.array([0, 1, 999])
+        _, minimum, maximum, mean = decimate(indices, [1.0, 2.0, 3.0],
+                                             (0, 999), 10)
+        self.assertEqual(np.count_nonzero(~np.isnan(minimum)), 2)
+        self.assertEqual(minimum[0], 1.0)
+        self.assertEqual(maximum[0], 2.0)
+        self.assertEqual(mean[0], 1.5)
+        self.assertEqual(mean[-1], 3.0)
+        self.assertTrue(np.all(np.isnan(mean[1:-1])))
+
+    def test_unsorted_indices(self):
+        order = np.random.default_rng(1).permutation(len(self.indices))
+        self.assertDecimated(self.indices[order], self.values[order],
+                             self.x_range, 256)
+
+    def test_datetime_indices(self):
+        start = np.datetime64('2021-01-01T00:00:00', 'ns')
+        indices = start + self.indices * 1024
+        x = indices.view(np.int64)
+        x_range = (x[0], x[0] + (1 << 30))
+        self.assertDecimated(indices, self.values, x_range, 256)
+
+        centres, _, _, _ = decimate(indices, self.values, x_range, 256)
+        self.assertEqual(centres.dtype, indices.dtype)
+        self.assertTrue(np.all(centres >= indices[0]))
+        self.assertTrue(np.all(centres <= indices[0] + (1 << 30)))
+
+    def test_single_point(self):
+        _, minimum, maximum, mean = decimate(np.array([5]), [7.0], (5, 5),
+                                             10)
+        self.assertEqual(minimum[0], 7.0)
+        self.assertEqual(maximum[0], 7.0)
+        self.assertEqual(mean[0], 7.0)
+        self.assertTrue(np.all(np.isnan(mean[1:])))
+
+    def test_empty(self):
+        centres, minimum, maximum, mean = decimate(np.array([], dtype=int),
+                                                   [], (0, 100), 10)
+        self.assertEqual(len(centres), 10)
+        for envelope in [minimum, maximum, mean]:
+            self.assertTrue(np.all(np.isnan(envelope)))
+
+
+class TestDensity(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        # Power of two ranges and bins, so cell edges are exact on both
+        # calculations. Maximums are on the last cells.
+        self.x = np.append(rng.integers(0, 1 << 20, 20000), 1 << 20)
+        self.y = np.append(rng.gamma(2.0, 40.0, 20000) % 512, 512.0)
+        self.x_range = (0, 1 << 20)
+        self.y_range = (0.0, 512.0)
+
+    def test_matches_histogram2d(self):
+        bins = (64, 32)
+        counts = density(self.x, self.y, self.x_range, self.y_range, bins)
+        expected, _, _ = np.histogram2d(self.x, self.y, bins,
+                                        [self.x_range, self.y_range])
+        self.assertEqual(counts.shape, bins)
+        np.testing.assert_array_equal(counts, expected)
+
+    def test_counts_every_point(self):
+        counts = density(self.x, self.y, self.x_range, self.y_range)
+        self.assertEqual(np.sum(counts), len(self.x))
+
+    def test_constant_values(self):
+        y_range = _density_range(np.full(10, 3.0))
+        self.assertEqual(y_range, (2.5, 3.5))
+        counts = density(np.arange(10), np.full(10, 3.0), (0, 9), y_range,
+                         (10, 4))
+        expected, _, _ = np.histogram2d(np.arange(10), np.full(10, 3.0),
+                                        (10, 4), [(0, 9), y_range])
+        np.testing.assert_array_equal(counts, expected)
+
+
+class TestFigureReuse(unittest.TestCase):
+    def setUp(self):
+        self.tmp = temporary_dir(self)
+        self.forget_figures()
+        self.addCleanup(self.forget_figures)
+        rng = np.random.default_rng(0)
+        self.values = [rng.gamma(2.0, 15.0, 5000) + 10 * i for i in range(3)]
+        # Many more values, so that they're decimated
+        self.values.append(rng.gamma(2.0, 15.0,
+                                     plots.DECIMATION_THRESHOLD + 1))
+
+    def forget_figures(self):
+        plots._templates.clear()
+        plt.close('all')
+
+    # Draws `chart` and returns the contents of its file
+    def drawn(self, chart, title='Chart'):
+        filename = f'{self.tmp}/chart.png'
+        chart.plot(title, filename)
+        with open(filename, 'rb') as f:
+            return f.read()
+
+    def run_sequence(self, values, style='scatter'):
+        return RunSequencePlot((np.arange(len(values)), values), style=style)
+
+    def histogram_group(self, values_list):
+        group = HistogramGroupPlot(2, 1, 200, 5000)
+        for i, values in enumerate(values_list):
+            hist, edges = np.histogram(values, bins=100)
+            group.add_histogram(hist, edges, np.mean(values), np.std(values),
+                                f'Metric {i}')
+        return group
+
+    def other_charts(self):
+        histograms = [(f'Run {i}', LatencyHistogram.of(values))
+                      for i, values in enumerate(self.values[:3])]
+        bars = StackedBarChart()
+        bars.add_bar('Run', [('A', 1.0), ('B', 2.0)])
+        return [HistogramComparison(histograms),
+                BiHistogram(histograms[0], histograms[1]), bars]
+
+    # Each chart is drawn after one of very different values (decimated or
+    # not) on the same figure
+    def test_run_sequence_as_on_new_figure(self):
+        for style, values, other in [('scatter', 0, 3), ('scatter', 3, 0),
+                                     ('density', 0, 3)]:
+            self.forget_figures()
+            fresh = self.drawn(self.run_sequence(self.values[values], style))
+
+            self.forget_figures()
+            self.drawn(self.run_sequence(self.values[other], style), 'Other')
+            reused = self.drawn(self.run_sequence(self.values[values], style))
+            self.assertEqual(reused, fresh, f'{style} {values}')
+
+    def test_histogram_group_as_on_new_figure(self):
+        fresh = self.drawn(self.histogram_group(self.values[:2]))
+
+        self.forget_figures()
+        self.drawn(self.histogram_group([v * 100 for v in self.values[1:3]]),
+                   'Other')
+        reused = self.drawn(self.histogram_group(self.values[:2]))
+        self.assertEqual(reused, fresh)
+
+    def test_other_charts_use_their_own_figures(self):
+        fresh = self.drawn(self.run_sequence(self.values[0]))
+        figures = plt.get_fignums()
+
+        for chart in self.other_charts():
+            self.drawn(chart)
+            self.assertEqual(plt.get_fignums(), figures)
+        self.assertEqual(self.drawn(self.run_sequence(self.values[0])),
+                         fresh)
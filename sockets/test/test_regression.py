@@ -0,0 +1,115 @@
+import numpy as np
+import unittest
+
+from aggregates import LatencyAggregate
+from baselines import BaselineStore
+from histograms import LatencyHistogram
+from metrics import E2EMetric, TotalRxMetric
+from regression import IMPROVEMENT, REGRESSION, check, welch_t_test
+from .results_files import temporary_dir
+
+
+# Summaries (in the format of export.summaries_of()) of E2EMetric of each
+# payload on `payload_shift`, whose values are shifted by its shift
+def summaries(payload_shift, seed=0, scale=1):
+    rng = np.random.default_rng(seed)
+    summaries = {}
+    for payload, shift in payload_shift.items():
+        values = (rng.gamma(2.0, 15.0, 20000) + 50) * scale + shift
+        summaries[(E2EMetric, payload, 125000)] = (
+                LatencyAggregate.of(values), LatencyHistogram.of(values))
+    return summaries
+
+
+def verdicts(rows):
+    return {(row['factors']['PayloadSize'], row['stat']): row['verdict']
+            for row in rows}
+
+
+class TestRegressionCheck(unittest.TestCase):
+    def test_identical_results_have_no_verdicts(self):
+        baseline = summaries({48: 0, 100: 0})
+        rows, missing = check(baseline, baseline)
+        self.assertEqual(missing, [])
+        self.assertEqual(set(verdicts(rows).values()), {''})
+        self.assertEqual({row['change'] for row in rows}, {0.0})
+
+    def test_same_distribution_has_no_verdicts(self):
+        rows, _ = check(summaries({48: 0, 100: 0}, 0),
+                        summaries({48: 0, 100: 0}, 1))
+        stats = {k: v for k, v in verdicts(rows).items() if k[1] != 'Max'}
+        self.assertEqual(set(stats.values()), {''})
+
+    def test_slower_results_are_regressions(self):
+        rows, _ = check(summaries({48: 0, 100: 0}, 0),
+                        summaries({48: 0, 100: 30}, 1))
+        results = verdicts(rows)
+        self.assertEqual(results[(48, 'Mean')], '')
+        self.assertEqual(results[(48, 'P99')], '')
+        self.assertEqual(results[(100, 'Mean')], REGRESSION)
+        self.assertEqual(results[(100, 'P99')], REGRESSION)
+        self.assertEqual(results[('ALL', 'Mean')], REGRESSION)
+
+    def test_faster_results_are_improvements(self):
+        rows, _ = check(summaries({48: 30}, 0), summaries({48: 0}, 1))
+        results = verdicts(rows)
+        self.assertEqual(results[(48, 'Mean')], IMPROVEMENT)
+        self.assertEqual(results[(48, 'P99')], IMPROVEMENT)
+
+    def test_changes_within_tolerance_are_not_flagged(self):
+        baseline = summaries({48: 0}, 0)
+        # Significant, on 20000 values, but only about 2% slower
+        current = summaries({48: 0}, 1, scale=1.02)
+        rows, _ = check(baseline, current)
+        self.assertEqual(verdicts(rows)[(48, 'Mean')], '')
+        rows, _ = check(baseline, current, tolerance=1)
+        self.assertEqual(verdicts(rows)[(48, 'Mean')], REGRESSION)
+
+    def test_welch_t_test(self):
+        a = LatencyAggregate.of([1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(welch_t_test(a, a), 1.0)
+        b = LatencyAggregate.of([11.0, 12.0, 13.0, 14.0])
+        self.assertLess(welch_t_test(a, b), 1e-6)
+        self.assertTrue(np.isnan(welch_t_test(a, LatencyAggregate())))
+
+    def test_missing_and_empty_results_are_reported(self):
+        baseline = summaries({48: 0, 64: 0, 100: 0})
+        current = summaries({48: 0, 100: 0})
+        current[(E2EMetric, 100, 125000)] = (LatencyAggregate(),
+                                             LatencyHistogram())
+        rows, missing = check(baseline, current)
+        self.assertEqual(sorted(key[1] for key in missing), [64, 100])
+        self.assertEqual({row['factors']['PayloadSize'] for row in rows},
+                         {48})
+
+    def test_empty_baseline_is_skipped(self):
+        baseline = summaries({48: 0})
+        baseline[(TotalRxMetric, 48, 125000)] = (LatencyAggregate(),
+                                                 LatencyHistogram())
+        rows, missing = check(baseline, summaries({48: 0}))
+        self.assertEqual(missing, [])
+        self.assertEqual({row['metric'] for row in rows}, {E2EMetric.name})
+
+
+class TestBaselineStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = temporary_dir(self)
+        self.store = BaselineStore(self.tmp)
+
+    def test_saved_baseline_checks_as_the_original(self):
+        baseline = summaries({48: 0, 100: 0})
+        self.store.save('v1', baseline, '/some/results')
+        self.assertEqual(self.store.names(), ['v1'])
+        self.assertEqual(self.store.info('v1')['source'], '/some/results')
+
+        loaded = self.store.load('v1')
+        self.assertEqual(set(loaded), set(baseline))
+        current = summaries({48: 0, 100: 30}, 1)
+        self.assertEqual(check(loaded, current), check(baseline, current))
+
+    def test_unknown_and_invalid_baselines(self):
+        with self.assertRaises(Exception):
+            self.store.load('v1')
+        for name in ['', '..', 'a/b']:
+            with self.assertRaises(Exception):
+                self.store.save(name, summaries({48: 0}), '')
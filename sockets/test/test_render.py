@@ -0,0 +1,51 @@
+import os
+import unittest
+
+from analysis import Analysis
+from metrics import E2EMetric, HwRxMetric
+from render import Renderer
+from .results_files import temporary_dir, write_run
+
+
+# Chart that can't be drawn
+class BrokenPlot():
+    def plot(self, title, filename):
+        raise ValueError(title)
+
+
+class TestRenderer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = temporary_dir(self)
+        self.csv_dir = f'{self.tmp}/results'
+        write_run(self.csv_dir)
+
+    # Draws the run sequences of metrics on `graphs_dir`, with `renderer`.
+    # Returns the contents of each chart drawn.
+    def drawn(self, graphs_dir, renderer=None):
+        analysis = Analysis(self.csv_dir, graphs_dir)
+        analysis.analyse([E2EMetric, HwRxMetric])
+        for metric in analysis.metrics_collection:
+            metric.run_sequence(renderer=renderer)
+        if renderer is not None:
+            renderer.close()
+        charts = {}
+        for root, _, files in os.walk(graphs_dir):
+            for name in files:
+                with open(f'{root}/{name}', 'rb') as f:
+                    charts[os.path.relpath(f'{root}/{name}',
+                                           graphs_dir)] = f.read()
+        return charts
+
+    def test_pool_draws_the_same_charts(self):
+        serial = self.drawn(f'{self.tmp}/serial')
+        pool = self.drawn(f'{self.tmp}/pool', Renderer(2))
+        self.assertEqual(len(serial), 4)
+        self.assertEqual(pool.keys(), serial.keys())
+        for name, chart in serial.items():
+            self.assertEqual(pool[name], chart, name)
+
+    def test_errors_are_raised(self):
+        renderer = Renderer(1)
+        renderer.submit(BrokenPlot(), 'broken', None)
+        with self.assertRaises(ValueError):
+            renderer.close()
@@ -0,0 +1,83 @@
+import numpy as np
+import os
+import unittest
+
+from results_cache import ResultsCache, read_csv_chunks, read_results_csv
+from .results_files import (COLUMNS, results_columns, temporary_dir,
+                            write_results)
+
+
+class TestResultsCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = temporary_dir(self)
+        self.columns = results_columns(1000)
+        self.file_name = write_results(self.tmp, 48, 125000, self.columns)
+        self.cache = ResultsCache(f'{self.tmp}/.cache')
+
+    def assertColumnsEqual(self, read, expected):
+        self.assertEqual(list(read.keys()), list(expected.keys()))
+        for column in expected:
+            self.assertEqual(read[column].dtype, np.int64)
+            np.testing.assert_array_equal(read[column], expected[column])
+
+    def test_csv_is_read_as_int64_columns(self):
+        self.assertColumnsEqual(read_results_csv(self.file_name),
+                                self.columns)
+
+    def test_only_requested_columns_are_read(self):
+        wanted = {'irq_handler_entry', 'SoftwareTransmitTimestamp', 'nope'}
+        read = read_results_csv(self.file_name, wanted)
+        self.assertEqual(list(read.columns), ['SoftwareTransmitTimestamp',
+                                              'irq_handler_entry'])
+
+    def test_chunks_cover_all_rows(self):
+        for chunk_rows in [1, 333, 1000, 4096]:
+            chunks = list(read_csv_chunks(self.file_name,
+                                          chunk_rows=chunk_rows))
+            self.assertEqual(len(chunks), -(-1000 // chunk_rows))
+            for column in COLUMNS:
+                np.testing.assert_array_equal(
+                        np.concatenate([c[column] for c in chunks]),
+                        self.columns[column])
+
+    def test_empty_file_has_a_single_empty_chunk(self):
+        empty_name = write_results(self.tmp, 64, 125000, results_columns(0))
+        chunk, = read_csv_chunks(empty_name, chunk_rows=100)
+        self.assertEqual(chunk.columns, COLUMNS)
+        for values in chunk.values():
+            self.assertEqual(len(values), 0)
+
+    def test_cached_columns_are_the_csv_columns(self):
+        self.assertColumnsEqual(self.cache.read_csv(self.file_name),
+                                self.columns)
+        # Second read comes from the cache
+        self.assertColumnsEqual(self.cache.read_csv(self.file_name),
+                                self.columns)
+        self.assertColumnsEqual(self.cache.map_csv(self.file_name),
+                                self.columns)
+
+    def test_columns_are_cached_as_requested(self):
+        first = ['HardwareReceiveTimestamp']
+        second = ['HardwareReceiveTimestamp', 'irq_handler_entry']
+        self.assertColumnsEqual(self.cache.read_csv(self.file_name, first),
+                                {c: self.columns[c] for c in first})
+        self.assertColumnsEqual(self.cache.map_csv(self.file_name, second),
+                                {c: self.columns[c] for c in second})
+
+    def test_entry_is_rebuilt_when_csv_changes(self):
+        self.cache.read_csv(self.file_name)
+        changed = results_columns(500, seed=1)
+        write_results(self.tmp, 48, 125000, changed)
+        # Make sure the source looks changed, even on coarse mtime
+        os.utime(self.file_name, ns=(0, 0))
+        self.assertColumnsEqual(self.cache.read_csv(self.file_name), changed)
+
+    def test_files_with_same_name_have_their_own_entries(self):
+        other_dir = f'{self.tmp}/other'
+        os.makedirs(other_dir)
+        other = results_columns(10, seed=2)
+        other_file = write_results(other_dir, 48, 125000, other)
+        self.cache.read_csv(self.file_name)
+        self.assertColumnsEqual(self.cache.read_csv(other_file), other)
+        self.assertColumnsEqual(self.cache.read_csv(self.file_name),
+                                self.columns)
@@ -0,0 +1,100 @@
+import json
+import numpy as np
+import os
+import unittest
+
+from aggregates import LatencyAggregate
+from histograms import LatencyHistogram
+from metrics import E2EMetric, HwRxMetric
+from results_db import INFO_FILE, ResultsDatabase
+from .results_files import temporary_dir
+
+
+def summaries(values_of):
+    return {key: (LatencyAggregate.of(values), LatencyHistogram.of(values))
+            for key, values in values_of.items()}
+
+
+class TestResultsDatabase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = temporary_dir(self)
+        self.db = ResultsDatabase(f'{self.tmp}/experiments.db')
+        self.addCleanup(self.db.close)
+
+        rng = np.random.default_rng(0)
+        self.values = {(E2EMetric, 48, 125000): rng.gamma(2, 15, 1000) + 50,
+                       (E2EMetric, 100, 125000): rng.gamma(2, 15, 800) + 60,
+                       (HwRxMetric, 48, 125000): rng.gamma(2, 1, 1000)}
+        self.run_a = self.results_dir('a', {'platform': 'i225',
+                                            'socket_type': 'AF_PACKET',
+                                            'started': '2021-01-01'})
+        self.run_b = self.results_dir('b', {'platform': 'i210',
+                                            'socket_type': 'AF_PACKET',
+                                            'started': '2021-01-02'})
+
+    def results_dir(self, name, info):
+        results_dir = f'{self.tmp}/{name}'
+        os.makedirs(results_dir)
+        with open(f'{results_dir}/{INFO_FILE}', 'w') as f:
+            json.dump(info, f)
+        return results_dir
+
+    def test_recorded_stats_are_the_metrics_stats(self):
+        self.db.record(self.run_a, summaries(self.values))
+        rows = self.db.stats({'metric': E2EMetric.name})
+        self.assertEqual([(row['payload_size'], row['count'])
+                          for row in rows],
+                         [(48, 1000), (100, 800), ('ALL', 1800)])
+        for row in rows[:-1]:
+            values = self.values[(E2EMetric, row['payload_size'], 125000)]
+            self.assertAlmostEqual(row['mean'], np.mean(values))
+            self.assertAlmostEqual(row['stdev'], np.std(values))
+            self.assertEqual(row['maximum'], np.max(values))
+            self.assertEqual(row['p99'], LatencyHistogram.of(
+                    values).percentile(99))
+            self.assertEqual(row['platform'], 'i225')
+            self.assertEqual(row['results_dir'], os.path.abspath(self.run_a))
+
+    def test_queries_filter_runs_and_stats(self):
+        self.db.record(self.run_a, summaries(self.values))
+        self.db.record(self.run_b, summaries(self.values))
+        self.assertEqual([run['platform'] for run in self.db.runs()],
+                         ['i225', 'i210'])
+        self.assertEqual([run['results_dir'] for run in self.db.runs(
+                {'platform': 'i210'})], [os.path.abspath(self.run_b)])
+        rows = self.db.stats({'socket_type': 'AF_PACKET',
+                              'metric': HwRxMetric.name,
+                              'payload_size': 48})
+        self.assertEqual([row['platform'] for row in rows], ['i225', 'i210'])
+        self.assertEqual(self.db.stats({'kernel': '5.15'}), [])
+
+    def test_unknown_columns_are_refused(self):
+        with self.assertRaises(Exception):
+            self.db.runs({'metric': E2EMetric.name})
+        with self.assertRaises(Exception):
+            self.db.stats({'1 = 1 OR platform': 'x'})
+
+    def test_recording_again_replaces_the_run(self):
+        self.db.record(self.run_a, summaries(self.values))
+        del self.values[(E2EMetric, 100, 125000)]
+        self.db.record(self.run_a, summaries(self.values))
+        self.assertEqual(len(self.db.runs()), 1)
+        self.assertEqual([(row['metric'], row['payload_size'])
+                          for row in self.db.stats()],
+                         [(E2EMetric.name, 48), (E2EMetric.name, 'ALL'),
+                          (HwRxMetric.name, 48), (HwRxMetric.name, 'ALL')])
+
+    def test_runs_without_info_have_null_dimensions(self):
+        results_dir = f'{self.tmp}/old'
+        os.makedirs(results_dir)
+        self.db.record(results_dir, summaries(self.values))
+        run, = self.db.runs()
+        self.assertIsNone(run['platform'])
+
+    def test_metrics_without_values_have_null_stats(self):
+        self.values[(HwRxMetric, 48, 125000)] = []
+        self.db.record(self.run_a, summaries(self.values))
+        row, _ = self.db.stats({'metric': HwRxMetric.name})
+        self.assertEqual(row['count'], 0)
+        for column in ['mean', 'stdev', 'minimum', 'maximum', 'p99']:
+            self.assertIsNone(row[column])
@@ -0,0 +1,39 @@
+import io
+import unittest
+from contextlib import redirect_stderr
+from unittest.mock import patch
+
+import run_comparison
+from run_comparison import labelled
+
+
+class TestRunLabels(unittest.TestCase):
+    def test_directory_names(self):
+        self.assertEqual(labelled([('runs/a/', None), ('runs/b', None)]),
+                         [('runs/a/', 'a'), ('runs/b', 'b')])
+
+    def test_clashing_names_are_paths(self):
+        self.assertEqual(
+                labelled([('old/results', None), ('new/results/', None),
+                          ('other', None)]),
+                [('old/results', 'old/results'),
+                 ('new/results/', 'new/results'), ('other', 'other')])
+
+    def test_given_labels_are_kept(self):
+        self.assertEqual(
+                labelled([('old/results', 'Old'), ('new/other', None)]),
+                [('old/results', 'Old'), ('new/other', 'other')])
+
+    def test_labels_are_unique(self):
+        csv_dirs = [(f'run{i % 3}/results', None) for i in range(3)]
+        csv_dirs += [('results', None), ('run0/other', None)]
+        labels = [label for _, label in labelled(csv_dirs)]
+        self.assertEqual(len(set(labels)), len(labels))
+
+    def test_repeated_labels_are_rejected(self):
+        argv = ['run_comparison.py', '--csv-dir', 'a', '--label', 'Run',
+                '--csv-dir', 'b', '--label', 'Run']
+        with patch('sys.argv', argv), redirect_stderr(io.StringIO()) as err:
+            with self.assertRaises(SystemExit):
+                run_comparison.main()
+        self.assertIn('Label Run is used for more than one', err.getvalue())
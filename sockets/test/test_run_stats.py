@@ -0,0 +1,80 @@
+import argparse
+import filecmp
+import os
+import subprocess
+import sys
+import unittest
+
+from results_cache import cache_dir_of, default_cache_dir
+from .results_files import temporary_dir, write_run
+
+ANALYSIS_DIR = os.path.join(os.path.dirname(__file__), '..', 'analysis')
+
+# Runs the script given as first argument, then fails if matplotlib was
+# loaded
+NO_MATPLOTLIB = '''
+import runpy
+import sys
+sys.argv = sys.argv[1:]
+runpy.run_path(sys.argv[0], run_name='__main__')
+if 'matplotlib' in sys.modules:
+    sys.exit('matplotlib loaded')
+'''
+
+
+# Files on `a` or `b` directory trees which are not on both, or differ
+def tree_differences(a, b):
+    comparison = filecmp.dircmp(a, b)
+    differences = [*comparison.left_only, *comparison.right_only,
+                   *comparison.diff_files, *comparison.funny_files]
+    for name in comparison.common_dirs:
+        differences.extend(f'{name}/{difference}' for difference in
+                           tree_differences(f'{a}/{name}', f'{b}/{name}'))
+    return differences
+
+
+class TestRunStats(unittest.TestCase):
+    def setUp(self):
+        self.tmp = temporary_dir(self)
+        self.csv_dir = f'{self.tmp}/results'
+        write_run(self.csv_dir)
+
+    def run_script(self, *args):
+        subprocess.run([sys.executable, *args, '-d', self.csv_dir,
+                        '--disable-cache'], cwd=ANALYSIS_DIR, check=True,
+                       stdout=subprocess.DEVNULL)
+
+    def test_matplotlib_not_loaded(self):
+        self.run_script('-c', NO_MATPLOTLIB, 'run_stats.py', '-g',
+                        f'{self.tmp}/stats')
+        self.assertTrue(os.path.exists(f'{self.tmp}/stats/end_to_end'))
+
+    def test_streaming_analysis_without_charts(self):
+        self.run_script('-c', NO_MATPLOTLIB, 'run_analysis.py', '--streaming',
+                        '--disable-time-sequence', '--disable-grouped', '-g',
+                        f'{self.tmp}/streaming')
+        self.assertTrue(os.path.exists(f'{self.tmp}/streaming/end_to_end'))
+
+    def test_same_reports_as_streaming_analysis(self):
+        self.run_script('run_stats.py', '-g', f'{self.tmp}/stats')
+        self.run_script('run_analysis.py', '--streaming', '-g',
+                        f'{self.tmp}/streaming')
+        self.assertEqual(tree_differences(f'{self.tmp}/stats',
+                                          f'{self.tmp}/streaming'), [])
+
+
+class TestCacheDirOf(unittest.TestCase):
+    def args(self, cache_dir=None, disable_cache=False):
+        return argparse.Namespace(cache_dir=cache_dir,
+                                  disable_cache=disable_cache)
+
+    def test_default(self):
+        self.assertEqual(cache_dir_of('results', self.args()),
+                         default_cache_dir('results'))
+
+    def test_given(self):
+        self.assertEqual(cache_dir_of('results', self.args('cache')),
+                         'cache')
+
+    def test_disabled(self):
+        self.assertIsNone(cache_dir_of('results', self.args('cache', True)))
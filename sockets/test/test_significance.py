@@ -0,0 +1,128 @@
+import numpy as np
+import unittest
+
+from aggregates import LatencyAggregate
+from histograms import LatencyHistogram
+from metrics import E2EMetric, TotalRxMetric
+from run_comparison import significance_of
+from significance import compare, ks_test, mann_whitney_u
+
+
+# Counts of `values` (nanoseconds, below 1024, so that each value gets its
+# own bucket), aligned on buckets 0 to 1023
+def exact_counts(values):
+    return np.bincount(values, minlength=1024)
+
+
+class TestSignificanceTests(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.a = rng.integers(100, 900, 300)
+        self.b = rng.integers(250, 1000, 250)
+
+    def test_ks_statistic_is_exact(self):
+        statistic, p = ks_test(exact_counts(self.a), exact_counts(self.b))
+        points = np.union1d(self.a, self.b)
+        cdf_a = np.searchsorted(np.sort(self.a), points, 'right') / 300
+        cdf_b = np.searchsorted(np.sort(self.b), points, 'right') / 250
+        self.assertAlmostEqual(statistic, np.max(np.abs(cdf_a - cdf_b)))
+        self.assertLess(p, 0.05)
+
+    def test_mann_whitney_probability_is_exact(self):
+        probability, p = mann_whitney_u(exact_counts(self.a),
+                                        exact_counts(self.b))
+        greater = np.sum(self.b[:, None] > self.a[None, :])
+        ties = np.sum(self.b[:, None] == self.a[None, :])
+        self.assertAlmostEqual(probability,
+                               (greater + ties / 2) / (300 * 250))
+        self.assertLess(p, 0.05)
+
+    def test_same_counts_are_not_different(self):
+        counts = exact_counts(self.a)
+        self.assertEqual(ks_test(counts, counts), (0.0, 1.0))
+        probability, p = mann_whitney_u(counts, counts)
+        self.assertAlmostEqual(probability, 0.5)
+        self.assertAlmostEqual(p, 1.0)
+
+
+class TestCompare(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.values = rng.gamma(2.0, 15.0, 20000) + 50
+        self.same = rng.gamma(2.0, 15.0, 20000) + 50
+
+    def test_identical_data_is_not_significant(self):
+        histogram = LatencyHistogram.of(self.values)
+        result = compare(histogram, histogram)
+        self.assertEqual(result['ks_statistic'], 0)
+        self.assertGreater(result['ks_p'], 0.05)
+        self.assertGreater(result['mwu_p'], 0.05)
+        self.assertEqual(result['p99_difference'], 0)
+        self.assertLessEqual(result['p99_difference_low'], 0)
+        self.assertGreaterEqual(result['p99_difference_high'], 0)
+
+    def test_same_distribution_is_not_significant(self):
+        result = compare(LatencyHistogram.of(self.values),
+                         LatencyHistogram.of(self.same))
+        self.assertGreater(result['ks_p'], 0.05)
+        self.assertGreater(result['mwu_p'], 0.05)
+        self.assertLessEqual(result['p99_difference_low'], 0)
+        self.assertGreaterEqual(result['p99_difference_high'], 0)
+
+    def test_shifted_data_is_significant(self):
+        result = compare(LatencyHistogram.of(self.values),
+                         LatencyHistogram.of(self.same + 5))
+        self.assertLess(result['ks_p'], 0.001)
+        self.assertLess(result['mwu_p'], 0.001)
+        self.assertGreater(result['mwu_probability'], 0.5)
+        self.assertGreater(result['p99_difference_low'], 0)
+        self.assertLessEqual(result['p99_difference_low'],
+                             result['p99_difference'])
+        self.assertGreaterEqual(result['p99_difference_high'],
+                                result['p99_difference'])
+
+    def test_intervals_are_reproducible(self):
+        a = LatencyHistogram.of(self.values)
+        b = LatencyHistogram.of(self.same + 1)
+        self.assertEqual(compare(a, b), compare(a, b))
+
+    def test_empty_is_not_compared(self):
+        histogram = LatencyHistogram.of(self.values)
+        self.assertIsNone(compare(histogram, LatencyHistogram()))
+        self.assertIsNone(compare(LatencyHistogram(), histogram))
+
+
+class TestSignificanceOf(unittest.TestCase):
+    def summaries(self, factors_shift, seed):
+        rng = np.random.default_rng(seed)
+        summaries = {}
+        for (payload, interval), shift in factors_shift.items():
+            values = rng.gamma(2.0, 15.0, 5000) + 50 + shift
+            summaries[(E2EMetric, payload, interval)] = (
+                    LatencyAggregate.of(values), LatencyHistogram.of(values))
+        return summaries
+
+    def test_factors_and_all_are_compared(self):
+        sets = [('a', self.summaries({(48, 1): 0, (100, 1): 0}, 0)),
+                ('b', self.summaries({(48, 1): 0, (100, 1): 20}, 1))]
+        comparisons = significance_of(sets, [E2EMetric, TotalRxMetric])
+        results = {(c[1]['PayloadSize'], c[2]): c[3] for c in comparisons}
+        self.assertEqual(set(results), {(48, 'b vs a'), (100, 'b vs a'),
+                                        ('ALL', 'b vs a')})
+        self.assertGreater(results[(48, 'b vs a')]['ks_p'], 0.05)
+        self.assertLess(results[(100, 'b vs a')]['ks_p'], 0.001)
+
+    def test_all_merges_only_common_factors(self):
+        # A factor only one set has, much slower, must not make the merged
+        # factors look different
+        sets = [('a', self.summaries({(48, 1): 0, (100, 1): 0}, 0)),
+                ('b', self.summaries({(48, 1): 0, (64, 1): 500}, 1))]
+        comparisons = significance_of(sets, [E2EMetric])
+        results = {c[1]['PayloadSize']: c[3] for c in comparisons}
+        self.assertEqual(set(results), {48, 'ALL'})
+        self.assertEqual(results['ALL'], results[48])
+
+    def test_no_common_factors_are_skipped(self):
+        sets = [('a', self.summaries({(48, 1): 0}, 0)),
+                ('b', self.summaries({(64, 1): 0}, 1))]
+        self.assertEqual(significance_of(sets, [E2EMetric]), [])
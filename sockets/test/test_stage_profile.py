@@ -0,0 +1,141 @@
+import numpy as np
+import unittest
+
+from analysis import Analysis
+from histograms import SUB_BUCKET_BITS, bucket_index
+from metrics import rx_intermediate_classes, tx_intermediate_classes
+from stage_profile import (PROFILE_BAND, PROFILE_PERCENTILES,
+                           TAIL_PERCENTILE, StageProfile, stage_profile_of)
+from streaming import StreamingAnalysis
+from .results_files import temporary_dir, write_run
+
+# Highest relative error of a total latency, given the bucket resolution
+RESOLUTION = 2.0 ** -(SUB_BUCKET_BITS - 1)
+
+
+# Stage latencies of packets, as a matrix with a row per packet and a column
+# per stage, on a long tail
+def stage_values(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([rng.gamma(2.0, 3.0, rows),
+                            rng.gamma(2.0, 10.0, rows),
+                            rng.pareto(2.0, rows) * 5])
+
+
+class TestStageProfile(unittest.TestCase):
+    def setUp(self):
+        self.values = stage_values(20000)
+        self.totals = self.values.sum(axis=1)
+        self.buckets = bucket_index(
+                np.rint(self.totals * 1000).astype(np.int64))
+        self.profile = StageProfile(['A', 'B', 'C']).update(self.values)
+
+    # Bucket of the packet of rank `rank` (from 1), by total latency
+    def bucket_of(self, rank):
+        ranked = np.sort(self.buckets)
+        return ranked[min(max(rank, 1), len(ranked)) - 1]
+
+    # Mean of each stage of packets whose bucket is on `inside`
+    def means(self, inside):
+        return self.values[inside(self.buckets)].mean(axis=0)
+
+    def test_percentiles_match_brute_force(self):
+        count = len(self.values)
+        for q, _ in PROFILE_PERCENTILES:
+            first = self.bucket_of(
+                    int(np.ceil((q - PROFILE_BAND) / 100 * count)))
+            last = self.bucket_of(
+                    int(np.ceil((q + PROFILE_BAND) / 100 * count)))
+            np.testing.assert_allclose(
+                    self.profile.percentile_means(q),
+                    self.means(lambda b: (b >= first) & (b <= last)),
+                    rtol=1e-9)
+
+    def test_tail_matches_brute_force(self):
+        bucket = self.bucket_of(int(np.ceil(TAIL_PERCENTILE / 100 *
+                                            len(self.values))))
+        np.testing.assert_allclose(self.profile.tail_means(),
+                                   self.means(lambda b: b > bucket),
+                                   rtol=1e-9)
+
+    # The stages of packets at a percentile add up to a total latency within
+    # its band, up to the bucket resolution
+    def test_stages_add_up_to_percentile(self):
+        for q, _ in PROFILE_PERCENTILES:
+            low, high = np.percentile(self.totals,
+                                      [q - PROFILE_BAND, q + PROFILE_BAND],
+                                      method='inverted_cdf')
+            total = sum(self.profile.percentile_means(q))
+            self.assertGreaterEqual(total, low * (1 - RESOLUTION), q)
+            self.assertLessEqual(total, high * (1 + RESOLUTION), q)
+        self.assertGreater(sum(self.profile.tail_means()),
+                           np.percentile(self.totals, TAIL_PERCENTILE))
+
+    def test_merge_equals_single_pass(self):
+        merged = StageProfile(['A', 'B', 'C'])
+        for chunk in np.array_split(self.values, 7):
+            merged.merge(StageProfile(['A', 'B', 'C']).update(chunk))
+        np.testing.assert_array_equal(merged.counts, self.profile.counts)
+        np.testing.assert_allclose(merged.sums, self.profile.sums,
+                                   rtol=1e-12)
+        for (name, means), (expected_name, expected) in zip(
+                merged.profiles(), self.profile.profiles()):
+            self.assertEqual(name, expected_name)
+            np.testing.assert_allclose(means, expected, rtol=1e-12)
+
+    def test_nanoseconds_equal_microseconds(self):
+        ns = np.rint(self.values * 1000).astype(np.int64)
+        profile = StageProfile(['A', 'B', 'C']).update(ns, nanoseconds=True)
+        expected = StageProfile(['A', 'B', 'C']).update(ns / 1000)
+        np.testing.assert_array_equal(profile.counts, expected.counts)
+        np.testing.assert_allclose(profile.sums, expected.sums, rtol=1e-12)
+
+    def test_profiles(self):
+        names = [name for name, _ in self.profile.profiles()]
+        self.assertEqual(names, ['P50', 'P99', 'P99.9', '>P99'])
+
+    def test_empty(self):
+        profile = StageProfile(['A', 'B']).update(np.zeros((0, 2)))
+        self.assertEqual(profile.count, 0)
+        self.assertIsNone(profile.percentile_means(50))
+        self.assertIsNone(profile.tail_means())
+        self.assertEqual(profile.profiles(), [])
+        profile.merge(StageProfile(['A', 'B']).update([[1.0, 2.0]]))
+        self.assertEqual(profile.percentile_means(50), [1.0, 2.0])
+
+
+class TestStageProfileOfMetrics(unittest.TestCase):
+    def setUp(self):
+        self.csv_dir = temporary_dir(self)
+        write_run(self.csv_dir, rows=3000, empty=[64])
+        self.types = [tx_intermediate_classes, rx_intermediate_classes]
+
+        analysis = Analysis(self.csv_dir, None)
+        analysis.analyse([t for types in self.types for t in types])
+        self.metrics = analysis.metrics_collection
+
+    def test_stages_of_same_packets(self):
+        for types in self.types:
+            profile = stage_profile_of(self.metrics, types)
+            expected = StageProfile(t.short_name for t in types)
+            for payload in [48, 100]:
+                by_type = {type(m): m.metric for m in self.metrics
+                           if m.factors['PayloadSize'] == payload}
+                expected.update(np.column_stack([by_type[t] for t in types]),
+                                nanoseconds=True)
+            self.assertEqual(profile.stages, expected.stages)
+            np.testing.assert_array_equal(profile.counts, expected.counts)
+            np.testing.assert_allclose(profile.sums, expected.sums,
+                                       rtol=1e-12)
+
+    def test_streaming_matches_in_memory(self):
+        streaming = StreamingAnalysis(self.csv_dir, None, chunk_rows=700)
+        streaming.analyse([t for types in self.types for t in types],
+                          profile_types=self.types)
+        profiles = streaming.stage_profiles()
+        for types in self.types:
+            expected = stage_profile_of(self.metrics, types)
+            np.testing.assert_array_equal(profiles[tuple(types)].counts,
+                                          expected.counts)
+            np.testing.assert_allclose(profiles[tuple(types)].sums,
+                                       expected.sums, rtol=1e-9)
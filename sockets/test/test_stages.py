@@ -0,0 +1,97 @@
+import numpy as np
+import unittest
+from unittest.mock import patch
+
+from stages import STAGES, StageDeltas
+from .results_files import results_columns
+
+# Simple stages, as calculated by each metric before StageDeltas: the
+# difference of two columns
+SIMPLE_STAGES = {
+    'end_to_end': ('SoftwareReceiveTimestamp', 'SoftwareTransmitTimestamp'),
+    'total_rx': ('SoftwareReceiveTimestamp', 'HardwareReceiveTimestamp'),
+    'total_tx': ('HardwareReceiveTimestamp', 'SoftwareTransmitTimestamp'),
+    'hw_tx': ('HardwareReceiveTimestamp', 'net_dev_xmit'),
+    'driver_tx': ('net_dev_xmit', 'net_dev_start_xmit'),
+    'net_core_rx': ('netif_receive_skb', 'napi_gro_receive_entry'),
+    'net_core_tx': ('net_dev_start_xmit', 'net_dev_queue'),
+    'vlan_tx': ('net_dev_queue', 'net_dev_queue_vlan'),
+    'socket_rx': ('sys_exit_recvmsg', 'netif_receive_skb'),
+    'socket_tx': ('net_dev_queue_vlan', 'sys_enter_sendto'),
+    'context_switch_rx': ('SoftwareReceiveTimestamp', 'sys_exit_recvmsg'),
+    'context_switch_tx': ('sys_enter_sendto', 'SoftwareTransmitTimestamp'),
+}
+
+
+# Latencies of `stage`, in microseconds, as each metric calculated them
+# before StageDeltas
+def per_column_stage(df, stage):
+    if stage in SIMPLE_STAGES:
+        a, b = SIMPLE_STAGES[stage]
+        return np.int64(df[a] - df[b]) / 1000
+    if stage == 'hw_rx':
+        m = (df['irq_handler_entry'] - df['HardwareReceiveTimestamp']) / 1000
+        return np.where(m > 0, m, 0)
+    if stage == 'driver_rx':
+        m = np.int64(df['napi_gro_receive_entry'] -
+                     df['irq_handler_entry']) / 1000
+        hw_m = df['irq_handler_entry'] - df['HardwareReceiveTimestamp']
+        return np.where(hw_m > 0, m,
+                        np.int64(df['napi_gro_receive_entry'] -
+                                 df['HardwareReceiveTimestamp']) / 1000)
+    if stage == 'total_hw':
+        m = np.int64(df['HardwareReceiveTimestamp'] -
+                     df['net_dev_xmit']) / 1000
+        return per_column_stage(df, 'hw_rx') + m
+    if stage == 'total_sw':
+        m = np.int64(df['net_dev_xmit'] - df['SoftwareTransmitTimestamp'] +
+                     df['SoftwareReceiveTimestamp'] -
+                     df['napi_gro_receive_entry']) / 1000
+        return per_column_stage(df, 'driver_rx') + m
+    raise KeyError(stage)
+
+
+class TestStageDeltas(unittest.TestCase):
+    def setUp(self):
+        self.df = results_columns(5000)
+
+    def assertPerColumnStages(self, stage_deltas):
+        for stage in stage_deltas.stages:
+            np.testing.assert_allclose(stage_deltas.of(stage) / 1000,
+                                       per_column_stage(self.df, stage),
+                                       rtol=0, atol=1e-9, err_msg=stage)
+
+    def test_data_has_negative_hardware_receive(self):
+        hw_rx = self.df['irq_handler_entry'] - self.df[
+                'HardwareReceiveTimestamp']
+        self.assertTrue(np.any(hw_rx < 0))
+
+    def test_stages_equal_per_column_formulas(self):
+        stage_deltas = StageDeltas(self.df)
+        self.assertEqual(stage_deltas.stages, list(STAGES))
+        self.assertPerColumnStages(stage_deltas)
+
+    def test_blocks_of_rows_equal_a_single_block(self):
+        for block_rows in [1, 7, 4096]:
+            with patch('stages.BLOCK_ROWS', block_rows):
+                self.assertPerColumnStages(StageDeltas(self.df))
+
+    def test_each_stage_alone_equals_all_at_once(self):
+        for stage in STAGES:
+            self.assertPerColumnStages(StageDeltas(self.df, [stage]))
+
+    def test_stages_missing_columns_are_skipped(self):
+        df = {column: self.df[column] for column in
+              ['SoftwareTransmitTimestamp', 'HardwareReceiveTimestamp',
+               'SoftwareReceiveTimestamp']}
+        stage_deltas = StageDeltas(df)
+        self.assertEqual(stage_deltas.stages,
+                         ['end_to_end', 'total_rx', 'total_tx'])
+        with self.assertRaises(KeyError):
+            stage_deltas.of('hw_rx')
+
+    def test_empty_columns_have_empty_stages(self):
+        df = {column: values[:0] for column, values in self.df.items()}
+        stage_deltas = StageDeltas(df)
+        for stage in STAGES:
+            self.assertEqual(len(stage_deltas.of(stage)), 0)
@@ -0,0 +1,90 @@
+import unittest
+
+from analysis import Analysis
+from metrics import all_classes
+from metrics_groups import SimpleMetricGroup
+from streaming import StreamingAnalysis
+from .results_files import temporary_dir, write_run
+
+
+class TestStreamingAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.csv_dir = temporary_dir(self)
+        write_run(self.csv_dir, [(48, 125000), (48, 250000), (100, 125000)],
+                  2500, empty=[64])
+
+        analysis = Analysis(self.csv_dir, None)
+        analysis.analyse(all_classes)
+        self.expected = {(type(m), m.factors['PayloadSize'],
+                          m.factors['TransmissionInterval']): m
+                         for m in analysis.metrics_collection}
+
+    def assertSameSummaries(self, streaming):
+        summaries = streaming.summaries()
+        self.assertEqual(summaries.keys(), self.expected.keys())
+        for key, (aggregate, histogram) in summaries.items():
+            metric = self.expected[key]
+            self.assertEqual(aggregate.count, metric.aggregate().count)
+            self.assertAlmostEqual(aggregate.mean, metric.aggregate().mean,
+                                   places=9)
+            self.assertAlmostEqual(aggregate.m2, metric.aggregate().m2,
+                                   delta=aggregate.m2 * 1e-12)
+            self.assertEqual(aggregate.minimum, metric.aggregate().minimum)
+            self.assertEqual(aggregate.maximum, metric.aggregate().maximum)
+            self.assertEqual(histogram.to_dict(),
+                             metric.histogram().to_dict())
+
+    def test_summaries_equal_in_memory_analysis(self):
+        for chunk_rows in [100, 999, 2500, 1 << 20]:
+            streaming = StreamingAnalysis(self.csv_dir,
+                                          chunk_rows=chunk_rows)
+            streaming.analyse(all_classes)
+            self.assertSameSummaries(streaming)
+
+    def test_cached_summaries_equal_in_memory_analysis(self):
+        for chunk_rows in [777, 1 << 20]:
+            streaming = StreamingAnalysis(self.csv_dir,
+                                          f'{self.csv_dir}/.cache',
+                                          chunk_rows)
+            streaming.analyse(all_classes)
+            self.assertSameSummaries(streaming)
+
+    def test_group_stats_equal_in_memory_analysis(self):
+        streaming = StreamingAnalysis(self.csv_dir, chunk_rows=1000)
+        streaming.analyse(all_classes)
+        group = SimpleMetricGroup(None, list(self.expected.values()), None)
+        expected = group.stats(summary=True)
+        stats = streaming.group_of(all_classes).stats(summary=True)
+        self.assertEqual([s['metric'] for s in stats],
+                         [s['metric'] for s in expected])
+        for row, expected_row in zip(stats, expected):
+            for name, value in expected_row.items():
+                if name != 'metric':
+                    self.assertAlmostEqual(row[name], value, places=6,
+                                           msg=f'{row["metric"]} {name}')
+
+    def test_metrics_of_summaries(self):
+        streaming = StreamingAnalysis(self.csv_dir, chunk_rows=1000)
+        streaming.analyse(all_classes)
+        metrics = streaming.metrics_of(all_classes)
+        self.assertEqual(len(metrics), len(self.expected))
+        for metric in metrics:
+            expected = self.expected[(type(metric),
+                                      metric.factors['PayloadSize'],
+                                      metric.factors['TransmissionInterval'])]
+            self.assertEqual(metric.histogram().to_dict(),
+                             expected.histogram().to_dict())
+            self.assertEqual(metric.aggregate().count,
+                             expected.aggregate().count)
+
+    def test_empty_file_metrics_have_no_values(self):
+        for cache_dir in [None, f'{self.csv_dir}/.cache']:
+            streaming = StreamingAnalysis(self.csv_dir, cache_dir, 1000)
+            streaming.analyse(all_classes, top_k=5, window_ns=10 ** 8)
+            empty = [key for key in streaming.summaries() if key[1] == 64]
+            self.assertEqual(len(empty), len(all_classes))
+            for key in empty:
+                self.assertEqual(streaming.summaries()[key][0].count, 0)
+                self.assertEqual(len(streaming.worst_packets()[key].rows), 0)
+                series = streaming.windowed_stats()[key].series()
+                self.assertEqual(len(series['start']), 0)
@@ -0,0 +1,128 @@
+import numpy as np
+import unittest
+
+from analysis import Analysis
+from metrics import all_classes
+from streaming import StreamingAnalysis
+from time_windows import (WINDOW_SUB_BUCKET_BITS, TimeWindows, WindowedStats,
+                          _grown, windowed_stats_of)
+from .results_files import temporary_dir, write_run
+
+WINDOW_NS = 10 ** 7
+
+# Highest relative error of a window percentile, given the bucket resolution
+RESOLUTION = 2.0 ** -(WINDOW_SUB_BUCKET_BITS - 1)
+
+
+class TestWindowedStats(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        # A packet every 125 us (with some jitter), for 1 s, and a gap with
+        # no packets from 0.3 s to 0.5 s
+        timestamps = (1600000000000000000 + np.arange(8000) * 125000 +
+                      rng.integers(0, 1000, 8000))
+        keep = ((timestamps - timestamps[0] < 3 * 10 ** 8) |
+                (timestamps - timestamps[0] >= 5 * 10 ** 8))
+        self.timestamps = timestamps[keep]
+        self.values = np.rint(rng.gamma(2.0, 15.0, len(self.timestamps)) *
+                              1000 + 50000) / 1000
+
+    def assertSameSeries(self, series, expected):
+        self.assertEqual(series.keys(), expected.keys())
+        for name, values in expected.items():
+            np.testing.assert_array_equal(series[name], values, name)
+
+    def test_series_equals_brute_force(self):
+        series = WindowedStats.of(self.timestamps, self.values,
+                                  WINDOW_NS).series()
+        windows = self.timestamps // WINDOW_NS
+        used = np.unique(windows)
+        self.assertEqual(list(series['start']), list(used * WINDOW_NS))
+        for i, window in enumerate(used):
+            values = self.values[windows == window]
+            self.assertEqual(series['count'][i], len(values))
+            self.assertAlmostEqual(series['mean'][i], np.mean(values),
+                                   places=9)
+            self.assertEqual(series['maximum'][i], np.max(values))
+            exact = np.percentile(values, 99, method='inverted_cdf')
+            self.assertLessEqual(abs(series['percentile'][i] - exact),
+                                 exact * RESOLUTION)
+            self.assertLessEqual(series['percentile'][i],
+                                 series['maximum'][i])
+
+    def test_chunks_equal_a_single_update(self):
+        expected = WindowedStats.of(self.timestamps, self.values,
+                                    WINDOW_NS).series()
+        for chunk_rows in [1000, 777, 3]:
+            starts = range(0, len(self.values), chunk_rows)
+            for order in [starts, reversed(starts)]:
+                windowed = WindowedStats(WINDOW_NS)
+                for start in order:
+                    chunk = slice(start, start + chunk_rows)
+                    windowed.update(TimeWindows(self.timestamps[chunk],
+                                                WINDOW_NS),
+                                    self.values[chunk])
+                self.assertSameSeries(windowed.series(), expected)
+
+    def test_merge_equals_a_single_update(self):
+        expected = WindowedStats.of(self.timestamps, self.values,
+                                    WINDOW_NS).series()
+        order = np.random.default_rng(1).permutation(len(self.values))
+        parts = [WindowedStats.of(self.timestamps[part], self.values[part],
+                                  WINDOW_NS)
+                 for part in np.array_split(order, 5)]
+        merged = WindowedStats(WINDOW_NS)
+        for part in parts:
+            merged.merge(part)
+        self.assertSameSeries(merged.series(), expected)
+
+    def test_nanoseconds_equal_microseconds(self):
+        ns = np.rint(self.values * 1000).astype(np.int64)
+        windowed = WindowedStats(WINDOW_NS).update(
+                TimeWindows(self.timestamps, WINDOW_NS), ns,
+                nanoseconds=True)
+        self.assertSameSeries(windowed.series(), WindowedStats.of(
+                self.timestamps, self.values, WINDOW_NS).series())
+
+    def test_windows_of_different_lengths_are_not_merged(self):
+        windowed = WindowedStats.of(self.timestamps, self.values, WINDOW_NS)
+        with self.assertRaises(Exception):
+            windowed.merge(WindowedStats.of(self.timestamps, self.values,
+                                            2 * WINDOW_NS))
+
+    def test_empty_has_no_windows(self):
+        empty = WindowedStats.of(self.timestamps[:0], self.values[:0],
+                                 WINDOW_NS)
+        for name, values in empty.series().items():
+            self.assertEqual(len(values), 0, name)
+        expected = WindowedStats.of(self.timestamps, self.values,
+                                    WINDOW_NS).series()
+        self.assertSameSeries(empty.merge(WindowedStats.of(
+                self.timestamps, self.values, WINDOW_NS)).series(), expected)
+
+    def test_grown_ranges(self):
+        self.assertEqual(_grown(0, 0, 5, 7), (5, 7))
+        self.assertEqual(_grown(10, 20, 12, 18), (10, 20))
+        self.assertEqual(_grown(10, 20, 15, 21), (10, 30))
+        self.assertEqual(_grown(10, 20, 9, 20), (0, 20))
+        self.assertEqual(_grown(10, 20, -100, 100), (-100, 100))
+
+
+class TestStreamingWindowedStats(unittest.TestCase):
+    def test_streaming_equals_in_memory(self):
+        csv_dir = temporary_dir(self)
+        write_run(csv_dir, rows=4000)
+
+        analysis = Analysis(csv_dir, None)
+        analysis.analyse(all_classes)
+        expected = windowed_stats_of(analysis.metrics_collection, WINDOW_NS)
+        streaming = StreamingAnalysis(csv_dir, chunk_rows=333)
+        streaming.analyse(all_classes, window_ns=WINDOW_NS)
+        windowed = streaming.windowed_stats()
+
+        self.assertEqual(set(windowed), set(expected))
+        for key, stats in windowed.items():
+            series = stats.series()
+            for name, values in expected[key].series().items():
+                np.testing.assert_array_equal(series[name], values,
+                                              f'{key} {name}')
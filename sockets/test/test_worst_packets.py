@@ -0,0 +1,123 @@
+import csv
+import numpy as np
+import unittest
+
+from analysis import Analysis
+from metrics import E2EMetric, all_classes
+from reports import report_worst_packets, worst_packets_file
+from stages import STAGE_PARTS, StageDeltas
+from streaming import StreamingAnalysis
+from worst_packets import WorstPackets, worst_packets_of
+from .results_files import results_columns, temporary_dir, write_run
+
+
+class TestWorstPackets(unittest.TestCase):
+    def setUp(self):
+        self.df = results_columns(5000)
+        self.values = StageDeltas(self.df, ['end_to_end']).of(
+                'end_to_end') / 1000
+        # Brute force top 10, worst first. Values on it are all different,
+        # and bigger than the rest, so it's a single one.
+        self.top = np.argsort(-self.values)[:10]
+        self.assertEqual(len(np.unique(self.values[self.top])), 10)
+        self.assertGreater(self.values[self.top[-1]],
+                           np.sort(self.values)[-11])
+
+    def assertTop(self, worst):
+        packets = worst.packets('end_to_end')
+        np.testing.assert_array_equal(packets['rows'], self.top)
+        np.testing.assert_array_equal(packets['values'],
+                                      self.values[self.top])
+        for column, values in self.df.items():
+            np.testing.assert_array_equal(packets['timestamps'][column],
+                                          values[self.top])
+
+    def test_top_k_equals_brute_force(self):
+        self.assertTop(WorstPackets.of(self.df, self.values))
+
+    def test_chunks_equal_a_single_update(self):
+        for chunk_rows in [1, 9, 10, 11, 1234]:
+            worst = WorstPackets()
+            for start in range(0, 5000, chunk_rows):
+                chunk = {c: v[start:start + chunk_rows]
+                         for c, v in self.df.items()}
+                worst.update(chunk, self.values[start:start + chunk_rows],
+                             start)
+            self.assertTop(worst)
+
+    def test_nanoseconds_equal_microseconds(self):
+        ns = StageDeltas(self.df, ['end_to_end']).of('end_to_end')
+        self.assertTop(WorstPackets().update(self.df, ns, nanoseconds=True))
+
+    def test_merge_equals_a_single_update(self):
+        first = WorstPackets.of({c: v[:2000] for c, v in self.df.items()},
+                                self.values[:2000])
+        second = WorstPackets().update(
+                {c: v[2000:] for c, v in self.df.items()},
+                self.values[2000:], 2000)
+        self.assertTop(second.merge(first))
+
+    def test_packets_are_attributed_to_their_slowest_stage(self):
+        packets = WorstPackets.of(self.df, self.values).packets('end_to_end')
+        parts = STAGE_PARTS['end_to_end'][0]
+        self.assertEqual(list(packets['parts']), parts)
+        matrix = np.column_stack([packets['parts'][p] for p in parts])
+        # Stages split the whole latency of each packet
+        np.testing.assert_allclose(np.sum(matrix, axis=1), packets['values'])
+        self.assertEqual(packets['stage'],
+                         [parts[i] for i in np.argmax(matrix, axis=1)])
+
+    def test_fewer_packets_than_k(self):
+        df = {c: v[:3] for c, v in self.df.items()}
+        worst = WorstPackets.of(df, self.values[:3])
+        np.testing.assert_array_equal(
+                worst.packets('end_to_end')['rows'],
+                np.argsort(-self.values[:3]))
+
+    def test_empty_has_no_packets(self):
+        df = {c: v[:0] for c, v in self.df.items()}
+        worst = WorstPackets.of(df, self.values[:0])
+        self.assertEqual(len(worst.rows), 0)
+        worst.merge(WorstPackets())
+        self.assertEqual(len(worst.rows), 0)
+        self.assertTop(worst.merge(WorstPackets.of(self.df, self.values)))
+
+
+class TestStreamingWorstPackets(unittest.TestCase):
+    def test_streaming_equals_in_memory(self):
+        csv_dir = temporary_dir(self)
+        write_run(csv_dir, rows=3000, empty=[64])
+
+        analysis = Analysis(csv_dir, None)
+        analysis.analyse(all_classes)
+        expected = worst_packets_of(analysis.metrics_collection, 5)
+        streaming = StreamingAnalysis(csv_dir, chunk_rows=700)
+        streaming.analyse(all_classes, top_k=5)
+        worst = streaming.worst_packets()
+
+        self.assertEqual(set(worst), set(expected))
+        for key, packets in worst.items():
+            self.assertEqual(len(packets.rows), 0 if key[1] == 64 else 5)
+            np.testing.assert_array_equal(np.sort(packets.rows),
+                                          np.sort(expected[key].rows))
+        self.assertEqual(
+                list(worst[(E2EMetric, 48, 125000)].packets(
+                        'end_to_end')['rows']),
+                list(expected[(E2EMetric, 48, 125000)].packets(
+                        'end_to_end')['rows']))
+
+
+class TestWorstPacketsReport(unittest.TestCase):
+    def test_factors_without_packets_have_no_rows(self):
+        csv_dir = temporary_dir(self)
+        write_run(csv_dir, rows=100, empty=[64])
+        analysis = Analysis(csv_dir, None)
+        analysis.analyse([E2EMetric])
+        worst = worst_packets_of(analysis.metrics_collection, 5)
+        self.assertEqual(len(worst[(E2EMetric, 64, 125000)].rows), 0)
+
+        report_worst_packets(E2EMetric, worst, csv_dir)
+        with open(worst_packets_file(E2EMetric, csv_dir)) as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([row['PayloadSize'] for row in rows],
+                         ['48'] * 5 + ['100'] * 5)